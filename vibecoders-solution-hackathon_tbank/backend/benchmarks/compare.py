@@ -0,0 +1,53 @@
+"""
+Сравнение двух прогонов benchmarks.run
+
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/new.json
+"""
+import argparse
+import json
+import sys
+
+
+def _delta(old, new, lower_is_better: bool) -> str:
+    if old in (None, 0) or new is None:
+        return ""
+    change = (new - old) / old * 100
+    better = change < 0 if lower_is_better else change > 0
+    return f"{change:+.1f}%{' ✓' if better and abs(change) >= 5 else ''}"
+
+
+def compare(old: dict, new: dict) -> list:
+    """Строки таблицы: сценарий, метрика, было, стало, изменение"""
+    rows = []
+    for name, new_result in new["scenarios"].items():
+        old_result = old["scenarios"].get(name)
+        if old_result is None:
+            continue
+        metrics = [
+            ("rps", old_result["throughput_rps"], new_result["throughput_rps"], False),
+            ("p50 ms", old_result["latency_ms"]["p50"], new_result["latency_ms"]["p50"], True),
+            ("p95 ms", old_result["latency_ms"]["p95"], new_result["latency_ms"]["p95"], True),
+            ("p99 ms", old_result["latency_ms"]["p99"], new_result["latency_ms"]["p99"], True),
+            ("sql/req", old_result["statements_per_request"], new_result["statements_per_request"], True),
+        ]
+        for metric, old_value, new_value, lower_is_better in metrics:
+            rows.append((name, metric, old_value, new_value, _delta(old_value, new_value, lower_is_better)))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение двух прогонов benchmarks.run")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args()
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"{old['meta'].get('git_revision')} -> {new['meta'].get('git_revision')}")
+    if old["meta"].get("response_cache") != new["meta"].get("response_cache"):
+        print("Внимание: прогоны с разным режимом кэша ответов (meta.response_cache)", file=sys.stderr)
+    for name, metric, old_value, new_value, delta in compare(old, new):
+        print(f"{name:18} {metric:8} {str(old_value):>10} {str(new_value):>10}  {delta}")
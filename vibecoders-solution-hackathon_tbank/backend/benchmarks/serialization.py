@@ -0,0 +1,127 @@
+"""
+CPU на сериализацию большого списка рецептов (без БД и сети)
+
+Сравниваются три способа превратить строки recipe_list_query в тело ответа:
+
+- response_model - модели RecipeListItem из строк, затем путь FastAPI для
+  обработчика, возвращающего модели: serialize_response по response_model
+  маршрута /api/recipes и JSONResponse (json.dumps);
+- models + to_json - модели RecipeListItem и pydantic_core.to_json;
+- rows + dumps - словари из строк (main.to_recipe_list_item) и
+  serialization.dumps (orjson) - текущий путь.
+
+Тела ответов сравниваются, время - процессорное. Запуск из каталога backend:
+
+    python -m benchmarks.serialization --items 5000
+"""
+from collections import namedtuple
+from typing import Callable, List
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from pydantic_core import to_json
+
+import main
+from schemas import RecipeListItem
+from serialization import dumps, orjson
+
+Row = namedtuple("Row", "id title category cook_time servings image calories_per_serving rating")
+
+
+def make_rows(count: int, seed: int = 42) -> List[Row]:
+    """Строки как из recipe_list_query: половина изображений - ключи хранилища"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, count + 1):
+        image = (
+            f"{rng.getrandbits(256):064x}.jpg" if i % 2
+            else f"https://images.example.com/recipes/{i}.jpg?w=1080"
+        )
+        rows.append(Row(
+            id=i,
+            title=f"Рецепт №{i}: курица с овощами",
+            category=rng.choice(["Завтраки", "Супы", "Горячее", "Салаты", "Десерты"]),
+            cook_time=rng.randint(5, 180),
+            servings=rng.randint(1, 8),
+            image=image,
+            calories_per_serving=rng.choice([None, rng.randint(50, 900)]),
+            rating=rng.choice([None, round(rng.uniform(1, 5), 6), rng.uniform(1, 5)]),
+        ))
+    return rows
+
+
+def to_model(row: Row) -> RecipeListItem:
+    """Как строился RecipeListItem до быстрого пути"""
+    return RecipeListItem(
+        id=row.id,
+        title=row.title,
+        category=row.category,
+        cook_time=row.cook_time,
+        servings=row.servings,
+        image=row.image,
+        calories_per_serving=row.calories_per_serving,
+        rating=row.rating
+    )
+
+
+def response_model_path(rows: List[Row]) -> bytes:
+    route = next(r for r in main.app.routes if getattr(r, "path", None) == "/api/recipes" and "GET" in r.methods)
+    content = asyncio.run(serialize_response(field=route.response_field, response_content=[to_model(r) for r in rows]))
+    return JSONResponse(content).body
+
+
+def models_to_json_path(rows: List[Row]) -> bytes:
+    return to_json([to_model(row) for row in rows])
+
+
+def rows_dumps_path(rows: List[Row]) -> bytes:
+    return dumps([main.to_recipe_list_item(row) for row in rows])
+
+
+def measure(fn: Callable[[List[Row]], bytes], rows: List[Row], repeat: int) -> List[float]:
+    """Процессорное время одного вызова, мс"""
+    fn(rows)
+    timings = []
+    for _ in range(repeat):
+        started = time.process_time()
+        fn(rows)
+        timings.append((time.process_time() - started) * 1000)
+    return timings
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="CPU на сериализацию списка рецептов")
+    parser.add_argument("--items", type=int, default=5000, help="рецептов в ответе")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    rows = make_rows(args.items)
+    paths = [
+        ("response_model", response_model_path),
+        ("models + to_json", models_to_json_path),
+        ("rows + dumps", rows_dumps_path),
+    ]
+
+    # Все пути дают один и тот же JSON
+    expected = json.loads(rows_dumps_path(rows))
+    for name, fn in paths:
+        if json.loads(fn(rows)) != expected:
+            raise SystemExit(f"{name}: ответ отличается от rows + dumps")
+
+    print(f"{args.items} рецептов, {len(rows_dumps_path(rows))} байт, кодировщик: {'orjson' if orjson else 'pydantic_core'}")
+    baseline = None
+    for name, fn in paths:
+        timings = measure(fn, rows, args.repeat)
+        median = statistics.median(timings)
+        baseline = baseline or median
+        print(f"{name:18} median {median:8.2f} ms  min {min(timings):8.2f} ms  x{baseline / median:.1f}")
+
+
+if __name__ == "__main__":
+    main_cli()
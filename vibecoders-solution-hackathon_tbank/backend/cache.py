@@ -0,0 +1,237 @@
+"""
+In-process LRU/TTL кэш готовых JSON-ответов с сильными ETag
+
+Ключ - путь запроса и отсортированные query-параметры. Записи помечаются
+тегами (например "recipe:1" или "recipe-list"), запись в данные
+инвалидирует все записи с нужным тегом.
+
+Кэш живет в памяти процесса, поэтому инвалидация рассылается всем
+воркерам через PostgreSQL NOTIFY: запись коммитится вместе с
+уведомлением (commit_and_invalidate), а каждый воркер слушает канал
+INVALIDATION_CHANNEL на отдельном соединении (listen_invalidations).
+Пока соединение слушателя потеряно, уведомления пропадают, поэтому
+после переподключения кэш воркера сбрасывается целиком.
+
+Все обращения идут из event loop, поэтому блокировки не нужны.
+"""
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Set
+import asyncio
+import hashlib
+import os
+import time
+
+import asyncpg
+from fastapi import Request
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import ASYNC_DATABASE_URL
+from instrumentation import logger
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 60))  # секунд
+CACHE_LISTEN_RETRY_SECONDS = float(os.getenv("CACHE_LISTEN_RETRY_SECONDS", 5))  # пауза перед переподключением слушателя
+
+# Канал NOTIFY с тегами, которые нужно сбросить во всех воркерах
+INVALIDATION_CHANNEL = "response_cache_invalidate"
+
+# Тег всех закэшированных списков рецептов
+RECIPE_LIST_TAG = "recipe-list"
+
+
+def recipe_tag(recipe_id: int) -> str:
+    """Тег записей, зависящих от рецепта recipe_id"""
+    return f"recipe:{recipe_id}"
+
+
+def make_etag(body: bytes) -> str:
+    """Сильный ETag по содержимому ответа"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Совпадает ли ETag с заголовком If-None-Match запроса"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def cache_key(request: Request) -> str:
+    """Ключ кэша: путь и отсортированные query-параметры"""
+    params = sorted(request.query_params.multi_items())
+    return request.url.path + "?" + "&".join(f"{name}={value}" for name, value in params)
+
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+    tags: Set[str]
+    expires_at: float
+
+
+class ResponseCache:
+    """LRU-кэш с ограничением по числу записей, объему и времени жизни"""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float, enabled: bool = True):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = defaultdict(set)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Растет при каждой инвалидации; ответ, собранный во время
+        # инвалидации, мог прочитать старые данные и не сохраняется
+        self.generation = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(
+        self,
+        key: str,
+        body: bytes,
+        tags: Iterable[str],
+        headers: Optional[Dict[str, str]] = None,
+        generation: Optional[int] = None
+    ) -> CacheEntry:
+        entry = CacheEntry(
+            body=body,
+            etag=make_etag(body),
+            headers=headers or {},
+            tags=set(tags),
+            expires_at=time.monotonic() + self.ttl,
+        )
+        # Ответ больше всего кэша не сохраняем, но ETag все равно нужен
+        if not self.enabled or len(body) > self.max_bytes:
+            return entry
+        if generation is not None and generation != self.generation:
+            return entry
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += len(body)
+        for tag in entry.tags:
+            self._tags[tag].add(key)
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+        return entry
+
+    def invalidate(self, *tags: str) -> int:
+        """Удалить все записи с любым из тегов, возвращает число удаленных"""
+        self.generation += 1
+        removed = 0
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                removed += 1
+        self.invalidations += removed
+        return removed
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._tags.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=RESPONSE_CACHE_MAX_BYTES,
+    ttl=RESPONSE_CACHE_TTL,
+    enabled=RESPONSE_CACHE_ENABLED,
+)
+
+
+async def commit_and_invalidate(db: AsyncSession, *tags: str):
+    """Закоммитить запись и сбросить теги в кэше всех воркеров.
+
+    NOTIFY уходит в той же транзакции и доставляется только после коммита,
+    так что другой воркер не получит уведомление раньше новых данных.
+    """
+    await db.execute(select(func.pg_notify(INVALIDATION_CHANNEL, " ".join(tags))))
+    await db.commit()
+    response_cache.invalidate(*tags)
+
+
+def handle_invalidation(connection, pid: int, channel: str, payload: str):
+    """Обработчик NOTIFY: сбросить присланные теги в кэше этого воркера"""
+    response_cache.invalidate(*payload.split())
+
+
+async def listen_invalidations():
+    """Слушать INVALIDATION_CHANNEL, пока задачу не отменят; переподключаться при обрыве"""
+    dsn = make_url(ASYNC_DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+    while True:
+        closed = asyncio.Event()
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            connection.add_termination_listener(lambda _: closed.set())
+            await connection.add_listener(INVALIDATION_CHANNEL, handle_invalidation)
+            # Уведомления, отправленные до подписки, до воркера не дошли
+            response_cache.clear()
+            await closed.wait()
+            logger.warning("Соединение слушателя инвалидации кэша закрыто, переподключение")
+        except asyncio.CancelledError:
+            if connection is not None:
+                await connection.close()
+            raise
+        except Exception as e:
+            logger.warning("Слушатель инвалидации кэша не подключен: %s", e)
+        await asyncio.sleep(CACHE_LISTEN_RETRY_SECONDS)
@@ -1,16 +1,31 @@
 """
 Скрипт для инициализации базы данных
-Создает все таблицы если их еще нет
+Применяет миграции схемы (alembic upgrade head); с --seed заполняет пустую БД тестовыми данными
 """
 from database import init_db
+import argparse
 import sys
 
+
+def init_database(seed: bool = False):
+    """Применить миграции и, если нужно, заполнить пустую БД тестовыми данными"""
+    if seed:
+        from seed_data import seed_database
+        # Применяет миграции и пропускает заполнение, если рецепты уже есть
+        seed_database()
+    else:
+        init_db()
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Инициализация базы данных")
+    parser.add_argument("--seed", action="store_true", help="заполнить тестовыми данными, если БД пустая")
+    args = parser.parse_args()
+    
     try:
         print("Инициализация базы данных...")
-        init_db()
+        init_database(args.seed)
         print("База данных успешно инициализирована!")
     except Exception as e:
         print(f"Ошибка при инициализации базы данных: {e}", file=sys.stderr)
         sys.exit(1)
-
@@ -0,0 +1,37 @@
+"""
+Конфигурация gunicorn для продакшена
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Приложение импортируется один раз в мастере (preload_app) и наследуется
+воркерами через fork: новый или перезапущенный воркер не импортирует
+FastAPI, SQLAlchemy и схемы заново. Старт воркера не ходит в БД, пул
+соединений прогревается в фоне, до этого /ready отвечает 503.
+
+Таблицы и тестовые данные перед первым запуском: python db_init.py --seed
+"""
+import multiprocessing
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))  # секунд без ответа от воркера до перезапуска
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 10))  # секунд на завершение запросов при остановке
+keepalive = int(os.getenv("KEEPALIVE", 5))
+# Перезапуск воркера после N запросов (страховка от утечек), 0 - не перезапускать
+max_requests = int(os.getenv("MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 0))
+
+accesslog = "-" if os.getenv("ACCESS_LOG", "false").lower() in ("1", "true", "yes") else None
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    """Соединения, открытые в мастере до fork, не должны достаться воркерам"""
+    from database import async_engine, engine
+
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
@@ -0,0 +1,247 @@
+"""
+Хранилище изображений рецептов, шагов и отзывов
+
+Файлы лежат в локальном content-addressed хранилище: ключ - sha256
+содержимого и расширение ("<sha256>.jpg"), поэтому одинаковые загрузки
+хранятся один раз. В БД пишется только ключ (или внешний URL, как у
+тестовых данных), в ответы API - URL файла или квадратной миниатюры.
+Файлы по ключу не меняются и отдаются с долгим Cache-Control.
+
+Миниатюры строятся один раз, при загрузке или при первом запросе.
+Для них нужен Pillow (импортируется при первой миниатюре, а не на старте);
+без него вместо миниатюры отдается оригинал.
+
+Перенос base64 data URL, уже сохраненных в БД, в хранилище:
+
+    python images.py
+"""
+from io import BytesIO
+from typing import Optional, Tuple
+import base64
+import binascii
+import hashlib
+import os
+import re
+import sys
+import tempfile
+
+IMAGE_STORE_DIR = os.getenv(
+    "IMAGE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "media")
+)
+MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", "").rstrip("/")  # пусто - относительные URL
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", 5 * 1024 * 1024))
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", 320))  # сторона квадратной миниатюры, px
+
+# Долгий кэш: содержимое файла по ключу никогда не меняется
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp"}
+
+IMAGE_KEY_RE = re.compile(r"^[0-9a-f]{64}\.(jpg|png|gif|webp)$")
+DATA_URL_RE = re.compile(r"^data:image/[\w.+-]+;base64,", re.IGNORECASE)
+MAX_EXTERNAL_URL_LENGTH = 2048
+
+# (Image, ImageOps) после первого обращения, False - Pillow не установлен
+_pillow = None
+
+
+class ImageError(ValueError):
+    """Некорректное или слишком большое изображение"""
+
+
+def is_image_key(value: Optional[str]) -> bool:
+    """Является ли значение колонки ключом хранилища"""
+    return bool(value) and IMAGE_KEY_RE.match(value) is not None
+
+
+def image_path(key: str) -> str:
+    return os.path.join(IMAGE_STORE_DIR, key[:2], key)
+
+
+def thumbnail_path(key: str) -> str:
+    return os.path.join(IMAGE_STORE_DIR, "thumbs", key[:2], key[:64] + ".jpg")
+
+
+def image_url(value: Optional[str]) -> Optional[str]:
+    """URL изображения для ответа API; внешние URL отдаются как есть"""
+    if is_image_key(value):
+        return f"{MEDIA_BASE_URL}/media/{value}"
+    return value
+
+
+def thumbnail_url(value: Optional[str]) -> Optional[str]:
+    """URL миниатюры для списков; для внешних URL миниатюры нет"""
+    if is_image_key(value):
+        return f"{MEDIA_BASE_URL}/media/thumbs/{value}"
+    return value
+
+
+def sniff_extension(data: bytes) -> Optional[str]:
+    """Формат по сигнатуре файла, а не по заявленному клиентом типу"""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def _write_atomic(path: str, data: bytes):
+    """Запись через временный файл: читатели не видят недописанный файл"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _load_pillow():
+    """Модули Pillow или None, если он не установлен"""
+    global _pillow
+    if _pillow is None:
+        try:
+            from PIL import Image, ImageOps
+            _pillow = (Image, ImageOps)
+        except ImportError:  # Pillow не установлен - миниатюры не строятся
+            _pillow = False
+    return _pillow or None
+
+
+def _render_thumbnail(data: bytes, Image, ImageOps) -> bytes:
+    with Image.open(BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        img = ImageOps.fit(img.convert("RGB"), (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        out = BytesIO()
+        img.save(out, format="JPEG", quality=85, optimize=True)
+        return out.getvalue()
+
+
+def ensure_thumbnail(key: str, data: Optional[bytes] = None) -> Optional[str]:
+    """Построить миниатюру, если ее еще нет; путь к ней или None без Pillow"""
+    path = thumbnail_path(key)
+    if os.path.exists(path):
+        return path
+    pillow = _load_pillow()
+    if pillow is None:
+        return None
+    Image, ImageOps = pillow
+    if data is None:
+        with open(image_path(key), "rb") as f:
+            data = f.read()
+    try:
+        _write_atomic(path, _render_thumbnail(data, Image, ImageOps))
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageError(f"Cannot decode image: {e}")
+    return path
+
+
+def store_image(data: bytes) -> str:
+    """Сохранить изображение в хранилище, возвращает ключ"""
+    if not data:
+        raise ImageError("Empty image")
+    if len(data) > IMAGE_MAX_BYTES:
+        raise ImageError(f"Image is too large, maximum is {IMAGE_MAX_BYTES} bytes")
+    extension = sniff_extension(data)
+    if extension is None:
+        raise ImageError("Unsupported image format, expected JPEG, PNG, GIF or WebP")
+
+    key = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+    # Миниатюра строится первой: битый файл не попадет в хранилище
+    ensure_thumbnail(key, data)
+    path = image_path(key)
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    return key
+
+
+def decode_data_url(value: str) -> bytes:
+    """Содержимое base64 data URL"""
+    header, comma, payload = value.partition(",")
+    if not comma:
+        raise ImageError("Invalid data URL")
+    # base64 в 4/3 раза больше данных - проверяем размер до декодирования
+    if len(payload) > IMAGE_MAX_BYTES * 4 // 3 + 4:
+        raise ImageError(f"Image is too large, maximum is {IMAGE_MAX_BYTES} bytes")
+    try:
+        return base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        raise ImageError("Invalid base64 data URL")
+
+
+def normalize_image_value(value: Optional[str]) -> Optional[str]:
+    """Значение image от клиента -> значение для колонки БД.
+
+    data URL сохраняется в хранилище и заменяется ключом, ключ ранее
+    загруженного файла и внешний http(s) URL принимаются как есть.
+    """
+    if not value:
+        return None
+    if DATA_URL_RE.match(value):
+        return store_image(decode_data_url(value))
+    if is_image_key(value):
+        if not os.path.exists(image_path(value)):
+            raise ImageError("Unknown image key")
+        return value
+    if value.startswith(("http://", "https://")) and len(value) <= MAX_EXTERNAL_URL_LENGTH:
+        return value
+    raise ImageError("image must be a data URL, an uploaded image key or an http(s) URL")
+
+
+def offload_data_urls(db, batch_size: int = 100) -> Tuple[int, int]:
+    """Перенести data URL из recipes/steps/reviews в хранилище: (перенесено, ошибок).
+
+    Строки с неразбираемым data URL остаются как есть и выводятся в stderr.
+    """
+    from sqlalchemy import select, update
+    from models import Recipe, Step, Review
+
+    moved = failed = 0
+    for model in (Recipe, Step, Review):
+        last_id = 0
+        while True:
+            rows = db.execute(
+                select(model.id, model.image)
+                .where(model.image.like("data:%"), model.id > last_id)
+                .order_by(model.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                try:
+                    key = store_image(decode_data_url(row.image))
+                except ImageError as e:
+                    print(f"{model.__tablename__} {row.id}: {e}", file=sys.stderr)
+                    failed += 1
+                    continue
+                db.execute(update(model).where(model.id == row.id).values(image=key))
+                moved += 1
+            last_id = rows[-1].id
+            db.commit()
+    return moved, failed
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print("Перенос изображений из БД в хранилище...")
+        moved, failed = offload_data_urls(db)
+        print(f"Готово, перенесено: {moved}, не удалось разобрать: {failed}")
+    except Exception as e:
+        db.rollback()
+        print(f"Ошибка при переносе изображений: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db.close()
@@ -0,0 +1,259 @@
+"""
+Массовый импорт рецептов (RecipeCreate) из NDJSON или JSON-массива
+
+Записи проверяются по одной по мере чтения потока, валидные собираются в
+пачки по INGEST_BATCH_SIZE и пишутся бинарным COPY (asyncpg) в recipes,
+ingredients и steps; id рецептов резервируются заранее одним nextval по
+последовательности, названия ингредиентов разрешаются по справочнику
+одним запросом на пачку, количества разбираются в базовые единицы (см.
+ingredient_catalog.py). Каждая пачка - отдельная транзакция. Если COPY пачки
+упал на уровне БД, ее записи повторяются по одной в savepoint, чтобы
+найти плохие; ошибки возвращаются по номерам записей, импорт продолжается.
+
+Запуск из командной строки (NDJSON по строке на рецепт, .json - массив):
+
+    python ingest.py recipes.ndjson
+    cat recipes.ndjson | python ingest.py -
+"""
+from datetime import datetime
+from typing import Any, AsyncIterable, AsyncIterator, Callable, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from images import ImageError, normalize_image_value
+from ingredient_catalog import parse_quantity, resolve_ingredient_ids
+from models import Recipe, Ingredient
+from schemas import RecipeCreate, RecipeImportError, RecipeImportResult
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 1000))
+# Сколько ошибок возвращать в отчете; счетчик failed считает все
+MAX_REPORTED_ERRORS = int(os.getenv("INGEST_MAX_REPORTED_ERRORS", 1000))
+
+RECIPE_COLUMNS = [
+    "id", "title", "category", "cook_time", "servings", "image",
+    "calories_per_serving", "rating_sum", "rating_count", "created_at", "updated_at",
+]
+INGREDIENT_COLUMNS = ["recipe_id", "name", "amount", "unit", "order", "ingredient_id", "quantity", "base_unit"]
+STEP_COLUMNS = ["recipe_id", "number", "instruction", "image", "order"]
+
+RESERVE_IDS_SQL = "SELECT nextval(pg_get_serial_sequence('recipes', 'id')) FROM generate_series(1, :count)"
+
+# Запись потока: (номер записи, JSON-строка или уже разобранный объект)
+RawRecord = Tuple[int, Any]
+
+
+class IngestError(ValueError):
+    """Запись не прошла проверку"""
+
+
+async def ndjson_records(chunks: AsyncIterable[bytes]) -> AsyncIterator[RawRecord]:
+    """Записи NDJSON-потока; номер записи - номер строки"""
+    buffer = b""
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line
+    if buffer.strip():
+        yield line_number + 1, buffer
+
+
+async def json_array_records(body: bytes) -> AsyncIterator[RawRecord]:
+    """Записи JSON-массива; номер записи - позиция в массиве с 1"""
+    try:
+        items = json.loads(body)
+    except ValueError as e:
+        raise IngestError(f"Invalid JSON: {e}")
+    if not isinstance(items, list):
+        raise IngestError("Expected a JSON array of recipes")
+    for number, item in enumerate(items, start=1):
+        yield number, item
+
+
+def _check_lengths(model, values: dict, prefix: str = ""):
+    """Строки не длиннее колонок String(n): иначе упадет вся пачка COPY"""
+    for name, value in values.items():
+        length = getattr(model.__table__.c[name].type, "length", None)
+        if length and isinstance(value, str) and len(value) > length:
+            raise IngestError(f"{prefix}{name}: longer than {length} characters")
+
+
+def _normalize_images(recipe: RecipeCreate) -> RecipeCreate:
+    """data URL изображений -> ключи хранилища (см. images.py)"""
+    try:
+        recipe.image = normalize_image_value(recipe.image)
+        for step in recipe.steps:
+            step.image = normalize_image_value(step.image)
+    except ImageError as e:
+        raise IngestError(f"image: {e}")
+    return recipe
+
+
+def _needs_image_io(recipe: RecipeCreate) -> bool:
+    values = [recipe.image, *(step.image for step in recipe.steps)]
+    return any(value and not value.startswith(("http://", "https://")) for value in values)
+
+
+async def validate_record(raw: Any) -> RecipeCreate:
+    """Проверить одну запись; IngestError с понятным текстом, если она плохая"""
+    try:
+        if isinstance(raw, (bytes, str)):
+            recipe = RecipeCreate.model_validate_json(raw)
+        else:
+            recipe = RecipeCreate.model_validate(raw)
+    except ValidationError as e:
+        raise IngestError("; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'record'}: {error['msg']}"
+            for error in e.errors()
+        ))
+
+    _check_lengths(Recipe, recipe.model_dump(include={"title", "category"}))
+    for i, ingredient in enumerate(recipe.ingredients):
+        _check_lengths(Ingredient, ingredient.model_dump(), f"ingredients.{i}.")
+
+    # Файловый ввод-вывод хранилища - вне event loop
+    if _needs_image_io(recipe):
+        recipe = await run_in_threadpool(_normalize_images, recipe)
+    return recipe
+
+
+async def write_batch(db: AsyncSession, recipes: List[RecipeCreate]) -> List[int]:
+    """Записать пачку рецептов тремя COPY, возвращает id рецептов по порядку"""
+    ids = (await db.execute(text(RESERVE_IDS_SQL), {"count": len(recipes)})).scalars().all()
+    ingredient_ids = await resolve_ingredient_ids(
+        db, (ingredient.name for recipe in recipes for ingredient in recipe.ingredients)
+    )
+    now = datetime.utcnow()
+
+    recipe_rows, ingredient_rows, step_rows = [], [], []
+    for recipe_id, recipe in zip(ids, recipes):
+        recipe_rows.append((
+            recipe_id, recipe.title, recipe.category, recipe.cook_time, recipe.servings,
+            recipe.image, recipe.calories_per_serving, 0, 0, now, now,
+        ))
+        for order, ingredient in enumerate(recipe.ingredients):
+            ingredient_rows.append((
+                recipe_id, ingredient.name, ingredient.amount, ingredient.unit, order,
+                ingredient_ids.get(ingredient.name), *parse_quantity(ingredient.amount, ingredient.unit),
+            ))
+        for order, step in enumerate(recipe.steps):
+            step_rows.append((recipe_id, step.number, step.instruction, step.image, order))
+
+    # COPY идет в той же транзакции, что и сессия
+    connection = await db.connection()
+    raw_connection = (await connection.get_raw_connection()).driver_connection
+    await raw_connection.copy_records_to_table("recipes", records=recipe_rows, columns=RECIPE_COLUMNS)
+    if ingredient_rows:
+        await raw_connection.copy_records_to_table("ingredients", records=ingredient_rows, columns=INGREDIENT_COLUMNS)
+    if step_rows:
+        await raw_connection.copy_records_to_table("steps", records=step_rows, columns=STEP_COLUMNS)
+    return list(ids)
+
+
+async def _flush_batch(
+    db: AsyncSession,
+    batch: List[Tuple[int, RecipeCreate]],
+    result: RecipeImportResult
+):
+    """Записать пачку; при ошибке БД - по одной записи в savepoint"""
+    try:
+        async with db.begin_nested():
+            await write_batch(db, [recipe for _, recipe in batch])
+        result.imported += len(batch)
+    except Exception:
+        for number, recipe in batch:
+            try:
+                async with db.begin_nested():
+                    await write_batch(db, [recipe])
+                result.imported += 1
+            except Exception as e:
+                _add_error(result, number, f"database: {e}")
+    await db.commit()
+
+
+def _add_error(result: RecipeImportResult, number: int, error: str):
+    result.failed += 1
+    if len(result.errors) < MAX_REPORTED_ERRORS:
+        result.errors.append(RecipeImportError(record=number, error=error))
+
+
+async def ingest_records(
+    db: AsyncSession,
+    records: AsyncIterable[RawRecord],
+    batch_size: int = INGEST_BATCH_SIZE,
+    progress: Optional[Callable[[RecipeImportResult], None]] = None
+) -> RecipeImportResult:
+    """Импортировать поток записей, возвращает отчет с ошибками по записям"""
+    result = RecipeImportResult()
+    batch: List[Tuple[int, RecipeCreate]] = []
+    async for number, raw in records:
+        try:
+            batch.append((number, await validate_record(raw)))
+        except IngestError as e:
+            _add_error(result, number, str(e))
+            continue
+        if len(batch) >= batch_size:
+            await _flush_batch(db, batch, result)
+            batch = []
+            if progress:
+                progress(result)
+    if batch:
+        await _flush_batch(db, batch, result)
+        if progress:
+            progress(result)
+    return result
+
+
+async def _file_chunks(stream, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def ingest_file(path: str, batch_size: int) -> RecipeImportResult:
+    from database import AsyncSessionLocal
+
+    def report_progress(result: RecipeImportResult):
+        print(f"  импортировано: {result.imported}, ошибок: {result.failed}", file=sys.stderr)
+
+    stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        if path.endswith(".json"):
+            records = json_array_records(stream.read())
+        else:
+            records = ndjson_records(_file_chunks(stream))
+        async with AsyncSessionLocal() as db:
+            return await ingest_records(db, records, batch_size, report_progress)
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Массовый импорт рецептов из NDJSON или JSON-массива")
+    parser.add_argument("path", help="файл .ndjson / .json или - для stdin (NDJSON)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="рецептов в одной транзакции")
+    args = parser.parse_args()
+
+    try:
+        print("Импорт рецептов...")
+        result = asyncio.run(ingest_file(args.path, args.batch_size))
+        for error in result.errors:
+            print(f"запись {error.record}: {error.error}", file=sys.stderr)
+        print(f"Готово, импортировано: {result.imported}, ошибок: {result.failed}")
+    except (OSError, IngestError) as e:
+        print(f"Ошибка при импорте рецептов: {e}", file=sys.stderr)
+        sys.exit(1)
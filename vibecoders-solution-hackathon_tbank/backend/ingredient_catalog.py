@@ -0,0 +1,245 @@
+"""
+Справочник ингредиентов и разобранные количества
+
+ingredient_catalog хранит каждый ингредиент один раз (id, название,
+ключ normalize_name). ingredient_aliases - ключи названий, которые
+считаются тем же ингредиентом; ключ самого ингредиента - тоже алиас.
+У строк ingredients при записи заполняются
+ingredient_id и количество, разобранное из свободного текста amount/unit
+("0,5" "кг", "1 1/2" "ст.л."): quantity в базовой единице base_unit
+(g, ml, pcs) или, если единица неизвестна ("зубчика"), в единицах unit с
+base_unit NULL. Нечисловое количество ("по вкусу") - quantity NULL.
+Группировка и сравнение идут по целым ingredient_id и числам, без разбора
+строк в каждом запросе.
+
+Импорт (ingest.py) разрешает названия пачки одним запросом. Строки без
+ingredient_id (записанные через ORM или напрямую в БД) дозаполняются
+скриптом; он же объединяет ингредиенты:
+
+    python ingredient_catalog.py
+    python ingredient_catalog.py merge "Яйца" "Яйцо куриное"
+"""
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import argparse
+import re
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Базовые единицы и подписи для ответов API
+BASE_UNIT_LABELS = {"g": "г", "ml": "мл", "pcs": "шт"}
+
+# Ключ единицы (см. unit_key) -> (базовая единица, множитель)
+UNITS = {
+    **dict.fromkeys(("г", "гр", "грамм", "грамма", "граммов", "g"), ("g", 1)),
+    **dict.fromkeys(("кг", "килограмм", "килограмма", "килограммов", "kg"), ("g", 1000)),
+    **dict.fromkeys(("мг", "mg"), ("g", 0.001)),
+    **dict.fromkeys(("мл", "миллилитр", "миллилитра", "миллилитров", "ml"), ("ml", 1)),
+    **dict.fromkeys(("л", "литр", "литра", "литров", "l"), ("ml", 1000)),
+    **dict.fromkeys(("чл", "чайнаяложка", "чайныеложки", "чайныхложек", "tsp"), ("ml", 5)),
+    **dict.fromkeys(("стл", "столоваяложка", "столовыеложки", "столовыхложек", "tbsp"), ("ml", 15)),
+    **dict.fromkeys(("стакан", "стакана", "стаканов", "cup"), ("ml", 250)),
+    **dict.fromkeys(("шт", "штука", "штуки", "штук", "pcs"), ("pcs", 1)),
+}
+
+FRACTIONS = {"½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4"}
+
+# "2", "0.5", "1/2", "1 1/2" и диапазон "2-3" (берется середина)
+_NUMBER = r"\d+(?:\.\d+)?(?:\s*/\s*\d+)?"
+AMOUNT_PATTERN = re.compile(rf"^(\d+\s+)?({_NUMBER})(?:\s*[-–—]\s*({_NUMBER}))?$")
+
+# Новые названия добавляются в справочник вместе с алиасом-ключом; ответ -
+# (ключ, id) для всех ключей. Ключи, которые в тот же момент добавила
+# параллельная транзакция, в ответ не попадают - их дает повтор запроса
+RESOLVE_SQL = """
+WITH input AS (
+    SELECT DISTINCT ON (key) name, key
+    FROM unnest(CAST(:names AS varchar[]), CAST(:keys AS varchar[])) AS v (name, key)
+    ORDER BY key, name
+), created AS (
+    INSERT INTO ingredient_catalog (name, key)
+    SELECT name, key FROM input
+    WHERE NOT EXISTS (SELECT 1 FROM ingredient_aliases AS a WHERE a.alias = input.key)
+    ON CONFLICT (key) DO NOTHING
+    RETURNING id, key
+), created_aliases AS (
+    INSERT INTO ingredient_aliases (alias, ingredient_id)
+    SELECT key, id FROM created
+    ON CONFLICT (alias) DO NOTHING
+)
+SELECT key, id FROM created
+UNION ALL
+SELECT alias, ingredient_id FROM ingredient_aliases WHERE alias = ANY(CAST(:keys AS varchar[]))
+"""
+
+UNRESOLVED_NAMES_SQL = "SELECT DISTINCT name FROM ingredients WHERE ingredient_id IS NULL"
+UNRESOLVED_AMOUNTS_SQL = "SELECT DISTINCT amount, unit FROM ingredients WHERE ingredient_id IS NULL"
+
+FILL_SQL = """
+UPDATE ingredients AS i
+SET ingredient_id = n.ingredient_id, quantity = q.quantity, base_unit = q.base_unit
+FROM unnest(CAST(:names AS varchar[]), CAST(:ids AS integer[])) AS n (name, ingredient_id),
+     unnest(CAST(:amounts AS varchar[]), CAST(:units AS varchar[]),
+            CAST(:quantities AS double precision[]), CAST(:base_units AS varchar[]))
+         AS q (amount, unit, quantity, base_unit)
+WHERE i.ingredient_id IS NULL AND i.name = n.name AND i.amount = q.amount AND i.unit = q.unit
+"""
+
+MERGE_SQL = [
+    "UPDATE ingredient_aliases SET ingredient_id = :target WHERE ingredient_id = :source",
+    "UPDATE ingredients SET ingredient_id = :target WHERE ingredient_id = :source",
+    "DELETE FROM ingredient_catalog WHERE id = :source",
+]
+
+
+def normalize_name(name: str) -> str:
+    """Ключ продукта: регистр, ё и лишние пробелы не важны"""
+    return " ".join(name.lower().replace("ё", "е").split())
+
+
+def unit_key(unit: str) -> str:
+    """Ключ единицы: без регистра, пробелов и точек ("Ст. л." -> "стл")"""
+    return re.sub(r"[\s.]", "", unit.lower().replace("ё", "е"))
+
+
+def _number(value: str) -> Optional[float]:
+    if "/" not in value:
+        return float(value)
+    numerator, denominator = value.split("/")
+    return float(numerator) / int(denominator) if int(denominator) else None
+
+
+def parse_amount(amount: str) -> Optional[float]:
+    """Число из текста количества; None, если количество не числовое"""
+    value = amount.strip().replace(",", ".")
+    for fraction, replacement in FRACTIONS.items():
+        value = value.replace(fraction, f" {replacement}")
+    match = AMOUNT_PATTERN.match(value.strip())
+    if match is None:
+        return None
+    whole, low, high = match.groups()
+    low = _number(low)
+    if low is None:
+        return None
+    if whole:
+        low += int(whole)
+    if high is None:
+        return low
+    high = _number(high)
+    return None if high is None else (low + high) / 2
+
+
+@lru_cache(maxsize=4096)
+def parse_quantity(amount: str, unit: str) -> Tuple[Optional[float], Optional[str]]:
+    """(количество, базовая единица) для amount/unit; единица None - количество в unit"""
+    value = parse_amount(amount)
+    if value is None:
+        return None, None
+    base = UNITS.get(unit_key(unit))
+    if base is None:
+        return value, None
+    base_unit, factor = base
+    return value * factor, base_unit
+
+
+def _resolve_params(names: Iterable[str]) -> dict:
+    names = list(dict.fromkeys(names))
+    return {"names": names, "keys": [normalize_name(name) for name in names]}
+
+
+def _name_ids(params: dict, rows) -> Dict[str, int]:
+    ids = dict(rows)
+    return {name: ids[key] for name, key in zip(params["names"], params["keys"]) if key in ids}
+
+
+async def resolve_ingredient_ids(db: AsyncSession, names: Iterable[str]) -> Dict[str, int]:
+    """id справочника для названий, новые названия добавляются: {название: id}"""
+    params = _resolve_params(names)
+    result: Dict[str, int] = {}
+    for _ in range(2):
+        result.update(_name_ids(params, (await db.execute(text(RESOLVE_SQL), params)).all()))
+        if len(result) == len(params["names"]):
+            break
+    return result
+
+
+def resolve_ingredient_ids_sync(connection, names: Iterable[str]) -> Dict[str, int]:
+    """То же, что resolve_ingredient_ids, для синхронных Session или Connection"""
+    params = _resolve_params(names)
+    result: Dict[str, int] = {}
+    for _ in range(2):
+        result.update(_name_ids(params, connection.execute(text(RESOLVE_SQL), params).all()))
+        if len(result) == len(params["names"]):
+            break
+    return result
+
+
+def fill_ingredient_catalog(connection) -> int:
+    """Заполнить ingredient_id и количество у строк без ingredient_id.
+
+    connection - синхронные Session или Connection. Возвращает число
+    заполненных строк.
+    """
+    names = [row[0] for row in connection.execute(text(UNRESOLVED_NAMES_SQL))]
+    if not names:
+        return 0
+    ids = resolve_ingredient_ids_sync(connection, names)
+
+    amounts: List[Tuple[str, str]] = connection.execute(text(UNRESOLVED_AMOUNTS_SQL)).all()
+    quantities = [parse_quantity(amount, unit) for amount, unit in amounts]
+    result = connection.execute(text(FILL_SQL), {
+        "names": list(ids),
+        "ids": list(ids.values()),
+        "amounts": [amount for amount, _ in amounts],
+        "units": [unit for _, unit in amounts],
+        "quantities": [quantity for quantity, _ in quantities],
+        "base_units": [base_unit for _, base_unit in quantities],
+    })
+    return result.rowcount
+
+
+def merge_ingredients(connection, target_name: str, alias_name: str) -> int:
+    """Считать alias_name тем же ингредиентом, что target_name.
+
+    Если alias_name уже в справочнике, его строки ingredients и алиасы
+    переходят к target_name, а запись удаляется. Возвращает id target_name.
+    """
+    ids = resolve_ingredient_ids_sync(connection, [target_name, alias_name])
+    target, source = ids[target_name], ids[alias_name]
+    if source != target:
+        for statement in MERGE_SQL:
+            connection.execute(text(statement), {"target": target, "source": source})
+    return target
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Справочник ингредиентов")
+    subparsers = parser.add_subparsers(dest="command")
+    merge_parser = subparsers.add_parser("merge", help="объявить второе название алиасом первого")
+    merge_parser.add_argument("target", help="основное название")
+    merge_parser.add_argument("alias", help="название-алиас")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.command == "merge":
+            print(f"Объединение ингредиентов: {args.alias!r} -> {args.target!r}...")
+            ingredient_id = merge_ingredients(db, args.target, args.alias)
+            db.commit()
+            print(f"Готово, id ингредиента: {ingredient_id}")
+        else:
+            print("Заполнение справочника ингредиентов...")
+            filled = fill_ingredient_catalog(db)
+            db.commit()
+            print(f"Готово, заполнено строк ингредиентов: {filled}")
+    except Exception as e:
+        db.rollback()
+        print(f"Ошибка справочника ингредиентов: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db.close()
@@ -0,0 +1,231 @@
+"""
+Учет SQL-запросов по HTTP-запросам
+
+События engine (before/after_cursor_execute) считают запросы, суммарное
+время в БД и самый медленный запрос текущего HTTP-запроса. Статистика
+лежит в contextvar: SQLAlchemy выполняет async-запросы в greenlet с
+контекстом вызывающей корутины, run_in_threadpool копирует контекст,
+поэтому события видят статистику своего запроса.
+
+ASGI-middleware отдает итог в заголовке Server-Timing и в строке лога
+(logfmt, те же поля - в extra записи лога). Медленные запросы
+(SLOW_QUERY_MS) пишутся в лог с нормализованным SQL и маршрутом.
+Бюджет запросов на маршрут (SQL_QUERY_BUDGETS) - предупреждение в лог
+при превышении.
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+import logging
+import os
+import re
+import sys
+import time
+
+from sqlalchemy import event
+
+REQUEST_LOG_ENABLED = os.getenv("REQUEST_LOG_ENABLED", "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))  # 0 - не писать медленные запросы
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", 0))  # бюджет по умолчанию, 0 - без бюджета
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+logger = logging.getLogger("vibecoders")
+sql_logger = logging.getLogger("vibecoders.sql")
+request_logger = logging.getLogger("vibecoders.request")
+
+MAX_LOGGED_SQL_LENGTH = 2000
+
+# Позиция параметра: $1 / $1::INTEGER (asyncpg), %(name)s (psycopg2) или ? после замены литералов
+_PLACEHOLDER = r"\s*(?:\$\d+(?:::\w+)?|%\(\w+\)s|\?)\s*"
+_PLACEHOLDER_LIST_RE = re.compile(rf"\((?:{_PLACEHOLDER},)+{_PLACEHOLDER}\)")
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL_RE = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def parse_budgets(value: str) -> Dict[str, int]:
+    """SQL_QUERY_BUDGETS: "GET /api/recipes=2,GET /api/recipes/{recipe_id}=4" """
+    budgets = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        route, sep, limit = item.rpartition("=")
+        if not sep or not route.strip():
+            raise ValueError(f"Invalid SQL_QUERY_BUDGETS entry: {item!r}, expected 'METHOD /path=N'")
+        budgets[" ".join(route.split())] = int(limit)
+    return budgets
+
+
+SQL_QUERY_BUDGETS = parse_budgets(os.getenv("SQL_QUERY_BUDGETS", ""))
+
+
+def logfmt(event_name: str, fields: dict) -> str:
+    """Строка лога key=value; строки с пробелами - в кавычках"""
+    parts = [f"event={event_name}"]
+    for name, value in fields.items():
+        if isinstance(value, str) and (" " in value or '"' in value or not value):
+            value = '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        parts.append(f"{name}={value}")
+    return " ".join(parts)
+
+
+def normalize_sql(statement: str) -> str:
+    """SQL без литералов и с одной позицией вместо списков параметров IN (...)"""
+    statement = _WHITESPACE_RE.sub(" ", statement).strip()
+    statement = _STRING_LITERAL_RE.sub("?", statement)
+    statement = _NUMBER_LITERAL_RE.sub("?", statement)
+    statement = _PLACEHOLDER_LIST_RE.sub("(...)", statement)
+    return statement[:MAX_LOGGED_SQL_LENGTH]
+
+
+@dataclass
+class RequestStats:
+    """SQL-статистика одного HTTP-запроса"""
+    method: str
+    scope: dict = field(repr=False)
+    queries: int = 0
+    db_time: float = 0.0
+    slowest_time: float = 0.0
+    slowest_sql: Optional[str] = None
+
+    @property
+    def route(self) -> str:
+        """Шаблон маршрута ("/api/recipes/{recipe_id}"), известен после роутинга"""
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "-")
+
+    def record(self, statement: str, duration: float):
+        self.queries += 1
+        self.db_time += duration
+        if duration > self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_sql = statement
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    """Статистика текущего HTTP-запроса или None вне запроса (скрипты, старт)"""
+    return _request_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    if SLOW_QUERY_MS and duration * 1000 >= SLOW_QUERY_MS:
+        fields = {
+            "route": f"{stats.method} {stats.route}" if stats else "-",
+            "duration_ms": round(duration * 1000, 1),
+            "sql": normalize_sql(statement),
+        }
+        sql_logger.warning(logfmt("slow_query", fields), extra=fields)
+
+
+def _handle_error(exception_context):
+    # Запрос упал: after_cursor_execute не будет, снимаем время начала
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def install_sql_instrumentation(*engines):
+    """Подписаться на события engine (для AsyncEngine - его sync_engine)"""
+    for engine in engines:
+        engine = getattr(engine, "sync_engine", engine)
+        if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+            event.listen(engine, "handle_error", _handle_error)
+
+
+def configure_logging():
+    """Вывод логов приложения в stderr, если логирование не настроено снаружи"""
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+
+
+def server_timing(stats: RequestStats, total: float) -> str:
+    """Значение заголовка Server-Timing"""
+    parts = [f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"']
+    if stats.queries:
+        parts.append(f"db-slowest;dur={stats.slowest_time * 1000:.1f}")
+    parts.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def query_budget(route: str) -> int:
+    return SQL_QUERY_BUDGETS.get(route, SQL_QUERY_BUDGET)
+
+
+def log_request(stats: RequestStats, status: Optional[int], total: float):
+    """Итог запроса в лог и проверка бюджета запросов маршрута"""
+    route = f"{stats.method} {stats.route}"
+    fields = {
+        "route": route,
+        "status": status,
+        "duration_ms": round(total * 1000, 1),
+        "db_queries": stats.queries,
+        "db_ms": round(stats.db_time * 1000, 1),
+        "db_slowest_ms": round(stats.slowest_time * 1000, 1),
+    }
+    if REQUEST_LOG_ENABLED:
+        request_logger.info(logfmt("request", fields), extra=fields)
+
+    budget = query_budget(route)
+    if budget and stats.queries > budget:
+        fields.update(budget=budget, sql=normalize_sql(stats.slowest_sql or ""))
+        request_logger.warning(logfmt("query_budget_exceeded", fields), extra=fields)
+
+
+class SQLInstrumentationMiddleware:
+    """ASGI-middleware: статистика SQL на запрос, Server-Timing и лог.
+
+    Чистый ASGI, а не BaseHTTPMiddleware: приложение выполняется в той же
+    задаче, поэтому contextvar виден обработчику и потоковым ответам.
+    Заголовок отражает запросы до начала ответа, строка лога - все,
+    включая выполненные во время потоковой отдачи тела.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(method=scope["method"], scope=scope)
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = None
+        logged = False
+
+        async def send_with_timing(message):
+            nonlocal status, logged
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(stats, time.perf_counter() - started).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and not logged:
+                logged = True
+                log_request(stats, status, time.perf_counter() - started)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if not logged:
+                log_request(stats, status or 500, time.perf_counter() - started)
+            _request_stats.reset(token)
@@ -1,21 +1,73 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
-from datetime import date, datetime
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic_core import to_json
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import ARRAY, Date, Integer, cast, delete, distinct, func, select, union_all, update
+from typing import Awaitable, Callable, Iterable, List, Literal, Optional
+from datetime import date, datetime, timedelta
+import asyncio
 import os
 
-from database import get_db, init_db
-from models import Recipe, Ingredient, Step, Review, MenuPlan
+from cache import (
+    RECIPE_LIST_TAG,
+    cache_key,
+    commit_and_invalidate,
+    etag_matches,
+    listen_invalidations,
+    recipe_tag,
+    response_cache,
+)
+from database import AsyncSessionLocal, async_engine, engine, get_async_db, pool_stats, warm_up_pool
+from db_init import init_database
+from images import (
+    IMAGE_MAX_BYTES,
+    IMMUTABLE_CACHE_CONTROL,
+    MEDIA_TYPES,
+    ImageError,
+    ensure_thumbnail,
+    image_path,
+    image_url,
+    is_image_key,
+    normalize_image_value,
+    store_image,
+    thumbnail_url,
+)
+from ingest import IngestError, ingest_records, json_array_records, ndjson_records
+from ingredient_catalog import BASE_UNIT_LABELS
+from instrumentation import SQLInstrumentationMiddleware, configure_logging, install_sql_instrumentation, logger
+from menu_generator import MenuGenerationError, SlotRule, generate_menu, menu_catalog
+from menu_summary import refresh_menu_summaries
+import metrics
+from pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, keyset_condition, order_clauses, page_size
+from pantry import pantry_index
+from ratings import rating_update_values
+from search import search_filter
+from serialization import dumps, json_response
+from sync import SYNC_BATCH_SIZE, make_sync_token, parse_sync_token, sync_horizon
+from models import Recipe, Ingredient, IngredientCatalog, Step, Review, MenuPlan, MenuDaySummary, recipe_rating_sort_key
 from schemas import (
     RecipeResponse,
     RecipeListItem,
     RecipeCreate,
+    RecipeBatchRequest,
+    RecipeImportResult,
+    RecipeSyncItem,
+    RecipeMatchItem,
+    PantryMatchRequest,
+    ImageUploadResponse,
     ReviewCreate,
     ReviewResponse,
+    ReviewPage,
     MenuPlanCreate,
+    MenuPlanBulkRequest,
+    MenuGenerateRequest,
     MenuPlanResponse,
+    MenuSummaryItem,
+    ShoppingListItem,
 )
 
 app = FastAPI(
@@ -23,6 +75,7 @@ app = FastAPI(
     description="Backend API for VibeCoders Solution",
     version="1.0.0"
 )
+app.state.ready = False
 
 # CORS middleware для работы с Expo
 app.add_middleware(
@@ -31,34 +84,218 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Sync-Token", "Server-Timing"],
 )
 
+# Число SQL-запросов и время в БД на запрос: Server-Timing, лог, медленные запросы
+configure_logging()
+install_sql_instrumentation(engine, async_engine)
+app.add_middleware(SQLInstrumentationMiddleware)
+
+# Метрики Prometheus: GET /metrics
+if metrics.METRICS_ENABLED:
+    metrics.instrument_pool(async_engine, "async")
+    metrics.instrument_pool(engine, "sync")
+    metrics.register_pool_stats(pool_stats)
+    metrics.register_cache("response", response_cache.stats)
+    metrics.register_cache("pantry", pantry_index.stats)
+    metrics.register_cache("menu_catalog", menu_catalog.stats)
+    app.add_middleware(metrics.MetricsMiddleware)
+
+
+# Создавать таблицы и тестовые данные при старте (для разработки; в продакшене - db_init.py)
+AUTO_INIT_DB = os.getenv("AUTO_INIT_DB", "false").lower() in ("1", "true", "yes")
+
+# Пауза между попытками прогреть пул, если БД недоступна при старте
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", 1))
+
+# Слоты приема пищи в MenuPlan
+MEAL_SLOTS = ("breakfast", "lunch", "dinner", "extra")
+
+# Максимальное число рецептов в одном batch-запросе
+MAX_BATCH_IDS = int(os.getenv("MAX_BATCH_IDS", 500))
+
+# Максимальное число планов в одном bulk-запросе (больше года с запасом)
+MAX_BULK_MENU_PLANS = int(os.getenv("MAX_BULK_MENU_PLANS", 1000))
+
+# Сортировки списка рецептов: [(выражение, по убыванию)], id - последний ключ
+RECIPE_SORTS = {
+    "id": [(Recipe.id, False)],
+    "rating": [(recipe_rating_sort_key, True), (Recipe.id, False)],
+    "cook_time": [(Recipe.cook_time, False), (Recipe.id, False)],
+}
+
+# Отзывы отдаются от новых к старым
+REVIEW_SORT = [(Review.id, True)]
+
+# Индексы каталога в памяти процесса: прогреваются при старте, сбрасываются импортом
+RECIPE_INDEXES = (pantry_index, menu_catalog)
+
+
+# ========== Helpers ==========
+
+def recipe_list_query(recipe_ids: Optional[List[int]] = None):
+    """Запрос колонок RecipeListItem; рейтинг берется из агрегата на recipes"""
+    query = select(
+        Recipe.id,
+        Recipe.title,
+        Recipe.category,
+        Recipe.cook_time,
+        Recipe.servings,
+        Recipe.image,
+        Recipe.calories_per_serving,
+        Recipe.rating
+    )
+    if recipe_ids is not None:
+        query = query.where(Recipe.id.in_(recipe_ids))
+    return query
+
+
+def to_recipe_list_item(row) -> dict:
+    """Строка из recipe_list_query -> RecipeListItem в виде словаря (без валидации)"""
+    return {
+        "id": row.id,
+        "title": row.title,
+        "category": row.category,
+        "cook_time": row.cook_time,
+        "servings": row.servings,
+        "image": thumbnail_url(row.image),
+        "calories_per_serving": row.calories_per_serving,
+        "rating": row.rating
+    }
+
+
+async def get_recipe_list_items(db: AsyncSession, recipe_ids: List[int]) -> dict:
+    """Получить RecipeListItem для набора id одним запросом: {id: словарь RecipeListItem}"""
+    if not recipe_ids:
+        return {}
+    rows = (await db.execute(recipe_list_query(list(set(recipe_ids))))).all()
+    return {row.id: to_recipe_list_item(row) for row in rows}
+
+
+def to_recipe_response(recipe: Recipe, with_reviews: bool = True) -> RecipeResponse:
+    """Преобразовать Recipe с загруженными связями в RecipeResponse"""
+    recipe_dict = {
+        "id": recipe.id,
+        "title": recipe.title,
+        "category": recipe.category,
+        "cook_time": recipe.cook_time,
+        "servings": recipe.servings,
+        "image": recipe.image,
+        "calories_per_serving": recipe.calories_per_serving,
+        "rating": recipe.rating,
+        "ingredients": recipe.ingredients,
+        "steps": recipe.steps,
+        "reviews": recipe.reviews if with_reviews else [],
+        "reviews_total": recipe.rating_count
+    }
+    return RecipeResponse(**recipe_dict)
+
+
+def menu_plan_recipe_ids(plan) -> List[Optional[int]]:
+    """id рецептов плана в порядке MEAL_SLOTS"""
+    return [getattr(plan, f"{slot}_recipe_id") for slot in MEAL_SLOTS]
+
+
+async def build_menu_plan_responses(
+    db: AsyncSession,
+    plans: List[MenuPlan],
+    items: Optional[dict] = None
+) -> List[dict]:
+    """Собрать MenuPlanResponse (словари для json_response) для списка планов.
+
+    Все рецепты, на которые ссылаются планы, загружаются одним запросом,
+    поэтому число запросов не зависит от длины диапазона. Уже загруженные
+    рецепты можно передать через items.
+    """
+    if items is None:
+        recipe_ids = {rid for plan in plans for rid in menu_plan_recipe_ids(plan) if rid}
+        items = await get_recipe_list_items(db, list(recipe_ids))
+    
+    # Порядок ключей - как у полей MenuPlanResponse
+    result = []
+    for plan in plans:
+        recipe_ids = menu_plan_recipe_ids(plan)
+        plan_dict = {"date": plan.date, "user_id": plan.user_id}
+        for slot, recipe_id in zip(MEAL_SLOTS, recipe_ids):
+            plan_dict[f"{slot}_recipe_id"] = recipe_id
+        plan_dict["id"] = plan.id
+        for slot, recipe_id in zip(MEAL_SLOTS, recipe_ids):
+            plan_dict[f"{slot}_recipe"] = items.get(recipe_id)
+        result.append(plan_dict)
+    return result
+
+
+async def cached_json_response(
+    request: Request,
+    tags: Iterable[str],
+    build: Callable[[], Awaitable]
+) -> Response:
+    """JSON-ответ из кэша ответов с поддержкой ETag / If-None-Match.
+
+    build возвращает (данные, заголовки) и вызывается только при промахе;
+    заголовки кэшируются вместе с телом, исключения (например 404) - нет.
+    """
+    key = cache_key(request)
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation
+        payload, extra_headers = await build()
+        entry = response_cache.set(key, dumps(payload), tags, headers=extra_headers, generation=generation)
+    
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", **entry.headers}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+async def warm_up():
+    """Прогреть пул соединений; до успеха /ready отвечает 503, при ошибке - повтор"""
+    while True:
+        try:
+            await warm_up_pool()
+            app.state.ready = True
+            break
+        except Exception as e:
+            logger.warning("Пул соединений не прогрет, повтор через %s с: %s", WARMUP_RETRY_SECONDS, e)
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+    
+    # Индексы каталога; если не собрались, их соберет первый запрос
+    try:
+        async with AsyncSessionLocal() as db:
+            for index in RECIPE_INDEXES:
+                await index.refresh(db)
+    except Exception as e:
+        logger.warning("Индексы каталога не собраны: %s", e)
+
 
 @app.on_event("startup")
 async def startup_event():
-    """Инициализация БД при старте приложения"""
-    try:
-        init_db()
-        print("База данных инициализирована")
-        
-        # Заполняем БД тестовыми данными, если она пустая
-        from sqlalchemy.orm import Session
-        from database import SessionLocal
-        
-        db = SessionLocal()
+    """Старт воркера: без запросов к БД, пул прогревается в фоне.
+
+    Таблицы и тестовые данные создаются командой python db_init.py --seed;
+    AUTO_INIT_DB=true делает это при старте (для разработки).
+    """
+    if AUTO_INIT_DB:
         try:
-            recipe_count = db.query(Recipe).count()
-            if recipe_count == 0:
-                print("База данных пустая, заполняем тестовыми данными...")
-                from seed_data import seed_database
-                seed_database()
-                print("Тестовые данные добавлены")
-            else:
-                print(f"В базе данных уже есть {recipe_count} рецептов")
-        finally:
-            db.close()
-    except Exception as e:
-        print(f"Ошибка при инициализации БД: {e}")
+            await run_in_threadpool(init_database, True)
+        except Exception as e:
+            print(f"Ошибка при инициализации БД: {e}")
+    
+    app.state.warm_up_task = asyncio.create_task(warm_up())
+    app.state.cache_listener_task = None
+    if response_cache.enabled:
+        app.state.cache_listener_task = asyncio.create_task(listen_invalidations())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Перестать принимать трафик и закрыть соединения пула"""
+    app.state.ready = False
+    app.state.warm_up_task.cancel()
+    if app.state.cache_listener_task is not None:
+        app.state.cache_listener_task.cancel()
+    await async_engine.dispose()
 
 
 @app.get("/")
@@ -75,106 +312,332 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Готовность принимать трафик: пул соединений прогрет"""
+    if not app.state.ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
+
+
+@app.get("/health/pool")
+async def health_pool():
+    """Статистика пула соединений с БД"""
+    return pool_stats()
+
+
+@app.get("/health/cache")
+async def health_cache():
+    """Статистика кэша ответов"""
+    return response_cache.stats()
+
+
+@app.get("/health/pantry")
+async def health_pantry():
+    """Размер индекса подбора рецептов по продуктам"""
+    return pantry_index.stats()
+
+
+@app.get("/health/menu-catalog")
+async def health_menu_catalog():
+    """Размер каталога генератора меню"""
+    return menu_catalog.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Метрики в текстовом формате Prometheus"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 # ========== Recipe Endpoints ==========
 
 @app.get("/api/recipes", response_model=List[RecipeListItem])
 async def get_recipes(
+    request: Request,
     category: Optional[str] = Query(None, description="Фильтр по категории"),
     search: Optional[str] = Query(None, description="Поисковый запрос"),
-    db: Session = Depends(get_db)
+    order_by: Optional[Literal["id", "rating", "cook_time"]] = Query(
+        None, description="Сортировка; по умолчанию id, при поиске - по релевантности"
+    ),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Получить список рецептов с фильтрацией по категории и поиску.
+
+    Без limit и cursor возвращается весь список, как до пагинации. С limit
+    или cursor - одна страница; курсор следующей страницы возвращается в
+    заголовке X-Next-Cursor, на последней странице заголовка нет.
+    """
+    async def build():
+        items, next_cursor = await list_recipes(db, category, search, order_by, limit, cursor)
+        return items, ({"X-Next-Cursor": next_cursor} if next_cursor else {})
+    
+    return await cached_json_response(request, [RECIPE_LIST_TAG], build)
+
+
+async def list_recipes(
+    db: AsyncSession,
+    category: Optional[str],
+    search: Optional[str],
+    order_by: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
 ):
-    """Получить список рецептов с фильтрацией по категории и поиску"""
-    query = db.query(Recipe)
+    """Страница списка рецептов с фильтрами (без кэша): (рецепты, курсор следующей страницы).
+
+    Без limit и cursor - весь список одним ответом и без курсора.
+    """
+    query = recipe_list_query()
+    sort = order_by or "id"
+    columns = RECIPE_SORTS[sort]
     
     # Фильтр по категории
     if category and category != "Все":
-        query = query.filter(Recipe.category == category)
-    
-    # Поиск по названию или ингредиентам
-    if search:
-        search_lower = search.lower()
-        # Поиск по названию
-        query = query.filter(
-            Recipe.title.ilike(f"%{search_lower}%")
-        )
-        # Или поиск по ингредиентам (через подзапрос)
-        ingredient_ids = db.query(Ingredient.recipe_id).filter(
-            Ingredient.name.ilike(f"%{search_lower}%")
-        ).distinct()
-        query = query.filter(
-            (Recipe.title.ilike(f"%{search_lower}%")) |
-            (Recipe.id.in_(ingredient_ids))
-        )
+        query = query.where(Recipe.category == category)
     
-    recipes = query.order_by(Recipe.id).all()
+    # Поиск по названию или ингредиентам; без явной сортировки - по релевантности
+    if search and search.strip():
+        condition, rank = search_filter(search)
+        query = query.where(condition)
+        if order_by is None:
+            sort = "relevance"
+            columns = [(rank, True), (Recipe.id, False)]
     
-    # Вычисляем рейтинг для каждого рецепта
-    result = []
-    for recipe in recipes:
-        # Подсчитываем средний рейтинг из отзывов
-        avg_rating = db.query(func.avg(Review.rating)).filter(
-            Review.recipe_id == recipe.id
-        ).scalar()
-        
-        recipe_dict = {
-            "id": recipe.id,
-            "title": recipe.title,
-            "category": recipe.category,
-            "cook_time": recipe.cook_time,
-            "servings": recipe.servings,
-            "image": recipe.image,
-            "calories_per_serving": recipe.calories_per_serving,
-            "rating": float(avg_rating) if avg_rating else None
-        }
-        result.append(RecipeListItem(**recipe_dict))
+    # Ключи сортировки выбираются вместе со строками, из них собирается курсор
+    query = query.add_columns(*[column.label(f"sort_key_{i}") for i, (column, _) in enumerate(columns)])
+    if cursor:
+        query = query.where(keyset_condition(columns, decode_cursor(cursor, sort)))
+    
+    query = query.order_by(*order_clauses(columns))
+    if limit is None and cursor is None:
+        rows = (await db.execute(query)).all()
+        return [to_recipe_list_item(row) for row in rows], None
+    
+    # Лишняя строка показывает, есть ли следующая страница
+    size = page_size(limit)
+    rows = (await db.execute(query.limit(size + 1))).all()
+    
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]._mapping
+        next_cursor = encode_cursor(sort, [last[f"sort_key_{i}"] for i in range(len(columns))])
+    
+    return [to_recipe_list_item(row) for row in rows], next_cursor
+
+
+@app.post("/api/recipes/import", response_model=RecipeImportResult)
+async def import_recipes(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Массовый импорт рецептов (RecipeCreate).
+
+    Тело - NDJSON (по рецепту на строку, читается потоком) или JSON-массив
+    при Content-Type: application/json. Плохие записи не прерывают импорт,
+    а возвращаются в errors с номером записи.
+    """
+    if request.headers.get("content-type", "").startswith("application/json"):
+        records = json_array_records(await request.body())
+    else:
+        records = ndjson_records(request.stream())
+    
+    try:
+        result = await ingest_records(db, records)
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # Пачки коммитятся по ходу импорта, поэтому список сбрасывается и при ошибке;
+        # незакоммиченная пачка откатывается, чтобы не попасть в коммит уведомления
+        await db.rollback()
+        await commit_and_invalidate(db, RECIPE_LIST_TAG)
+        for index in RECIPE_INDEXES:
+            index.mark_stale()
     
     return result
 
 
-@app.get("/api/recipes/{recipe_id}", response_model=RecipeResponse)
-async def get_recipe(recipe_id: int, db: Session = Depends(get_db)):
-    """Получить детали рецепта по ID"""
-    recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
-    if not recipe:
-        raise HTTPException(status_code=404, detail="Recipe not found")
+def parse_batch_ids(ids: str) -> List[int]:
+    """Разобрать список id вида "1,2,3" из query-параметра"""
+    try:
+        return [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+
+
+async def get_recipe_responses(
+    db: AsyncSession,
+    recipe_ids: List[int],
+    with_reviews: bool = True
+) -> List[RecipeResponse]:
+    """Полные рецепты в порядке recipe_ids (без дублей и отсутствующих id).
+
+    Ингредиенты, шаги и отзывы подгружаются через selectinload, поэтому
+    на любой размер пачки уходит 4 запроса (3 без отзывов).
+    """
+    if len(recipe_ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many ids, maximum is {MAX_BATCH_IDS}"
+        )
+    if not recipe_ids:
+        return []
     
-    # Вычисляем средний рейтинг
-    avg_rating = db.query(func.avg(Review.rating)).filter(
-        Review.recipe_id == recipe.id
-    ).scalar()
+    options = [selectinload(Recipe.ingredients), selectinload(Recipe.steps)]
+    if with_reviews:
+        options.append(selectinload(Recipe.reviews))
+    result = await db.execute(
+        select(Recipe).where(Recipe.id.in_(set(recipe_ids))).options(*options)
+    )
+    recipes = result.scalars().all()
+    by_id = {recipe.id: recipe for recipe in recipes}
     
-    # Загружаем связанные данные
-    db.refresh(recipe)
+    ordered_ids = dict.fromkeys(recipe_ids)
+    return [to_recipe_response(by_id[rid], with_reviews) for rid in ordered_ids if rid in by_id]
+
+
+async def get_review_page(
+    db: AsyncSession,
+    recipe_id: int,
+    total: int,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> ReviewPage:
+    """Страница отзывов рецепта; total - число отзывов из агрегата на recipes"""
+    query = select(Review).where(Review.recipe_id == recipe_id)
+    if cursor:
+        query = query.where(keyset_condition(REVIEW_SORT, decode_cursor(cursor, "reviews")))
     
-    recipe_dict = {
-        "id": recipe.id,
-        "title": recipe.title,
-        "category": recipe.category,
-        "cook_time": recipe.cook_time,
-        "servings": recipe.servings,
-        "image": recipe.image,
-        "calories_per_serving": recipe.calories_per_serving,
-        "rating": float(avg_rating) if avg_rating else None,
-        "ingredients": recipe.ingredients,
-        "steps": recipe.steps,
-        "reviews": recipe.reviews
-    }
+    size = page_size(limit)
+    reviews = (await db.execute(
+        query.order_by(*order_clauses(REVIEW_SORT)).limit(size + 1)
+    )).scalars().all()
     
-    return RecipeResponse(**recipe_dict)
+    next_cursor = None
+    if len(reviews) > size:
+        reviews = reviews[:size]
+        next_cursor = encode_cursor("reviews", [reviews[-1].id])
+    
+    return ReviewPage(items=reviews, total=total, next_cursor=next_cursor)
+
+
+@app.get("/api/recipes/batch", response_model=List[RecipeResponse])
+async def get_recipes_batch(
+    ids: str = Query(..., description="id рецептов через запятую"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Получить детали нескольких рецептов за один запрос"""
+    return json_response(await get_recipe_responses(db, parse_batch_ids(ids)))
+
+
+@app.post("/api/recipes/batch", response_model=List[RecipeResponse])
+async def post_recipes_batch(
+    batch: RecipeBatchRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Получить детали нескольких рецептов; вариант для длинных списков id"""
+    return json_response(await get_recipe_responses(db, batch.ids))
+
+
+@app.post("/api/recipes/match", response_model=List[RecipeMatchItem])
+async def match_recipes(
+    match: PantryMatchRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Что приготовить из имеющихся продуктов.
+
+    Рецепты хотя бы с одним продуктом из ingredients, по доле имеющихся
+    продуктов (затем меньше недостающих, затем id), с недостающими
+    продуктами в missing. Названия сравниваются без учета регистра.
+    """
+    await pantry_index.refresh(db)
+    matches = pantry_index.match(match.ingredients, match.category, match.max_cook_time, page_size(match.limit))
+    items = await get_recipe_list_items(db, [m.recipe_id for m in matches])
+    
+    return json_response([
+        {
+            **items[m.recipe_id],
+            "matched": m.matched,
+            "total": m.total,
+            "coverage": round(m.coverage, 4),
+            "missing": m.missing
+        }
+        for m in matches
+        if m.recipe_id in items
+    ])
+
+
+@app.get("/api/recipes/{recipe_id}", response_model=RecipeResponse)
+async def get_recipe(
+    request: Request,
+    recipe_id: int,
+    reviews_limit: Optional[int] = Query(
+        None, ge=1, le=MAX_PAGE_SIZE, description="Отдать только первую страницу отзывов"
+    ),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Получить детали рецепта по ID.
+
+    С reviews_limit отдается только первая страница отзывов, следующие
+    страницы - через /api/recipes/{recipe_id}/reviews с reviews_next_cursor.
+    """
+    async def build():
+        recipes = await get_recipe_responses(db, [recipe_id], with_reviews=reviews_limit is None)
+        if not recipes:
+            raise HTTPException(status_code=404, detail="Recipe not found")
+        recipe = recipes[0]
+        if reviews_limit is not None:
+            page = await get_review_page(db, recipe_id, recipe.reviews_total, reviews_limit)
+            recipe = recipe.model_copy(update={"reviews": page.items, "reviews_next_cursor": page.next_cursor})
+        return recipe, {}
+    
+    return await cached_json_response(request, [recipe_tag(recipe_id)], build)
+
+
+@app.get("/api/recipes/{recipe_id}/reviews", response_model=ReviewPage)
+async def get_reviews(
+    request: Request,
+    recipe_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор из next_cursor предыдущей страницы"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Получить страницу отзывов рецепта, от новых к старым"""
+    async def build():
+        total = (await db.execute(
+            select(Recipe.rating_count).where(Recipe.id == recipe_id)
+        )).scalar_one_or_none()
+        if total is None:
+            raise HTTPException(status_code=404, detail="Recipe not found")
+        return await get_review_page(db, recipe_id, total, limit, cursor), {}
+    
+    return await cached_json_response(request, [recipe_tag(recipe_id)], build)
 
 
 @app.post("/api/recipes/{recipe_id}/reviews", response_model=ReviewResponse)
 async def add_review(
     recipe_id: int,
     review: ReviewCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Добавить отзыв к рецепту"""
-    # Проверяем существование рецепта
-    recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
-    if not recipe:
+    # Обновляем агрегат рейтинга в той же транзакции, что и вставку отзыва.
+    # UPDATE блокирует строку рецепта и заодно проверяет его существование.
+    result = await db.execute(
+        update(Recipe)
+        .where(Recipe.id == recipe_id)
+        .values(rating_update_values(review.rating))
+    )
+    if not result.rowcount:
         raise HTTPException(status_code=404, detail="Recipe not found")
     
+    # Фото отзыва сохраняется в хранилище изображений, в БД - только ключ
+    try:
+        image = await run_in_threadpool(normalize_image_value, review.image)
+    except ImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     # Создаем новый отзыв
     new_review = Review(
         recipe_id=recipe_id,
@@ -182,12 +645,12 @@ async def add_review(
         rating=review.rating,
         comment=review.comment,
         date=review.date,
-        image=review.image
+        image=image
     )
     
     db.add(new_review)
-    db.commit()
-    db.refresh(new_review)
+    await commit_and_invalidate(db, recipe_tag(recipe_id), RECIPE_LIST_TAG)
+    metrics.reviews_created.inc()
     
     return ReviewResponse(
         id=new_review.id,
@@ -206,142 +669,118 @@ async def add_review(
 async def get_menu_plans(
     start_date: Optional[date] = Query(None, description="Начальная дата"),
     end_date: Optional[date] = Query(None, description="Конечная дата"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получить меню планы с фильтрацией по дате"""
-    query = db.query(MenuPlan)
+    query = select(MenuPlan)
     
     if start_date:
-        query = query.filter(MenuPlan.date >= start_date)
+        query = query.where(MenuPlan.date >= start_date)
     if end_date:
-        query = query.filter(MenuPlan.date <= end_date)
+        query = query.where(MenuPlan.date <= end_date)
     
-    menu_plans = query.order_by(MenuPlan.date).all()
+    menu_plans = (await db.execute(query.order_by(MenuPlan.date))).scalars().all()
     
-    result = []
-    for plan in menu_plans:
-        plan_dict = {
-            "id": plan.id,
-            "date": plan.date,
-            "user_id": plan.user_id,
-            "breakfast_recipe_id": plan.breakfast_recipe_id,
-            "lunch_recipe_id": plan.lunch_recipe_id,
-            "dinner_recipe_id": plan.dinner_recipe_id,
-            "extra_recipe_id": plan.extra_recipe_id,
-            "breakfast_recipe": None,
-            "lunch_recipe": None,
-            "dinner_recipe": None,
-            "extra_recipe": None
+    return json_response(await build_menu_plan_responses(db, menu_plans))
+
+
+def summary_period_end(period_start: date, granularity: str) -> date:
+    """Последний день периода, начинающегося с period_start"""
+    if granularity == "week":
+        return period_start + timedelta(days=6)
+    if granularity == "month":
+        next_month = (period_start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return next_month - timedelta(days=1)
+    return period_start
+
+
+@app.get("/api/menu-plans/summary", response_model=List[MenuSummaryItem])
+async def get_menu_summary(
+    start_date: date = Query(..., description="Начальная дата"),
+    end_date: date = Query(..., description="Конечная дата"),
+    granularity: Literal["day", "week", "month"] = Query("day", description="Период сводки (неделя - с понедельника)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Калории, время приготовления и ингредиенты запланированных рецептов по периодам.
+    
+    Агрегируется сводка дней (menu_summary.py): не больше строки на день
+    диапазона, без соединения с рецептами и ингредиентами. Периоды без
+    планов пропускаются.
+    """
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    
+    period = cast(func.date_trunc(granularity, MenuDaySummary.date), Date).label("period")
+    rows = (await db.execute(
+        select(
+            period,
+            func.count().label("days"),
+            func.sum(MenuDaySummary.recipes).label("recipes"),
+            func.sum(MenuDaySummary.calories).label("calories"),
+            func.sum(MenuDaySummary.calories_unknown).label("calories_unknown"),
+            func.sum(MenuDaySummary.cook_time).label("cook_time"),
+            func.sum(MenuDaySummary.ingredients).label("ingredients")
+        )
+        .where(MenuDaySummary.date >= start_date, MenuDaySummary.date <= end_date)
+        .group_by(period)
+        .order_by(period)
+    )).all()
+    
+    return json_response([
+        {
+            "period_start": max(row.period, start_date),
+            "period_end": min(summary_period_end(row.period, granularity), end_date),
+            "days": row.days,
+            "recipes": row.recipes,
+            "calories": row.calories,
+            "calories_unknown": row.calories_unknown,
+            "average_calories": round(row.calories / row.days, 1),
+            "cook_time": row.cook_time,
+            "ingredients": row.ingredients
         }
-        
-        # Загружаем рецепты если они есть
-        if plan.breakfast_recipe:
-            avg_rating = db.query(func.avg(Review.rating)).filter(
-                Review.recipe_id == plan.breakfast_recipe.id
-            ).scalar()
-            plan_dict["breakfast_recipe"] = RecipeListItem(
-                id=plan.breakfast_recipe.id,
-                title=plan.breakfast_recipe.title,
-                category=plan.breakfast_recipe.category,
-                cook_time=plan.breakfast_recipe.cook_time,
-                servings=plan.breakfast_recipe.servings,
-                image=plan.breakfast_recipe.image,
-                calories_per_serving=plan.breakfast_recipe.calories_per_serving,
-                rating=float(avg_rating) if avg_rating else None
-            )
-        
-        if plan.lunch_recipe:
-            avg_rating = db.query(func.avg(Review.rating)).filter(
-                Review.recipe_id == plan.lunch_recipe.id
-            ).scalar()
-            plan_dict["lunch_recipe"] = RecipeListItem(
-                id=plan.lunch_recipe.id,
-                title=plan.lunch_recipe.title,
-                category=plan.lunch_recipe.category,
-                cook_time=plan.lunch_recipe.cook_time,
-                servings=plan.lunch_recipe.servings,
-                image=plan.lunch_recipe.image,
-                calories_per_serving=plan.lunch_recipe.calories_per_serving,
-                rating=float(avg_rating) if avg_rating else None
-            )
-        
-        if plan.dinner_recipe:
-            avg_rating = db.query(func.avg(Review.rating)).filter(
-                Review.recipe_id == plan.dinner_recipe.id
-            ).scalar()
-            plan_dict["dinner_recipe"] = RecipeListItem(
-                id=plan.dinner_recipe.id,
-                title=plan.dinner_recipe.title,
-                category=plan.dinner_recipe.category,
-                cook_time=plan.dinner_recipe.cook_time,
-                servings=plan.dinner_recipe.servings,
-                image=plan.dinner_recipe.image,
-                calories_per_serving=plan.dinner_recipe.calories_per_serving,
-                rating=float(avg_rating) if avg_rating else None
-            )
-        
-        if plan.extra_recipe:
-            avg_rating = db.query(func.avg(Review.rating)).filter(
-                Review.recipe_id == plan.extra_recipe.id
-            ).scalar()
-            plan_dict["extra_recipe"] = RecipeListItem(
-                id=plan.extra_recipe.id,
-                title=plan.extra_recipe.title,
-                category=plan.extra_recipe.category,
-                cook_time=plan.extra_recipe.cook_time,
-                servings=plan.extra_recipe.servings,
-                image=plan.extra_recipe.image,
-                calories_per_serving=plan.extra_recipe.calories_per_serving,
-                rating=float(avg_rating) if avg_rating else None
+        for row in rows
+    ])
+
+
+async def get_plan_recipe_items(db: AsyncSession, plans: List[MenuPlanCreate]) -> dict:
+    """Рецепты, на которые ссылаются планы, одним запросом; 404, если какого-то нет"""
+    recipe_ids = [rid for plan in plans for rid in menu_plan_recipe_ids(plan) if rid]
+    items = await get_recipe_list_items(db, recipe_ids)
+    for recipe_id in recipe_ids:
+        if recipe_id not in items:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Recipe with id {recipe_id} not found"
             )
-        
-        result.append(MenuPlanResponse(**plan_dict))
-    
-    return result
+    return items
 
 
 @app.post("/api/menu-plans", response_model=MenuPlanResponse)
 async def save_menu_plan(
     menu_plan: MenuPlanCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Создать или обновить меню план"""
-    # Проверяем существование рецептов если они указаны
-    recipe_ids = [
-        menu_plan.breakfast_recipe_id,
-        menu_plan.lunch_recipe_id,
-        menu_plan.dinner_recipe_id,
-        menu_plan.extra_recipe_id
-    ]
-    
-    for recipe_id in recipe_ids:
-        if recipe_id:
-            recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
-            if not recipe:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Recipe with id {recipe_id} not found"
-                )
+    # Проверяем существование рецептов одним запросом; найденные
+    # рецепты сразу используются для ответа
+    items = await get_plan_recipe_items(db, [menu_plan])
     
     # Ищем существующий план на эту дату
-    existing_plan = db.query(MenuPlan).filter(
-        MenuPlan.date == menu_plan.date
-    ).first()
+    plan = (await db.execute(
+        select(MenuPlan).where(MenuPlan.date == menu_plan.date)
+    )).scalar_one_or_none()
     
-    if existing_plan:
+    if plan:
         # Обновляем существующий план
-        existing_plan.user_id = menu_plan.user_id
-        existing_plan.breakfast_recipe_id = menu_plan.breakfast_recipe_id
-        existing_plan.lunch_recipe_id = menu_plan.lunch_recipe_id
-        existing_plan.dinner_recipe_id = menu_plan.dinner_recipe_id
-        existing_plan.extra_recipe_id = menu_plan.extra_recipe_id
-        existing_plan.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(existing_plan)
-        plan = existing_plan
+        plan.user_id = menu_plan.user_id
+        plan.breakfast_recipe_id = menu_plan.breakfast_recipe_id
+        plan.lunch_recipe_id = menu_plan.lunch_recipe_id
+        plan.dinner_recipe_id = menu_plan.dinner_recipe_id
+        plan.extra_recipe_id = menu_plan.extra_recipe_id
+        plan.updated_at = datetime.utcnow()
     else:
         # Создаем новый план
-        new_plan = MenuPlan(
+        plan = MenuPlan(
             date=menu_plan.date,
             user_id=menu_plan.user_id,
             breakfast_recipe_id=menu_plan.breakfast_recipe_id,
@@ -349,103 +788,382 @@ async def save_menu_plan(
             dinner_recipe_id=menu_plan.dinner_recipe_id,
             extra_recipe_id=menu_plan.extra_recipe_id
         )
-        db.add(new_plan)
-        db.commit()
-        db.refresh(new_plan)
-        plan = new_plan
-    
-    # Формируем ответ
-    plan_dict = {
-        "id": plan.id,
-        "date": plan.date,
-        "user_id": plan.user_id,
-        "breakfast_recipe_id": plan.breakfast_recipe_id,
-        "lunch_recipe_id": plan.lunch_recipe_id,
-        "dinner_recipe_id": plan.dinner_recipe_id,
-        "extra_recipe_id": plan.extra_recipe_id,
-        "breakfast_recipe": None,
-        "lunch_recipe": None,
-        "dinner_recipe": None,
-        "extra_recipe": None
-    }
+        db.add(plan)
     
-    # Загружаем рецепты
-    if plan.breakfast_recipe:
-        avg_rating = db.query(func.avg(Review.rating)).filter(
-            Review.recipe_id == plan.breakfast_recipe.id
-        ).scalar()
-        plan_dict["breakfast_recipe"] = RecipeListItem(
-            id=plan.breakfast_recipe.id,
-            title=plan.breakfast_recipe.title,
-            category=plan.breakfast_recipe.category,
-            cook_time=plan.breakfast_recipe.cook_time,
-            servings=plan.breakfast_recipe.servings,
-            image=plan.breakfast_recipe.image,
-            calories_per_serving=plan.breakfast_recipe.calories_per_serving,
-            rating=float(avg_rating) if avg_rating else None
+    await db.flush()
+    await refresh_menu_summaries(db, menu_plan.date, menu_plan.date)
+    await db.commit()
+    metrics.menu_plans_written.inc(("single",))
+    
+    return json_response((await build_menu_plan_responses(db, [plan], items))[0])
+
+
+@app.post("/api/menu-plans/bulk", response_model=List[MenuPlanResponse])
+async def save_menu_plans_bulk(
+    bulk: MenuPlanBulkRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Создать или обновить планы на несколько дат одним запросом.
+
+    Все рецепты проверяются одним SELECT, планы пишутся одним
+    INSERT ... ON CONFLICT (date) DO UPDATE: либо сохраняются все, либо ни один.
+    """
+    plans = bulk.plans
+    if len(plans) > MAX_BULK_MENU_PLANS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many plans, maximum is {MAX_BULK_MENU_PLANS}"
         )
+    if len({plan.date for plan in plans}) != len(plans):
+        raise HTTPException(status_code=400, detail="Duplicate dates in request")
+    if not plans:
+        return []
+    
+    items = await get_plan_recipe_items(db, plans)
     
-    if plan.lunch_recipe:
-        avg_rating = db.query(func.avg(Review.rating)).filter(
-            Review.recipe_id == plan.lunch_recipe.id
-        ).scalar()
-        plan_dict["lunch_recipe"] = RecipeListItem(
-            id=plan.lunch_recipe.id,
-            title=plan.lunch_recipe.title,
-            category=plan.lunch_recipe.category,
-            cook_time=plan.lunch_recipe.cook_time,
-            servings=plan.lunch_recipe.servings,
-            image=plan.lunch_recipe.image,
-            calories_per_serving=plan.lunch_recipe.calories_per_serving,
-            rating=float(avg_rating) if avg_rating else None
+    saved = await upsert_menu_plans(db, [plan.model_dump() for plan in plans])
+    await db.commit()
+    metrics.menu_plans_written.inc(("bulk",), len(saved))
+    
+    return json_response(await build_menu_plan_responses(db, saved, items))
+
+
+async def upsert_menu_plans(db: AsyncSession, rows: List[dict]) -> List[MenuPlan]:
+    """Записать планы одним INSERT ... ON CONFLICT (date) DO UPDATE.
+
+    У существующих планов обновляются только колонки, переданные в строках
+    (у всех строк одинаковый набор ключей); сводка меню за даты планов
+    пересчитывается в той же транзакции. Возвращает планы по дате.
+    """
+    stmt = pg_insert(MenuPlan).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MenuPlan.date],
+        set_={
+            **{column: getattr(stmt.excluded, column) for column in rows[0] if column != "date"},
+            "updated_at": datetime.utcnow(),
+        }
+    ).returning(MenuPlan)
+    saved = (await db.scalars(stmt, execution_options={"populate_existing": True})).all()
+    saved.sort(key=lambda plan: plan.date)
+    await refresh_menu_summaries(db, saved[0].date, saved[-1].date)
+    return saved
+
+
+@app.post("/api/menu-plans/generate", response_model=List[MenuPlanResponse])
+async def generate_menu_plans(
+    request: MenuGenerateRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Составить меню на период и сохранить его одним запросом.
+
+    Заполняются слоты из slots (по умолчанию завтрак, обед и ужин) с учетом
+    дневной нормы калорий, времени приготовления, категории слота, окна без
+    повторов и минимального рейтинга. Остальные слоты планов не меняются,
+    с keep_existing не меняются и уже заполненные. Ответ - планы за период.
+    """
+    if request.start_date > request.end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    days = (request.end_date - request.start_date).days + 1
+    if days > MAX_BULK_MENU_PLANS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many days, maximum is {MAX_BULK_MENU_PLANS}"
         )
+    # Слоты в порядке приема пищи: калории распределяются по дню по порядку
+    slots = {
+        slot: SlotRule(**request.slots[slot].model_dump())
+        for slot in MEAL_SLOTS if slot in request.slots
+    }
+    if not slots:
+        raise HTTPException(status_code=400, detail="No slots to fill")
     
-    if plan.dinner_recipe:
-        avg_rating = db.query(func.avg(Review.rating)).filter(
-            Review.recipe_id == plan.dinner_recipe.id
-        ).scalar()
-        plan_dict["dinner_recipe"] = RecipeListItem(
-            id=plan.dinner_recipe.id,
-            title=plan.dinner_recipe.title,
-            category=plan.dinner_recipe.category,
-            cook_time=plan.dinner_recipe.cook_time,
-            servings=plan.dinner_recipe.servings,
-            image=plan.dinner_recipe.image,
-            calories_per_serving=plan.dinner_recipe.calories_per_serving,
-            rating=float(avg_rating) if avg_rating else None
+    await menu_catalog.refresh(db)
+    existing_plans = (await db.execute(
+        select(MenuPlan).where(
+            MenuPlan.date >= request.start_date - timedelta(days=request.no_repeat_days),
+            MenuPlan.date <= request.end_date + timedelta(days=request.no_repeat_days)
         )
+    )).scalars().all()
+    existing = {plan.date: dict(zip(MEAL_SLOTS, menu_plan_recipe_ids(plan))) for plan in existing_plans}
     
-    if plan.extra_recipe:
-        avg_rating = db.query(func.avg(Review.rating)).filter(
-            Review.recipe_id == plan.extra_recipe.id
-        ).scalar()
-        plan_dict["extra_recipe"] = RecipeListItem(
-            id=plan.extra_recipe.id,
-            title=plan.extra_recipe.title,
-            category=plan.extra_recipe.category,
-            cook_time=plan.extra_recipe.cook_time,
-            servings=plan.extra_recipe.servings,
-            image=plan.extra_recipe.image,
-            calories_per_serving=plan.extra_recipe.calories_per_serving,
-            rating=float(avg_rating) if avg_rating else None
+    dates = [request.start_date + timedelta(days=i) for i in range(days)]
+    try:
+        chosen = generate_menu(
+            menu_catalog.arrays(),
+            dates,
+            slots,
+            existing,
+            daily_calories=request.daily_calories,
+            max_cook_time=request.max_cook_time,
+            min_rating=request.min_rating,
+            no_repeat_days=request.no_repeat_days,
+            keep_existing=request.keep_existing,
+            seed=request.seed
         )
+    except MenuGenerationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    # Сохраненные слоты (keep_existing) записываются как были
+    rows = [
+        {
+            "date": plan_date,
+            **{
+                f"{slot}_recipe_id": chosen[plan_date].get(slot, existing.get(plan_date, {}).get(slot))
+                for slot in slots
+            }
+        }
+        for plan_date in dates
+    ]
+    saved = await upsert_menu_plans(db, rows)
+    await db.commit()
+    metrics.menu_plans_written.inc(("generate",), len(saved))
+    
+    return json_response(await build_menu_plan_responses(db, saved))
+
+
+@app.delete("/api/menu-plans")
+async def delete_menu_plans(
+    start_date: date = Query(..., description="Начальная дата"),
+    end_date: date = Query(..., description="Конечная дата"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Удалить все меню планы за период (включительно) одним запросом"""
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    
+    result = await db.execute(
+        delete(MenuPlan).where(MenuPlan.date >= start_date, MenuPlan.date <= end_date)
+    )
+    await refresh_menu_summaries(db, start_date, end_date)
+    await db.commit()
+    metrics.menu_plans_deleted.inc(("range",), result.rowcount)
     
-    return MenuPlanResponse(**plan_dict)
+    return {"message": "Menu plans deleted successfully", "deleted": result.rowcount}
 
 
 @app.delete("/api/menu-plans/{plan_date}")
-async def delete_menu_plan(plan_date: date, db: Session = Depends(get_db)):
+async def delete_menu_plan(plan_date: date, db: AsyncSession = Depends(get_async_db)):
     """Удалить меню план по дате"""
-    plan = db.query(MenuPlan).filter(MenuPlan.date == plan_date).first()
-    if not plan:
+    result = await db.execute(delete(MenuPlan).where(MenuPlan.date == plan_date))
+    if not result.rowcount:
         raise HTTPException(status_code=404, detail="Menu plan not found")
     
-    db.delete(plan)
-    db.commit()
+    await refresh_menu_summaries(db, plan_date, plan_date)
+    await db.commit()
+    metrics.menu_plans_deleted.inc(("single",))
     
     return {"message": "Menu plan deleted successfully"}
 
 
+# ========== Shopping List Endpoints ==========
+
+def shopping_list_query(start_date: date, end_date: date, extra_recipe_ids: Iterable[int] = ()):
+    """Агрегирует ингредиенты запланированных рецептов по (ингредиент справочника, единица).
+
+    Количества разобраны при записи (см. ingredient_catalog.py) и
+    складываются в базовых единицах: 1 кг и 200 г - 1200 г; с неизвестной
+    единицей - в ней самой. Каждый слот плана учитывается отдельно: рецепт,
+    запланированный дважды, дает двойное количество. Нечисловые количества
+    ("по вкусу") считаются 0. extra_recipe_ids - рецепты вне меню планов
+    (дополнительные блюда клиента), учитываются так же, как слоты.
+    """
+    parts = [
+        select(getattr(MenuPlan, f"{slot}_recipe_id").label("recipe_id")).where(
+            MenuPlan.date >= start_date,
+            MenuPlan.date <= end_date,
+            getattr(MenuPlan, f"{slot}_recipe_id").isnot(None)
+        )
+        for slot in MEAL_SLOTS
+    ]
+    extra_recipe_ids = list(extra_recipe_ids)
+    if extra_recipe_ids:
+        parts.append(select(func.unnest(cast(extra_recipe_ids, ARRAY(Integer))).label("recipe_id")))
+    planned = union_all(*parts).subquery("planned")
+    
+    # Строки без ingredient_id (записанные мимо справочника) - по названию как есть
+    name = func.coalesce(IngredientCatalog.name, Ingredient.name)
+    unit = func.coalesce(Ingredient.base_unit, Ingredient.unit)
+    
+    return (
+        select(
+            name.label("name"),
+            unit.label("unit"),
+            func.coalesce(func.sum(Ingredient.quantity), 0).label("amount"),
+            func.array_agg(distinct(Recipe.title)).label("recipes")
+        )
+        .select_from(planned)
+        .join(Ingredient, Ingredient.recipe_id == planned.c.recipe_id)
+        .join(Recipe, Recipe.id == planned.c.recipe_id)
+        .outerjoin(IngredientCatalog, IngredientCatalog.id == Ingredient.ingredient_id)
+        .group_by(Ingredient.ingredient_id, name, unit)
+        .order_by(name, unit)
+    )
+
+
+def to_shopping_list_item(row) -> dict:
+    """Строка из shopping_list_query -> ShoppingListItem в виде словаря (без валидации)"""
+    return {
+        "name": row.name,
+        "unit": BASE_UNIT_LABELS.get(row.unit, row.unit),
+        "amount": float(row.amount),
+        "recipes": list(row.recipes)
+    }
+
+
+async def stream_shopping_list(start_date: date, end_date: date, extra_recipe_ids: List[int]):
+    """NDJSON-поток списка покупок через серверный курсор.
+
+    Использует собственную сессию: зависимость get_async_db закрывается
+    до того, как StreamingResponse начинает отдавать тело.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            shopping_list_query(start_date, end_date, extra_recipe_ids).execution_options(yield_per=500)
+        )
+        async for row in result:
+            yield dumps(to_shopping_list_item(row)) + b"\n"
+
+
+@app.get("/api/shopping-list", response_model=List[ShoppingListItem])
+async def get_shopping_list(
+    start_date: date = Query(..., description="Начальная дата"),
+    end_date: date = Query(..., description="Конечная дата"),
+    recipe_ids: Optional[str] = Query(
+        None, description="Дополнительные рецепты вне меню планов через запятую; повтор id - еще одна порция"
+    ),
+    stream: bool = Query(False, description="Отдавать результат потоком NDJSON"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Список покупок по меню планам за период, агрегированный в SQL"""
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    extra_recipe_ids = parse_batch_ids(recipe_ids) if recipe_ids else []
+    if len(extra_recipe_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"Too many ids, maximum is {MAX_BATCH_IDS}")
+    
+    if stream:
+        return StreamingResponse(
+            stream_shopping_list(start_date, end_date, extra_recipe_ids),
+            media_type="application/x-ndjson"
+        )
+    
+    rows = (await db.execute(shopping_list_query(start_date, end_date, extra_recipe_ids))).all()
+    
+    return json_response([to_shopping_list_item(row) for row in rows])
+
+
+# ========== Image Endpoints ==========
+
+@app.post("/api/images", response_model=ImageUploadResponse)
+async def upload_image(request: Request):
+    """Загрузить изображение (тело запроса - файл JPEG/PNG/GIF/WebP).
+
+    Одинаковые файлы хранятся один раз; возвращенный key можно передать
+    в поле image отзыва.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image is too large, maximum is {IMAGE_MAX_BYTES} bytes")
+    
+    data = await request.body()
+    try:
+        key = await run_in_threadpool(store_image, data)
+    except ImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return ImageUploadResponse(key=key, url=image_url(key), thumbnail_url=thumbnail_url(key))
+
+
+def image_file_response(path: str, media_type: str) -> FileResponse:
+    """Файл хранилища с долгим кэшем: по ключу содержимое не меняется"""
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL})
+
+
+@app.get("/media/thumbs/{key}")
+async def get_thumbnail(key: str):
+    """Квадратная миниатюра изображения; строится при первом запросе, если ее нет"""
+    if not is_image_key(key) or not os.path.exists(image_path(key)):
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    try:
+        path = await run_in_threadpool(ensure_thumbnail, key)
+    except ImageError:
+        path = None
+    if path is None:
+        # Без Pillow (или для неразбираемого файла) отдаем оригинал
+        return image_file_response(image_path(key), MEDIA_TYPES[key.rsplit(".", 1)[1]])
+    return image_file_response(path, "image/jpeg")
+
+
+@app.get("/media/{key}")
+async def get_image(key: str):
+    """Оригинал изображения из хранилища"""
+    if not is_image_key(key) or not os.path.exists(image_path(key)):
+        raise HTTPException(status_code=404, detail="Image not found")
+    return image_file_response(image_path(key), MEDIA_TYPES[key.rsplit(".", 1)[1]])
+
+
+# ========== Sync Endpoints ==========
+
+def sync_line(kind: str, data) -> bytes:
+    """Строка NDJSON потока синхронизации: {"type": ..., "data": ...}"""
+    return to_json({"type": kind, "data": data}) + b"\n"
+
+
+async def stream_sync(since: Optional[int], token: str):
+    """NDJSON-поток рецептов (и новых отзывов при since) через серверный курсор.
+
+    Ингредиенты и шаги подгружаются selectinload на каждую пачку из
+    SYNC_BATCH_SIZE рецептов, весь каталог в памяти не держится.
+    """
+    async with AsyncSessionLocal() as db:
+        query = select(Recipe).options(
+            selectinload(Recipe.ingredients),
+            selectinload(Recipe.steps)
+        ).order_by(Recipe.id)
+        if since is not None:
+            query = query.where(Recipe.change_xid >= since)
+        
+        result = await db.stream(query.execution_options(yield_per=SYNC_BATCH_SIZE))
+        async for recipe in result.scalars():
+            yield sync_line("recipe", RecipeSyncItem.model_validate(recipe))
+        
+        # В полном снимке отзывы не отдаются, они загружаются постранично
+        if since is not None:
+            result = await db.stream(
+                select(Review)
+                .where(Review.change_xid >= since)
+                .order_by(Review.id)
+                .execution_options(yield_per=SYNC_BATCH_SIZE)
+            )
+            async for review in result.scalars():
+                yield sync_line("review", ReviewResponse.model_validate(review))
+    
+    yield sync_line("sync_token", token)
+
+
+@app.get("/api/sync/recipes")
+async def sync_recipes(
+    since: Optional[str] = Query(None, description="Токен синхронизации из предыдущей выгрузки"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Каталог рецептов потоком NDJSON для офлайн-клиентов.
+
+    Без since отдается полный снимок рецептов с ингредиентами, шагами и
+    агрегатом рейтинга, с since - только изменения после той выгрузки.
+    Новый токен - в заголовке X-Sync-Token и в последней строке потока.
+    """
+    since_xid = parse_sync_token(since) if since else None
+    # Горизонт берется до выгрузки: все, что ниже него, выгрузка уже увидит
+    token = make_sync_token(await sync_horizon(db))
+    
+    return StreamingResponse(
+        stream_sync(since_xid, token),
+        media_type="application/x-ndjson",
+        headers={"X-Sync-Token": token}
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
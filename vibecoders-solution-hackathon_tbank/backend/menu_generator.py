@@ -0,0 +1,259 @@
+"""
+Автоматическое составление меню на период
+
+Каталог (id, категория, время приготовления, калории на порцию, рейтинг)
+держится в памяти процесса массивами NumPy и обновляется как остальные
+индексы рецептов (см. recipe_index.py). Меню строится жадно, день за днем
+и слот за слотом. Ограничения слота, не зависящие от дня (категория,
+время, минимальный рейтинг, известные калории), один раз сводятся к
+массиву позиций кандидатов; на каждом шаге окно без повторов - сравнение
+с массивами "последний день использования" и "следующий день в
+сохраненных планах" (окно действует в обе стороны: сохраненный слот
+позже в периоде тоже запрещает рецепт), оценка - одно векторное
+выражение над кандидатами, выбор - argmax, без перебора рецептов в Python.
+
+Оценка кандидата:
+- близость калорий к остатку дневной нормы, деленному на оставшиеся
+  слоты дня (если задана daily_calories) - вес CALORIES_WEIGHT;
+- рейтинг / 5 - вес RATING_WEIGHT;
+- случайная добавка - вес RANDOM_WEIGHT, чтобы меню не было одинаковым
+  (воспроизводимо при заданном seed).
+Если окно без повторов исключило всех кандидатов слота, берется рецепт,
+ближайшее использование которого дальше всех от дня.
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+import os
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Recipe
+from recipe_index import RecipeIndex
+
+# Как часто проверять изменения рецептов в БД, секунд
+MENU_CATALOG_REFRESH_SECONDS = float(os.getenv("MENU_CATALOG_REFRESH_SECONDS", 30))
+
+CALORIES_WEIGHT = 1.0
+RATING_WEIGHT = 0.3
+RANDOM_WEIGHT = 0.2
+
+# "Никогда не использовался" для массива последнего дня использования
+NEVER_USED = np.iinfo(np.int32).min // 2
+# "Больше не запланирован" для массива следующего дня в сохраненных планах
+NOT_PLANNED = np.iinfo(np.int32).max // 2
+
+
+class MenuGenerationError(ValueError):
+    """Ограничениям слота не соответствует ни один рецепт"""
+
+
+@dataclass
+class SlotRule:
+    category: Optional[str] = None
+    max_cook_time: Optional[int] = None
+
+
+@dataclass
+class CatalogArrays:
+    ids: np.ndarray  # int64
+    categories: np.ndarray  # int32, номер категории
+    cook_times: np.ndarray  # int32
+    calories: np.ndarray  # float64, NaN - не указаны
+    ratings: np.ndarray  # float64, NaN - нет отзывов
+    category_codes: Dict[str, int]
+    positions: Dict[int, int]  # id рецепта -> позиция в массивах
+
+    def update(self, position: int, category: str, cook_time: int, calories: Optional[int], rating: Optional[float]):
+        """Заменить значения рецепта, уже занимающего позицию"""
+        self.categories[position] = self.category_codes.setdefault(category, len(self.category_codes))
+        self.cook_times[position] = cook_time
+        self.calories[position] = np.nan if calories is None else calories
+        self.ratings[position] = np.nan if rating is None else rating
+
+
+def build_arrays(rows: Dict[int, Tuple[str, int, Optional[int], Optional[float]]]) -> CatalogArrays:
+    ids = sorted(rows)
+    columns = [rows[recipe_id] for recipe_id in ids]
+    category_codes: Dict[str, int] = {}
+    for category, *_ in columns:
+        category_codes.setdefault(category, len(category_codes))
+    return CatalogArrays(
+        ids=np.array(ids, dtype=np.int64),
+        categories=np.array([category_codes[c[0]] for c in columns], dtype=np.int32),
+        cook_times=np.array([c[1] for c in columns], dtype=np.int32),
+        calories=np.array([np.nan if c[2] is None else c[2] for c in columns], dtype=np.float64),
+        ratings=np.array([np.nan if c[3] is None else c[3] for c in columns], dtype=np.float64),
+        category_codes=category_codes,
+        positions={recipe_id: i for i, recipe_id in enumerate(ids)},
+    )
+
+
+class MenuCatalog(RecipeIndex):
+    """Колонки рецептов для подбора меню в виде массивов NumPy"""
+
+    def __init__(self, refresh_seconds: float = MENU_CATALOG_REFRESH_SECONDS):
+        super().__init__(refresh_seconds)
+        self._rows: Dict[int, Tuple[str, int, Optional[int], Optional[float]]] = {}
+        self._arrays: Optional[CatalogArrays] = None
+
+    async def _load(self, db: AsyncSession, since: Optional[int]):
+        query = select(
+            Recipe.id, Recipe.category, Recipe.cook_time, Recipe.calories_per_serving, Recipe.rating
+        )
+        if since is not None:
+            query = query.where(Recipe.change_xid >= since)
+        rows = (await db.execute(query)).all()
+        if since is None:
+            self.rebuilds += 1
+            self._rows = {}
+        rebuild = since is None or self._arrays is None
+        for row in rows:
+            values = (row.category, row.cook_time, row.calories_per_serving, row.rating)
+            self._rows[row.id] = values
+            # Измененные рецепты (например, рейтинг после отзыва) правятся на месте,
+            # с новыми рецептами массивы собираются заново
+            position = None if rebuild else self._arrays.positions.get(row.id)
+            if position is None:
+                rebuild = True
+            else:
+                self._arrays.update(position, *values)
+        if rebuild:
+            self._arrays = await run_in_threadpool(build_arrays, dict(self._rows))
+
+    def arrays(self) -> CatalogArrays:
+        """Массивы каталога; до первого refresh - пустые"""
+        return self._arrays or build_arrays({})
+
+    def stats(self) -> dict:
+        return {"recipes": len(self._rows), "synced_at": self.synced_at, **self.cache_stats(len(self._rows))}
+
+
+def generate_menu(
+    catalog: CatalogArrays,
+    dates: Sequence[date],
+    slots: Dict[str, SlotRule],
+    existing: Dict[date, Dict[str, Optional[int]]],
+    daily_calories: Optional[int] = None,
+    max_cook_time: Optional[int] = None,
+    min_rating: Optional[float] = None,
+    no_repeat_days: int = 7,
+    keep_existing: bool = False,
+    seed: Optional[int] = None
+) -> Dict[date, Dict[str, int]]:
+    """Выбрать рецепты для слотов на даты dates.
+
+    existing - уже сохраненные планы {дата: {слот: id рецепта}}, включая
+    no_repeat_days дней до начала и после конца периода: их рецепты
+    учитываются в окне без повторов, а с keep_existing заполненные слоты
+    не меняются и их калории вычитаются из дневной нормы. Возвращает
+    {дата: {слот: id}} только для выбранных слотов.
+    """
+    size = len(catalog.ids)
+    if not size:
+        raise MenuGenerationError("No recipes in catalog")
+
+    # Кандидаты слотов: позиции в каталоге, подходящие по ограничениям без учета дня
+    base = np.ones(size, dtype=bool)
+    if min_rating is not None:
+        base &= catalog.ratings >= min_rating
+    if daily_calories is not None:
+        base &= ~np.isnan(catalog.calories)
+    static = {}
+    for slot, rule in slots.items():
+        mask = base.copy()
+        if rule.category is not None:
+            code = catalog.category_codes.get(rule.category)
+            mask &= (catalog.categories == code) if code is not None else False
+        cook_limit = rule.max_cook_time if rule.max_cook_time is not None else max_cook_time
+        if cook_limit is not None:
+            mask &= catalog.cook_times <= cook_limit
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            raise MenuGenerationError(f"No recipes match constraints for slot '{slot}'")
+        static[slot] = candidates
+
+    rating_score = RATING_WEIGHT * np.nan_to_num(catalog.ratings) / 5
+    calories = np.nan_to_num(catalog.calories)
+    slot_rating_score = {slot: rating_score[candidates] for slot, candidates in static.items()}
+    slot_calories = {slot: calories[candidates] for slot, candidates in static.items()}
+    rng = np.random.default_rng(seed)
+    first_day = dates[0].toordinal() if dates else 0
+
+    # Слоты, которые остаются как есть: вне периода - все, в периоде - по keep_existing
+    period = set(dates)
+    kept_by_date: Dict[date, Dict[str, int]] = {}
+    for plan_date, plan in existing.items():
+        kept_by_date[plan_date] = {
+            slot: recipe_id for slot, recipe_id in plan.items()
+            if recipe_id is not None and (plan_date not in period or keep_existing or slot not in slots)
+        }
+
+    # Дни использования сохраненных рецептов: до периода - в last_used,
+    # с первого дня периода - очередь будущих дней, ее голова в next_used
+    last_used = np.full(size, NEVER_USED, dtype=np.int32)
+    next_used = np.full(size, NOT_PLANNED, dtype=np.int32)
+    planned: Dict[int, List[int]] = {}
+    for plan_date in sorted(kept_by_date):
+        day = plan_date.toordinal() - first_day
+        for recipe_id in kept_by_date[plan_date].values():
+            position = catalog.positions.get(recipe_id)
+            if position is None:
+                continue
+            if plan_date < dates[0]:
+                last_used[position] = day
+            else:
+                planned.setdefault(position, []).append(day)
+    for position, days in planned.items():
+        next_used[position] = days[0]
+
+    result: Dict[date, Dict[str, int]] = {}
+    for plan_date in dates:
+        day = plan_date.toordinal() - first_day
+        kept = kept_by_date.get(plan_date, {})
+        for recipe_id in kept.values():
+            position = catalog.positions.get(recipe_id)
+            if position is None:
+                continue
+            last_used[position] = day
+            days = planned[position]
+            while days and days[0] <= day:
+                days.pop(0)
+            next_used[position] = days[0] if days else NOT_PLANNED
+
+        to_fill = [slot for slot in slots if slot not in kept]
+        remaining = None
+        if daily_calories is not None:
+            remaining = float(daily_calories) - sum(
+                calories[catalog.positions[recipe_id]]
+                for recipe_id in kept.values() if recipe_id in catalog.positions
+            )
+
+        chosen = {}
+        for index, slot in enumerate(to_fill):
+            candidates = static[slot]
+            # Расстояние в днях до ближайшего использования рецепта, назад или вперед
+            distance = np.minimum(day - last_used[candidates], next_used[candidates] - day)
+            allowed = distance >= no_repeat_days
+            if not allowed.any():
+                # Все кандидаты в окне без повторов: самый далекий от дня
+                allowed = distance == distance.max()
+
+            score = slot_rating_score[slot] + RANDOM_WEIGHT * rng.random(len(candidates))
+            if remaining is not None:
+                target = max(remaining, 0.0) / (len(to_fill) - index)
+                score -= CALORIES_WEIGHT * np.abs(slot_calories[slot] - target) / daily_calories
+            position = int(candidates[np.argmax(np.where(allowed, score, -np.inf))])
+
+            chosen[slot] = int(catalog.ids[position])
+            last_used[position] = day
+            if remaining is not None:
+                remaining -= calories[position]
+        result[plan_date] = chosen
+    return result
+
+
+menu_catalog = MenuCatalog()
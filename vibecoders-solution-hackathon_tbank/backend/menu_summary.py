@@ -0,0 +1,90 @@
+"""
+Сводка меню по дням (menu_day_summaries)
+
+На каждую дату с заполненным планом хранится строка с суммами по
+запланированным рецептам: число рецептов, калории (порция на слот),
+слоты без калорий, время приготовления, число ингредиентов. Строки
+пересчитываются в той же транзакции, что и запись или удаление планов
+(refresh_menu_summaries), поэтому сводка за период - агрегат по строкам
+дней, без соединения планов с рецептами и ингредиентами.
+
+Рецепты через API только добавляются; после правки рецептов или планов
+напрямую в БД сводка пересчитывается целиком скриптом:
+
+    python menu_summary.py
+"""
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+import sys
+
+# Удаляет строки дней периода, где планов больше нет
+DELETE_SQL = """
+DELETE FROM menu_day_summaries AS s
+WHERE s.date BETWEEN :start AND :end
+  AND NOT EXISTS (
+      SELECT 1 FROM menu_plans AS p
+      WHERE p.date = s.date
+        AND COALESCE(p.breakfast_recipe_id, p.lunch_recipe_id, p.dinner_recipe_id, p.extra_recipe_id) IS NOT NULL
+  )
+"""
+
+# Пересчитывает строки дней периода по планам; слоты - как MEAL_SLOTS в main.py
+REFRESH_SQL = """
+INSERT INTO menu_day_summaries AS s
+    (date, recipes, calories, calories_unknown, cook_time, ingredients, updated_at)
+SELECT p.date,
+       COUNT(*),
+       COALESCE(SUM(r.calories_per_serving), 0),
+       COUNT(*) - COUNT(r.calories_per_serving),
+       SUM(r.cook_time),
+       SUM((SELECT COUNT(*) FROM ingredients AS i WHERE i.recipe_id = r.id)),
+       now() AT TIME ZONE 'utc'
+FROM menu_plans AS p
+CROSS JOIN LATERAL (VALUES
+    (p.breakfast_recipe_id), (p.lunch_recipe_id), (p.dinner_recipe_id), (p.extra_recipe_id)
+) AS slot (recipe_id)
+JOIN recipes AS r ON r.id = slot.recipe_id
+WHERE p.date BETWEEN :start AND :end
+GROUP BY p.date
+ON CONFLICT (date) DO UPDATE SET
+    recipes = excluded.recipes,
+    calories = excluded.calories,
+    calories_unknown = excluded.calories_unknown,
+    cook_time = excluded.cook_time,
+    ingredients = excluded.ingredients,
+    updated_at = excluded.updated_at
+"""
+
+SUMMARY_SQL = [DELETE_SQL, REFRESH_SQL]
+
+
+async def refresh_menu_summaries(db: AsyncSession, start: date, end: date):
+    """Пересчитать сводку дней с start по end (включительно) в текущей транзакции"""
+    for statement in SUMMARY_SQL:
+        await db.execute(text(statement), {"start": start, "end": end})
+
+
+def rebuild_menu_summaries(db: Session):
+    """Пересчитать сводку за все даты"""
+    for statement in SUMMARY_SQL:
+        db.execute(text(statement), {"start": date.min, "end": date.max})
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        print("Пересчет сводки меню...")
+        rebuild_menu_summaries(db)
+        db.commit()
+        print("Готово")
+    except Exception as e:
+        db.rollback()
+        print(f"Ошибка при пересчете сводки меню: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db.close()
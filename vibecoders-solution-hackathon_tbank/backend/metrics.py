@@ -0,0 +1,295 @@
+"""
+Метрики в текстовом формате Prometheus для GET /metrics
+
+Счетчики и гистограммы - словари "кортеж значений меток -> число" без
+блокировок: почти все обновления идут из event loop, а редкие гонки из
+пула потоков (синхронный engine) теряют единичные инкременты, что для
+метрик допустимо. Гистограмма хранит счетчики по корзинам, поэтому
+наблюдение - один bisect и два сложения. Значения пулов соединений и
+кэшей читаются только в момент сбора.
+
+Метрики живут в памяти процесса: при нескольких воркерах каждый отдает
+свои, Prometheus должен опрашивать воркеры по отдельности.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+import math
+import os
+import time
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Корзины задержек HTTP-запросов, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Корзины ожидания соединения из пула, секунды
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+# Маршрут для запросов, не попавших ни в один обработчик (не плодит метки)
+UNMATCHED_ROUTE = "<unmatched>"
+
+Labels = Tuple[str, ...]
+
+_registry: List["Metric"] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def samples(self) -> Iterable[Tuple[str, Sequence[str], Labels, float]]:
+        """(имя, имена меток, значения меток, значение)"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, labelnames, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Монотонный счетчик; метки передаются кортежем в порядке labelnames"""
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        # Без меток значение видно с нуля, а не с первого инкремента
+        self._values: Dict[Labels, float] = {} if self.labelnames else {(): 0}
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in list(self._values.items()):
+            yield self.name, self.labelnames, labels, value
+
+
+class Gauge(Counter):
+    """Значение, которое может уменьшаться"""
+    type = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Метки -> [число в каждой корзине..., число в +Inf, сумма]
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, labels: Labels = ()):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        bucket_labelnames = self.labelnames + ("le",)
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                yield f"{self.name}_bucket", bucket_labelnames, labels + (_format_value(float(bound)),), cumulative
+            yield f"{self.name}_sum", self.labelnames, labels, series[-1]
+            yield f"{self.name}_count", self.labelnames, labels, cumulative
+
+
+class CallbackMetric(Metric):
+    """Значения, которые считываются при сборе: callback() -> [(метки, значение)]"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[Labels, float]]], type: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self.callback = callback
+
+    def samples(self):
+        for labels, value in self.callback():
+            yield self.name, self.labelnames, labels, value
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ========== HTTP ==========
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency, seconds", ("method", "route")
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests being processed")
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: число, задержка и текущее количество запросов по маршрутам"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            # Шаблон маршрута, а не путь: id не попадают в метки
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            http_requests.inc((method, route, str(status)))
+            http_request_duration.observe(time.perf_counter() - started, (method, route))
+
+
+# ========== DB pool ==========
+
+db_pool_checkouts = Counter("db_pool_checkouts_total", "Connections checked out from the pool", ("pool",))
+db_pool_checkout_duration = Histogram(
+    "db_pool_checkout_seconds", "Time to get a connection from the pool, including waiting and pre-ping",
+    ("pool",), buckets=POOL_WAIT_BUCKETS
+)
+db_pool_checkout_errors = Counter(
+    "db_pool_checkout_errors_total", "Failed pool checkouts (timeouts, connection errors)", ("pool",)
+)
+
+
+def instrument_pool(engine, name: str):
+    """Считать выдачи соединений из пула engine и время ожидания свободного.
+
+    Пул не сообщает о времени ожидания событием, поэтому оборачивается
+    Pool.connect, через который engine берет каждое соединение. dispose()
+    (post_fork в gunicorn.conf.py) заменяет пул новым, обертка ставится на
+    него по событию engine_disposed.
+    """
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    labels = (name,)
+    db_pool_checkouts.inc(labels, 0)
+    db_pool_checkout_errors.inc(labels, 0)
+
+    def wrap(pool):
+        connect = pool.connect
+
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                connection = connect()
+            except Exception:
+                db_pool_checkout_errors.inc(labels)
+                raise
+            db_pool_checkouts.inc(labels)
+            db_pool_checkout_duration.observe(time.perf_counter() - started, labels)
+            return connection
+
+        pool.connect = timed_connect
+
+    wrap(sync_engine.pool)
+    event.listen(sync_engine, "engine_disposed", lambda disposed: wrap(disposed.pool))
+
+
+def register_pool_stats(pool_stats: Callable[[], dict]):
+    """Текущее состояние пулов из database.pool_stats()"""
+    def connections():
+        stats = pool_stats()
+        for name in ("async", "sync"):
+            if "checked_out" in stats[name]:
+                yield (name, "checked_out"), stats[name]["checked_out"]
+                yield (name, "checked_in"), stats[name]["checked_in"]
+                # QueuePool.overflow() отрицателен, пока пул не заполнен
+                yield (name, "overflow"), max(stats[name]["overflow"], 0)
+
+    def sizes():
+        stats = pool_stats()
+        for name in ("async", "sync"):
+            if "size" in stats[name]:
+                yield (name,), stats[name]["size"] + stats[name]["max_overflow"]
+
+    CallbackMetric("db_pool_connections", "Pool connections by state", ("pool", "state"), connections)
+    CallbackMetric("db_pool_max_connections", "Pool size plus max overflow", ("pool",), sizes)
+
+
+# ========== Caches ==========
+
+_caches: Dict[str, Callable[[], dict]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], dict]):
+    """Добавить кэш в метрики; stats() возвращает hits, misses и по возможности entries, bytes, evictions, rebuilds"""
+    _caches[name] = stats
+
+
+def _cache_values(key: str):
+    def collect():
+        for name, stats in _caches.items():
+            values = stats()
+            if key in values:
+                yield (name,), values[key]
+    return collect
+
+
+CallbackMetric("cache_hits_total", "Cache hits", ("cache",), _cache_values("hits"), type="counter")
+CallbackMetric("cache_misses_total", "Cache misses", ("cache",), _cache_values("misses"), type="counter")
+CallbackMetric("cache_evictions_total", "Cache evictions", ("cache",), _cache_values("evictions"), type="counter")
+CallbackMetric("cache_hit_ratio", "Cache hits / lookups since start", ("cache",), _cache_values("hit_ratio"))
+CallbackMetric("cache_entries", "Entries in the cache", ("cache",), _cache_values("entries"))
+CallbackMetric("cache_bytes", "Cache size, bytes", ("cache",), _cache_values("bytes"))
+CallbackMetric("cache_rebuilds_total", "Full index rebuilds", ("cache",), _cache_values("rebuilds"), type="counter")
+
+
+# ========== Writes ==========
+
+reviews_created = Counter("reviews_created_total", "Reviews added")
+menu_plans_written = Counter(
+    "menu_plans_written_total", "Menu plans created or updated", ("operation",)
+)
+menu_plans_deleted = Counter("menu_plans_deleted_total", "Menu plans deleted", ("operation",))
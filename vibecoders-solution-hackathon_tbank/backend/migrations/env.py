@@ -0,0 +1,59 @@
+"""
+Окружение Alembic: подключение из database.py, метаданные из models.py
+"""
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import DATABASE_URL, engine
+from models import Base
+
+config = context.config
+
+# При запуске из init_db логирование приложения не перенастраивается
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # Индексы поиска (GIN, триграммы) создаются DDL из search.py, в models.py их нет:
+    # autogenerate не должен предлагать их удалить
+    if type_ == "index" and reflected and compare_to is None:
+        return False
+    return True
+
+
+def run_migrations_offline():
+    """SQL миграций без подключения к БД: alembic upgrade head --sql"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # Каждая миграция в своей транзакции: CREATE INDEX CONCURRENTLY
+            # выполняется в autocommit_block между ними
+            transaction_per_migration=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,223 @@
+"""Базовая схема: таблицы, агрегат рейтинга, отслеживание изменений и поиск
+
+Схема на момент перехода с create_all на миграции. В пустой БД таблицы
+создаются; в БД, созданной раньше через create_all, они уже есть, и
+миграция доводит их до этой схемы идемпотентными DDL, а затем заполняет
+новые колонки: пересчитывает агрегат рейтинга из reviews и поисковые
+векторы. DDL и SQL скопированы сюда в виде на момент этой ревизии:
+миграция не зависит от кода приложения.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+TABLES = ["menu_plans", "reviews", "steps", "ingredients", "recipes"]
+
+EXTENSION_DDL = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+
+LEGACY_DDL = [
+    """
+    ALTER TABLE recipes
+        ADD COLUMN IF NOT EXISTS rating_sum INTEGER NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS rating_count INTEGER NOT NULL DEFAULT 0
+    """,
+    "ALTER TABLE recipes ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')",
+]
+
+# Колонка search_vector, GIN-индексы, функции и триггеры поиска (search.py)
+SEARCH_DDL = [
+    # Для баз, созданных до появления колонки
+    "ALTER TABLE recipes ADD COLUMN IF NOT EXISTS search_vector tsvector",
+
+    "CREATE INDEX IF NOT EXISTS ix_recipes_search_vector ON recipes USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_recipes_title_trgm ON recipes USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_ingredients_name_trgm ON ingredients USING gin (name gin_trgm_ops)",
+
+    """
+    CREATE OR REPLACE FUNCTION recipe_search_vector(p_title text, p_recipe_id integer)
+    RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('russian', coalesce(p_title, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(
+                   (SELECT string_agg(name, ' ') FROM ingredients WHERE recipe_id = p_recipe_id),
+                   '')), 'B')
+    $$ LANGUAGE sql STABLE
+    """,
+
+    """
+    CREATE OR REPLACE FUNCTION recipes_search_vector_trigger() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := recipe_search_vector(NEW.title, NEW.id);
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+
+    # Триггеры на ingredients уровня оператора: при пакетной вставке
+    # вектор рецепта пересчитывается один раз, а не на каждую строку
+    """
+    CREATE OR REPLACE FUNCTION ingredients_search_vector_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE recipes SET search_vector = recipe_search_vector(title, id)
+            WHERE id IN (SELECT recipe_id FROM new_rows);
+        ELSIF TG_OP = 'UPDATE' THEN
+            UPDATE recipes SET search_vector = recipe_search_vector(title, id)
+            WHERE id IN (SELECT recipe_id FROM new_rows UNION SELECT recipe_id FROM old_rows);
+        ELSE
+            UPDATE recipes SET search_vector = recipe_search_vector(title, id)
+            WHERE id IN (SELECT recipe_id FROM old_rows);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+
+    """
+    CREATE OR REPLACE TRIGGER recipes_search_vector_update
+    BEFORE INSERT OR UPDATE OF title ON recipes
+    FOR EACH ROW EXECUTE FUNCTION recipes_search_vector_trigger()
+    """,
+
+    """
+    CREATE OR REPLACE TRIGGER ingredients_search_vector_insert
+    AFTER INSERT ON ingredients REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION ingredients_search_vector_trigger()
+    """,
+
+    """
+    CREATE OR REPLACE TRIGGER ingredients_search_vector_update
+    AFTER UPDATE ON ingredients REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION ingredients_search_vector_trigger()
+    """,
+
+    """
+    CREATE OR REPLACE TRIGGER ingredients_search_vector_delete
+    AFTER DELETE ON ingredients REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION ingredients_search_vector_trigger()
+    """,
+]
+
+# Агрегат рейтинга из reviews (ratings.py); обновляются только разошедшиеся строки
+RECONCILE_SQL = """
+UPDATE recipes AS r
+SET rating_sum = COALESCE(a.rating_sum, 0),
+    rating_count = COALESCE(a.rating_count, 0),
+    rating = a.rating_sum::float / NULLIF(a.rating_count, 0),
+    updated_at = now() AT TIME ZONE 'utc'
+FROM recipes AS src
+LEFT JOIN (
+    SELECT recipe_id, SUM(rating) AS rating_sum, COUNT(*) AS rating_count
+    FROM reviews
+    GROUP BY recipe_id
+) AS a ON a.recipe_id = src.id
+WHERE r.id = src.id
+  AND (r.rating_sum IS DISTINCT FROM COALESCE(a.rating_sum, 0)
+       OR r.rating_count IS DISTINCT FROM COALESCE(a.rating_count, 0)
+       OR r.rating IS DISTINCT FROM a.rating_sum::float / NULLIF(a.rating_count, 0))
+"""
+
+REBUILD_SQL = "UPDATE recipes SET search_vector = recipe_search_vector(title, id)"
+
+
+def create_tables():
+    op.create_table(
+        "recipes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(255), nullable=False),
+        sa.Column("category", sa.String(50), nullable=False),
+        sa.Column("cook_time", sa.Integer(), nullable=False),
+        sa.Column("servings", sa.Integer(), nullable=False),
+        sa.Column("image", sa.Text(), nullable=True),
+        sa.Column("calories_per_serving", sa.Integer(), nullable=True),
+        sa.Column("rating", sa.Float(), nullable=True),
+        sa.Column("rating_sum", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("rating_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True),
+    )
+    op.create_index("ix_recipes_id", "recipes", ["id"])
+
+    op.create_table(
+        "ingredients",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("recipe_id", sa.Integer(), sa.ForeignKey("recipes.id"), nullable=False),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("amount", sa.String(50), nullable=False),
+        sa.Column("unit", sa.String(50), nullable=False),
+        sa.Column("order", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_ingredients_id", "ingredients", ["id"])
+
+    op.create_table(
+        "steps",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("recipe_id", sa.Integer(), sa.ForeignKey("recipes.id"), nullable=False),
+        sa.Column("number", sa.Integer(), nullable=False),
+        sa.Column("instruction", sa.Text(), nullable=False),
+        sa.Column("image", sa.Text(), nullable=True),
+        sa.Column("order", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_steps_id", "steps", ["id"])
+
+    op.create_table(
+        "reviews",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("recipe_id", sa.Integer(), sa.ForeignKey("recipes.id"), nullable=False),
+        sa.Column("author", sa.String(100), nullable=False),
+        sa.Column("rating", sa.Integer(), nullable=False),
+        sa.Column("comment", sa.Text(), nullable=False),
+        sa.Column("date", sa.String(50), nullable=False),
+        sa.Column("image", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_reviews_id", "reviews", ["id"])
+
+    op.create_table(
+        "menu_plans",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("user_id", sa.String(100), nullable=True),
+        sa.Column("breakfast_recipe_id", sa.Integer(), sa.ForeignKey("recipes.id"), nullable=True),
+        sa.Column("lunch_recipe_id", sa.Integer(), sa.ForeignKey("recipes.id"), nullable=True),
+        sa.Column("dinner_recipe_id", sa.Integer(), sa.ForeignKey("recipes.id"), nullable=True),
+        sa.Column("extra_recipe_id", sa.Integer(), sa.ForeignKey("recipes.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_menu_plans_id", "menu_plans", ["id"])
+    op.create_index("ix_menu_plans_date", "menu_plans", ["date"], unique=True)
+
+
+def upgrade():
+    op.execute(EXTENSION_DDL)
+    # В режиме --sql БД недоступна: SQL генерируется для пустой БД
+    legacy = not op.get_context().as_sql and sa.inspect(op.get_bind()).has_table("recipes")
+    if legacy:
+        for statement in LEGACY_DDL:
+            op.execute(statement)
+    else:
+        create_tables()
+    for statement in SEARCH_DDL:
+        op.execute(statement)
+    if legacy:
+        # Добавленные колонки в существующих строках пусты
+        op.execute(RECONCILE_SQL)
+        op.execute(REBUILD_SQL)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_table(table)
+    for function in ("ingredients_search_vector_trigger", "recipes_search_vector_trigger"):
+        op.execute(f"DROP FUNCTION IF EXISTS {function}() CASCADE")
+    op.execute("DROP FUNCTION IF EXISTS recipe_search_vector(text, integer)")
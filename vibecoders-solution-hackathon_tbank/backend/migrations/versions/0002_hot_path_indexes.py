@@ -0,0 +1,59 @@
+"""Индексы горячих запросов
+
+Внешние ключи, по которым фильтруют обработчики (ингредиенты, шаги и
+отзывы рецепта, рецепты меню планов), категория в списке рецептов,
+ключи keyset-пагинации и синхронизации. Индексы строятся CREATE INDEX
+CONCURRENTLY вне транзакции и не блокируют запись в таблицы; IF NOT
+EXISTS пропускает индексы, которые уже поставили create_all или скрипты.
+Недостроенный (invalid) индекс от прерванного CONCURRENTLY удаляется и
+строится заново.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (имя, таблица, колонки или выражения)
+INDEXES = [
+    ("ix_ingredients_recipe_id", "ingredients", ["recipe_id"]),
+    ("ix_steps_recipe_id", "steps", ["recipe_id"]),
+    ("ix_reviews_recipe_keyset", "reviews", ["recipe_id", "id"]),
+    ("ix_reviews_created_at", "reviews", ["created_at"]),
+    ("ix_recipes_category_keyset", "recipes", ["category", "id"]),
+    ("ix_recipes_rating_keyset", "recipes", [sa.text("coalesce(rating, 0) DESC"), "id"]),
+    ("ix_recipes_cook_time_keyset", "recipes", ["cook_time", "id"]),
+    ("ix_recipes_updated_at", "recipes", ["updated_at"]),
+    ("ix_menu_plans_breakfast_recipe_id", "menu_plans", ["breakfast_recipe_id"]),
+    ("ix_menu_plans_lunch_recipe_id", "menu_plans", ["lunch_recipe_id"]),
+    ("ix_menu_plans_dinner_recipe_id", "menu_plans", ["dinner_recipe_id"]),
+    ("ix_menu_plans_extra_recipe_id", "menu_plans", ["extra_recipe_id"]),
+]
+
+INVALID_INDEX_SQL = """
+SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+WHERE c.relname = :name AND NOT i.indisvalid
+"""
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            # В режиме --sql подключения к БД нет, проверка пропускается
+            if not op.get_context().as_sql and op.get_bind().execute(
+                sa.text(INVALID_INDEX_SQL), {"name": name}
+            ).first():
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,54 @@
+"""Сводка меню по дням
+
+Таблица menu_day_summaries (см. menu_summary.py) и ее заполнение по
+существующим планам. Расчет скопирован из REFRESH_SQL (menu_summary.py)
+на момент этой ревизии; таблица новая, поэтому без диапазона дат и ON
+CONFLICT.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+FILL_SQL = """
+INSERT INTO menu_day_summaries
+    (date, recipes, calories, calories_unknown, cook_time, ingredients, updated_at)
+SELECT p.date,
+       COUNT(*),
+       COALESCE(SUM(r.calories_per_serving), 0),
+       COUNT(*) - COUNT(r.calories_per_serving),
+       SUM(r.cook_time),
+       SUM((SELECT COUNT(*) FROM ingredients AS i WHERE i.recipe_id = r.id)),
+       now() AT TIME ZONE 'utc'
+FROM menu_plans AS p
+CROSS JOIN LATERAL (VALUES
+    (p.breakfast_recipe_id), (p.lunch_recipe_id), (p.dinner_recipe_id), (p.extra_recipe_id)
+) AS slot (recipe_id)
+JOIN recipes AS r ON r.id = slot.recipe_id
+GROUP BY p.date
+"""
+
+
+def upgrade():
+    op.create_table(
+        "menu_day_summaries",
+        sa.Column("date", sa.Date(), primary_key=True),
+        sa.Column("recipes", sa.Integer(), nullable=False),
+        sa.Column("calories", sa.Integer(), nullable=False),
+        sa.Column("calories_unknown", sa.Integer(), nullable=False),
+        sa.Column("cook_time", sa.Integer(), nullable=False),
+        sa.Column("ingredients", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.execute(FILL_SQL)
+
+
+def downgrade():
+    op.drop_table("menu_day_summaries")
@@ -0,0 +1,177 @@
+"""Справочник ингредиентов и разобранные количества
+
+Таблицы ingredient_catalog и ingredient_aliases, колонки ingredient_id,
+quantity и base_unit у ingredients (см. ingredient_catalog.py) и их
+заполнение по существующим строкам: названия и пары (amount, unit)
+разбираются по одному разу, строки обновляются одним UPDATE. Триггер
+поискового вектора на время заполнения отключается - названия не
+меняются, а иначе он пересчитал бы векторы всех рецептов.
+
+Разбор названий и количеств скопирован из ingredient_catalog.py в виде на
+момент этой ревизии: миграция не зависит от кода приложения.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+"""
+from typing import Optional, Tuple
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+SEARCH_TRIGGER = "ingredients_search_vector_update"
+
+# Ключ единицы (см. unit_key) -> (базовая единица, множитель)
+UNITS = {
+    **dict.fromkeys(("г", "гр", "грамм", "грамма", "граммов", "g"), ("g", 1)),
+    **dict.fromkeys(("кг", "килограмм", "килограмма", "килограммов", "kg"), ("g", 1000)),
+    **dict.fromkeys(("мг", "mg"), ("g", 0.001)),
+    **dict.fromkeys(("мл", "миллилитр", "миллилитра", "миллилитров", "ml"), ("ml", 1)),
+    **dict.fromkeys(("л", "литр", "литра", "литров", "l"), ("ml", 1000)),
+    **dict.fromkeys(("чл", "чайнаяложка", "чайныеложки", "чайныхложек", "tsp"), ("ml", 5)),
+    **dict.fromkeys(("стл", "столоваяложка", "столовыеложки", "столовыхложек", "tbsp"), ("ml", 15)),
+    **dict.fromkeys(("стакан", "стакана", "стаканов", "cup"), ("ml", 250)),
+    **dict.fromkeys(("шт", "штука", "штуки", "штук", "pcs"), ("pcs", 1)),
+}
+
+FRACTIONS = {"½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4"}
+
+_NUMBER = r"\d+(?:\.\d+)?(?:\s*/\s*\d+)?"
+AMOUNT_PATTERN = re.compile(rf"^(\d+\s+)?({_NUMBER})(?:\s*[-–—]\s*({_NUMBER}))?$")
+
+# Справочник пуст: на каждый ключ - запись и алиас-ключ
+CATALOG_SQL = """
+WITH input AS (
+    SELECT DISTINCT ON (key) name, key
+    FROM unnest(CAST(:names AS varchar[]), CAST(:keys AS varchar[])) AS v (name, key)
+    ORDER BY key, name
+), created AS (
+    INSERT INTO ingredient_catalog (name, key)
+    SELECT name, key FROM input
+    RETURNING id, key
+)
+INSERT INTO ingredient_aliases (alias, ingredient_id)
+SELECT key, id FROM created
+"""
+
+FILL_SQL = """
+UPDATE ingredients AS i
+SET ingredient_id = a.ingredient_id, quantity = q.quantity, base_unit = q.base_unit
+FROM unnest(CAST(:names AS varchar[]), CAST(:keys AS varchar[])) AS n (name, key),
+     ingredient_aliases AS a,
+     unnest(CAST(:amounts AS varchar[]), CAST(:units AS varchar[]),
+            CAST(:quantities AS double precision[]), CAST(:base_units AS varchar[]))
+         AS q (amount, unit, quantity, base_unit)
+WHERE i.name = n.name AND a.alias = n.key AND i.amount = q.amount AND i.unit = q.unit
+"""
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.lower().replace("ё", "е").split())
+
+
+def unit_key(unit: str) -> str:
+    return re.sub(r"[\s.]", "", unit.lower().replace("ё", "е"))
+
+
+def _number(value: str) -> Optional[float]:
+    if "/" not in value:
+        return float(value)
+    numerator, denominator = value.split("/")
+    return float(numerator) / int(denominator) if int(denominator) else None
+
+
+def parse_amount(amount: str) -> Optional[float]:
+    value = amount.strip().replace(",", ".")
+    for fraction, replacement in FRACTIONS.items():
+        value = value.replace(fraction, f" {replacement}")
+    match = AMOUNT_PATTERN.match(value.strip())
+    if match is None:
+        return None
+    whole, low, high = match.groups()
+    low = _number(low)
+    if low is None:
+        return None
+    if whole:
+        low += int(whole)
+    if high is None:
+        return low
+    high = _number(high)
+    return None if high is None else (low + high) / 2
+
+
+def parse_quantity(amount: str, unit: str) -> Tuple[Optional[float], Optional[str]]:
+    value = parse_amount(amount)
+    if value is None:
+        return None, None
+    base = UNITS.get(unit_key(unit))
+    if base is None:
+        return value, None
+    base_unit, factor = base
+    return value * factor, base_unit
+
+
+def fill_ingredient_catalog(connection):
+    """Справочник по названиям ingredients и количества всех строк"""
+    names = [row[0] for row in connection.execute(sa.text("SELECT DISTINCT name FROM ingredients"))]
+    if not names:
+        return
+    keys = [normalize_name(name) for name in names]
+    connection.execute(sa.text(CATALOG_SQL), {"names": names, "keys": keys})
+
+    amounts = connection.execute(sa.text("SELECT DISTINCT amount, unit FROM ingredients")).all()
+    quantities = [parse_quantity(amount, unit) for amount, unit in amounts]
+    connection.execute(sa.text(FILL_SQL), {
+        "names": names,
+        "keys": keys,
+        "amounts": [amount for amount, _ in amounts],
+        "units": [unit for _, unit in amounts],
+        "quantities": [quantity for quantity, _ in quantities],
+        "base_units": [base_unit for _, base_unit in quantities],
+    })
+
+
+def upgrade():
+    op.create_table(
+        "ingredient_catalog",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("key", sa.String(255), nullable=False, unique=True),
+    )
+    op.create_table(
+        "ingredient_aliases",
+        sa.Column("alias", sa.String(255), primary_key=True),
+        sa.Column("ingredient_id", sa.Integer(), sa.ForeignKey("ingredient_catalog.id"), nullable=False),
+    )
+    op.create_index("ix_ingredient_aliases_ingredient_id", "ingredient_aliases", ["ingredient_id"])
+
+    op.add_column("ingredients", sa.Column("ingredient_id", sa.Integer(), nullable=True))
+    op.add_column("ingredients", sa.Column("quantity", sa.Float(), nullable=True))
+    op.add_column("ingredients", sa.Column("base_unit", sa.String(10), nullable=True))
+
+    # В режиме --sql подключения к БД нет, заполнять нечего
+    if not op.get_context().as_sql:
+        op.execute(f"ALTER TABLE ingredients DISABLE TRIGGER {SEARCH_TRIGGER}")
+        fill_ingredient_catalog(op.get_bind())
+        op.execute(f"ALTER TABLE ingredients ENABLE TRIGGER {SEARCH_TRIGGER}")
+
+    op.create_foreign_key(
+        "ingredients_ingredient_id_fkey", "ingredients", "ingredient_catalog", ["ingredient_id"], ["id"]
+    )
+    op.create_index("ix_ingredients_ingredient_id", "ingredients", ["ingredient_id"])
+
+
+def downgrade():
+    op.drop_index("ix_ingredients_ingredient_id", table_name="ingredients")
+    op.drop_constraint("ingredients_ingredient_id_fkey", "ingredients", type_="foreignkey")
+    op.drop_column("ingredients", "base_unit")
+    op.drop_column("ingredients", "quantity")
+    op.drop_column("ingredients", "ingredient_id")
+    op.drop_table("ingredient_aliases")
+    op.drop_table("ingredient_catalog")
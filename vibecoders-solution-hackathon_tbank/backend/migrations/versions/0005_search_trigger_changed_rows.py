@@ -0,0 +1,75 @@
+"""Поисковый вектор: UPDATE ingredients без смены названий не пересчитывает
+
+Функция ingredients_search_vector_trigger при UPDATE пересчитывала
+векторы всех рецептов затронутых строк, в том числе при заполнении и
+объединении справочника ингредиентов (ingredient_catalog.py), где
+названия не меняются. Теперь рецепты берутся только из строк, где
+изменились name или recipe_id: old_rows и new_rows соединяются по id.
+Список колонок (UPDATE OF) с таблицами переходов PostgreSQL не
+разрешает, поэтому отбор - в самой функции.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION ingredients_search_vector_trigger() RETURNS trigger AS $$
+DECLARE
+    changed integer[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE recipes SET search_vector = recipe_search_vector(title, id)
+        WHERE id IN (SELECT recipe_id FROM new_rows);
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(DISTINCT v.recipe_id) INTO changed
+        FROM (
+            SELECT n.recipe_id, o.recipe_id AS old_recipe_id
+            FROM new_rows AS n JOIN old_rows AS o ON o.id = n.id
+            WHERE n.name IS DISTINCT FROM o.name OR n.recipe_id <> o.recipe_id
+        ) AS c, LATERAL (VALUES (c.recipe_id), (c.old_recipe_id)) AS v (recipe_id);
+        IF changed IS NOT NULL THEN
+            UPDATE recipes SET search_vector = recipe_search_vector(title, id)
+            WHERE id = ANY(changed);
+        END IF;
+    ELSE
+        UPDATE recipes SET search_vector = recipe_search_vector(title, id)
+        WHERE id IN (SELECT recipe_id FROM old_rows);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+# Функция из 0001_baseline
+PREVIOUS_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION ingredients_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE recipes SET search_vector = recipe_search_vector(title, id)
+        WHERE id IN (SELECT recipe_id FROM new_rows);
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE recipes SET search_vector = recipe_search_vector(title, id)
+        WHERE id IN (SELECT recipe_id FROM new_rows UNION SELECT recipe_id FROM old_rows);
+    ELSE
+        UPDATE recipes SET search_vector = recipe_search_vector(title, id)
+        WHERE id IN (SELECT recipe_id FROM old_rows);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    op.execute(TRIGGER_FUNCTION)
+
+
+def downgrade():
+    op.execute(PREVIOUS_TRIGGER_FUNCTION)
@@ -0,0 +1,48 @@
+"""Номер транзакции последнего изменения для токенов синхронизации
+
+Колонка change_xid у recipes и reviews, ее ставит триггер BEFORE INSERT
+OR UPDATE (pg_current_xact_id()), и индексы по ней. Токен синхронизации -
+xmin снимка БД (см. sync.py), поэтому не зависит от часов приложения и
+не требует окна перекрытия. Существующие строки остаются с NULL: они уже
+есть в любом полном снимке, снятом после этой ревизии.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+TABLES = ["recipes", "reviews"]
+
+TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION set_change_xid() RETURNS trigger AS $$
+BEGIN
+    NEW.change_xid := pg_current_xact_id();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    op.execute(TRIGGER_FUNCTION)
+    for table in TABLES:
+        op.execute(f"ALTER TABLE {table} ADD COLUMN change_xid xid8")
+        op.create_index(f"ix_{table}_change_xid", table, ["change_xid"])
+        op.execute(
+            f"CREATE TRIGGER {table}_change_xid BEFORE INSERT OR UPDATE ON {table} "
+            "FOR EACH ROW EXECUTE FUNCTION set_change_xid()"
+        )
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_change_xid ON {table}")
+        op.drop_index(f"ix_{table}_change_xid", table_name=table)
+        op.drop_column(table, "change_xid")
+    op.execute("DROP FUNCTION IF EXISTS set_change_xid()")
@@ -1,11 +1,21 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Date
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Date, Index, func, literal_column
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.types import UserDefinedType
 from datetime import datetime
 
 Base = declarative_base()
 
 
+class XID8(UserDefinedType):
+    """Номер транзакции PostgreSQL (xid8), asyncpg отдает его как int"""
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return "xid8"
+
+
 class Recipe(Base):
     __tablename__ = "recipes"
 
@@ -16,8 +26,15 @@ class Recipe(Base):
     servings = Column(Integer, nullable=False)
     image = Column(Text, nullable=True)
     calories_per_serving = Column(Integer, nullable=True)
-    rating = Column(Float, nullable=True)
+    rating = Column(Float, nullable=True)  # rating_sum / rating_count, обновляется вместе с отзывами
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Время последнего изменения (в т.ч. агрегата рейтинга), для синхронизации клиентов, см. sync.py
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Транзакция последней записи в строку, ставится триггером; токены синхронизации, см. sync.py
+    change_xid = Column(XID8, nullable=True, index=True)
+    search_vector = Column(TSVECTOR, nullable=True)  # поддерживается триггерами, см. search.py
 
     # Relationships
     ingredients = relationship("Ingredient", back_populates="recipe", cascade="all, delete-orphan", order_by="Ingredient.order")
@@ -25,15 +42,35 @@ class Recipe(Base):
     reviews = relationship("Review", back_populates="recipe", cascade="all, delete-orphan")
 
 
+class IngredientCatalog(Base):
+    """Справочник ингредиентов, см. ingredient_catalog.py"""
+    __tablename__ = "ingredient_catalog"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), nullable=False)
+    key = Column(String(255), nullable=False, unique=True)  # normalize_name(name)
+
+
+class IngredientAlias(Base):
+    __tablename__ = "ingredient_aliases"
+
+    alias = Column(String(255), primary_key=True)  # normalize_name(название)
+    ingredient_id = Column(Integer, ForeignKey("ingredient_catalog.id"), nullable=False, index=True)
+
+
 class Ingredient(Base):
     __tablename__ = "ingredients"
 
     id = Column(Integer, primary_key=True, index=True)
-    recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=False)
+    recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=False, index=True)
     name = Column(String(255), nullable=False)
     amount = Column(String(50), nullable=False)
     unit = Column(String(50), nullable=False)
     order = Column(Integer, nullable=False, default=0)
+    # Заполняются при записи, см. ingredient_catalog.py
+    ingredient_id = Column(Integer, ForeignKey("ingredient_catalog.id"), nullable=True, index=True)
+    quantity = Column(Float, nullable=True)  # в base_unit, без base_unit - в единицах unit
+    base_unit = Column(String(10), nullable=True)  # g, ml, pcs
 
     # Relationships
     recipe = relationship("Recipe", back_populates="ingredients")
@@ -43,7 +80,7 @@ class Step(Base):
     __tablename__ = "steps"
 
     id = Column(Integer, primary_key=True, index=True)
-    recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=False)
+    recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=False, index=True)
     number = Column(Integer, nullable=False)
     instruction = Column(Text, nullable=False)
     image = Column(Text, nullable=True)
@@ -63,22 +100,34 @@ class Review(Base):
     comment = Column(Text, nullable=False)
     date = Column(String(50), nullable=False)  # Формат: "15 ноя 2024"
     image = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    change_xid = Column(XID8, nullable=True, index=True)  # как у Recipe
 
     # Relationships
     recipe = relationship("Recipe", back_populates="reviews")
 
 
+# Ключ сортировки по рейтингу: рецепты без отзывов идут последними.
+# Константа без параметра, чтобы ORDER BY совпадал с выражением индекса
+recipe_rating_sort_key = func.coalesce(Recipe.rating, literal_column("0"))
+
+# Индексы keyset-пагинации (см. pagination.py)
+Index("ix_recipes_rating_keyset", recipe_rating_sort_key.desc(), Recipe.id)
+Index("ix_recipes_cook_time_keyset", Recipe.cook_time, Recipe.id)
+Index("ix_recipes_category_keyset", Recipe.category, Recipe.id)
+Index("ix_reviews_recipe_keyset", Review.recipe_id, Review.id)
+
+
 class MenuPlan(Base):
     __tablename__ = "menu_plans"
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False, unique=True, index=True)
     user_id = Column(String(100), nullable=True)  # Для будущего расширения
-    breakfast_recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=True)
-    lunch_recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=True)
-    dinner_recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=True)
-    extra_recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=True)
+    breakfast_recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=True, index=True)
+    lunch_recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=True, index=True)
+    dinner_recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=True, index=True)
+    extra_recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -88,3 +137,15 @@ class MenuPlan(Base):
     dinner_recipe = relationship("Recipe", foreign_keys=[dinner_recipe_id])
     extra_recipe = relationship("Recipe", foreign_keys=[extra_recipe_id])
 
+
+class MenuDaySummary(Base):
+    """Суммы по рецептам плана на дату, поддерживаются menu_summary.py"""
+    __tablename__ = "menu_day_summaries"
+
+    date = Column(Date, primary_key=True)
+    recipes = Column(Integer, nullable=False)  # заполненные слоты
+    calories = Column(Integer, nullable=False)  # по порции на слот
+    calories_unknown = Column(Integer, nullable=False)  # слоты с рецептами без калорий
+    cook_time = Column(Integer, nullable=False)  # в минутах
+    ingredients = Column(Integer, nullable=False)  # строк ингредиентов
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,76 @@
+"""
+Keyset (cursor) пагинация
+
+Курсор - непрозрачная base64url-строка с названием сортировки и ключом
+последней строки страницы. Следующая страница выбирается условием
+"строго после ключа" по тем же колонкам, что и ORDER BY, поэтому
+стоимость запроса не зависит от номера страницы.
+"""
+from typing import Any, List, Optional, Sequence, Tuple
+import base64
+import json
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, tuple_
+
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 200))
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 100))
+
+
+def page_size(limit: Optional[int]) -> int:
+    """Размер страницы с учетом значения по умолчанию и максимума"""
+    return min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+
+def encode_cursor(order: str, key: Sequence[Any]) -> str:
+    """Закодировать ключ последней строки страницы"""
+    raw = json.dumps({"o": order, "k": list(key)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str) -> List[Any]:
+    """Раскодировать курсор; курсор другой сортировки считается ошибкой"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key = data["k"]
+        cursor_order = data["o"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_order != order or not isinstance(key, list):
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested ordering")
+    # Ключи всех сортировок - числа
+    if not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in key):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+def keyset_condition(columns: Sequence[Tuple[Any, bool]], key: Sequence[Any]):
+    """Условие "строка после key" для сортировки columns = [(выражение, по убыванию)].
+
+    При одном направлении всех колонок - сравнение строк (k0, id) > (v0, x),
+    оно идет в Index Cond составного индекса. Иначе - раскрытое OR с
+    избыточной границей по первой колонке (k0 <= v0 по убыванию), чтобы
+    индекс по ней ограничивал диапазон.
+    """
+    if len(columns) != len(key):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    directions = {descending for _, descending in columns}
+    if len(directions) == 1:
+        row, row_key = tuple_(*[column for column, _ in columns]), tuple_(*key)
+        return row < row_key if directions.pop() else row > row_key
+
+    clauses = []
+    for i, (column, descending) in enumerate(columns):
+        equal_prefix = [col == value for (col, _), value in zip(columns[:i], key[:i])]
+        after = column < key[i] if descending else column > key[i]
+        clauses.append(and_(*equal_prefix, after))
+    leading, descending = columns[0]
+    bound = leading <= key[0] if descending else leading >= key[0]
+    return and_(bound, or_(*clauses))
+
+
+def order_clauses(columns: Sequence[Tuple[Any, bool]]) -> list:
+    """ORDER BY для той же сортировки"""
+    return [column.desc() if descending else column.asc() for column, descending in columns]
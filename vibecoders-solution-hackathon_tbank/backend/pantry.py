@@ -0,0 +1,332 @@
+"""
+Подбор рецептов по продуктам пользователя ("что приготовить")
+
+Инвертированный индекс в памяти процесса: у каждого рецепта есть слот
+(номер бита, в порядке id), у каждого продукта - множество слотов
+рецептов, где он встречается. Множества частых продуктов хранятся
+битовыми масками (int), редких - множествами слотов, которые переводятся
+в маску на время запроса. Число совпавших продуктов у всех рецептов сразу
+считает побитовый счетчик (bit-sliced): маски продуктов складываются
+поразрядно в log2(N) масок-разрядов, перебора рецептов нет. Категория,
+время приготовления и число ингредиентов - тоже маски.
+
+Продукт рецепта - ingredient_id справочника (ingredient_catalog.py), в
+ответе - его название из справочника. Продукты пользователя переводятся
+в id через ingredient_aliases, поэтому объединение ингредиентов (merge)
+сказывается на подборе: при изменении алиасов индекс собирается заново.
+Строки ingredients без ingredient_id учитываются по ключу названия.
+
+Сборка и обновление из БД - см. recipe_index.py; изменения рецептов
+проверяются не чаще раза в PANTRY_REFRESH_SECONDS.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+import os
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ingredient_catalog import normalize_name
+from models import Recipe, Ingredient, IngredientAlias, IngredientCatalog
+from recipe_index import RecipeIndex
+
+# Как часто проверять изменения рецептов в БД, секунд
+PANTRY_REFRESH_SECONDS = float(os.getenv("PANTRY_REFRESH_SECONDS", 30))
+
+# Множество продукта хранится маской, если продукт есть хотя бы в 1/32
+# рецептов: тогда маска не больше множества из 4-байтных слотов
+DENSE_FRACTION = 32
+
+Posting = Union[int, Set[int]]
+# id справочника или, у строк без ingredient_id, ключ названия
+TermKey = Union[int, str]
+
+
+def iter_slots(mask: int) -> Iterable[int]:
+    """Номера установленных битов маски по возрастанию"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def slots_to_mask(slots: Set[int]) -> int:
+    buffer = bytearray((max(slots) >> 3) + 1) if slots else bytearray()
+    for slot in slots:
+        buffer[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(buffer, "little")
+
+
+@dataclass
+class RecipeMatch:
+    recipe_id: int
+    matched: int
+    total: int
+    missing: List[str]
+
+    @property
+    def coverage(self) -> float:
+        return self.matched / self.total
+
+
+class PantryIndex(RecipeIndex):
+    """Инвертированный индекс продукт -> рецепты"""
+
+    def __init__(self, refresh_seconds: float = PANTRY_REFRESH_SECONDS):
+        super().__init__(refresh_seconds)
+        self._clear()
+
+    def _clear(self):
+        self._slots: Dict[int, int] = {}  # id рецепта -> слот
+        self._recipe_ids: List[int] = []  # слот -> id рецепта
+        self._recipe_terms: List[Tuple[int, ...]] = []  # слот -> продукты рецепта
+        self._recipe_attrs: List[Optional[Tuple[str, int]]] = []  # слот -> (категория, время)
+        self._terms: Dict[TermKey, int] = {}  # продукт -> номер продукта
+        self._names: List[str] = []  # номер продукта -> название для ответа
+        self._aliases: Dict[str, int] = {}  # ключ названия -> id справочника
+        self._postings: List[Posting] = []
+        self._categories: Dict[str, int] = {}
+        self._cook_times: Dict[int, int] = {}
+        self._sizes: Dict[int, int] = {}
+
+    # ---------- Обновление ----------
+
+    async def _load(self, db: AsyncSession, since: Optional[int]):
+        aliases = dict((await db.execute(select(IngredientAlias.alias, IngredientAlias.ingredient_id))).all())
+        # Алиас стал указывать на другой id (merge): продукты рецептов устарели
+        if since is not None and any(self._aliases.get(alias, id_) != id_ for alias, id_ in aliases.items()):
+            since = None
+
+        # Строка на рецепт с массивами id и названий ингредиентов, а не строка на ингредиент
+        has_ingredient = Ingredient.id.isnot(None)
+        ingredient_ids = func.array_agg(
+            aggregate_order_by(Ingredient.ingredient_id, Ingredient.order)
+        ).filter(has_ingredient)
+        names = func.array_agg(aggregate_order_by(Ingredient.name, Ingredient.order)).filter(has_ingredient)
+        query = (
+            select(
+                Recipe.id, Recipe.category, Recipe.cook_time,
+                ingredient_ids.label("ingredient_ids"), names.label("names")
+            )
+            .outerjoin(Ingredient, Ingredient.recipe_id == Recipe.id)
+            .group_by(Recipe.id)
+            .order_by(Recipe.id)
+        )
+        if since is not None:
+            query = query.where(Recipe.change_xid >= since)
+        rows = (await db.execute(query)).all()
+        catalog_names: Dict[int, str] = {}
+        if rows:
+            catalog_names = dict((await db.execute(select(IngredientCatalog.id, IngredientCatalog.name))).all())
+
+        if since is None:
+            self.rebuilds += 1
+            # Полная сборка - секунды CPU на 100 000 рецептов: в потоке и в новый
+            # индекс, поля которого затем подменяются без переключения event loop
+            fresh = PantryIndex(self.refresh_seconds)
+            fresh._aliases = aliases
+            await run_in_threadpool(fresh._build, rows, catalog_names)
+            self._adopt(fresh)
+        else:
+            self._aliases = aliases
+            for row in rows:
+                self._put(row.id, row.category, row.cook_time, row.ingredient_ids or [], row.names or [], catalog_names)
+
+    def _build(self, rows, catalog_names: Dict[int, str]):
+        """Полная сборка: маски собираются из множеств слотов за один проход"""
+        aliases = self._aliases
+        self._clear()
+        self._aliases = aliases
+        postings: List[Set[int]] = []
+        categories: Dict[str, Set[int]] = {}
+        cook_times: Dict[int, Set[int]] = {}
+        sizes: Dict[int, Set[int]] = {}
+        for slot, row in enumerate(rows):
+            terms = self._term_ids(row.ingredient_ids or [], row.names or [], catalog_names)
+            self._slots[row.id] = slot
+            self._recipe_ids.append(row.id)
+            self._recipe_terms.append(terms)
+            self._recipe_attrs.append((row.category, row.cook_time))
+            for term in terms:
+                if term == len(postings):
+                    postings.append(set())
+                postings[term].add(slot)
+            categories.setdefault(row.category, set()).add(slot)
+            cook_times.setdefault(row.cook_time, set()).add(slot)
+            sizes.setdefault(len(terms), set()).add(slot)
+
+        threshold = len(rows) // DENSE_FRACTION
+        self._postings = [
+            slots_to_mask(slots) if len(slots) > threshold else slots for slots in postings
+        ]
+        self._categories = {key: slots_to_mask(slots) for key, slots in categories.items()}
+        self._cook_times = {key: slots_to_mask(slots) for key, slots in cook_times.items()}
+        self._sizes = {key: slots_to_mask(slots) for key, slots in sizes.items()}
+
+    def _adopt(self, other: "PantryIndex"):
+        for field in (
+            "_slots", "_recipe_ids", "_recipe_terms", "_recipe_attrs", "_terms", "_names",
+            "_aliases", "_postings", "_categories", "_cook_times", "_sizes",
+        ):
+            setattr(self, field, getattr(other, field))
+
+    def _term_ids(
+        self, ingredient_ids: List[Optional[int]], names: List[str], catalog_names: Dict[int, str]
+    ) -> Tuple[int, ...]:
+        """Номера продуктов рецепта без повторов; новые продукты добавляются в словарь"""
+        terms = {}
+        for ingredient_id, name in zip(ingredient_ids, names):
+            key = normalize_name(name) if ingredient_id is None else ingredient_id
+            term = self._terms.get(key)
+            if term is None:
+                term = self._terms[key] = len(self._names)
+                self._names.append(catalog_names.get(ingredient_id, name))
+            terms[term] = None
+        return tuple(terms)
+
+    def _put(
+        self, recipe_id: int, category: str, cook_time: int,
+        ingredient_ids: List[Optional[int]], names: List[str], catalog_names: Dict[int, str]
+    ):
+        """Добавить или заменить один рецепт"""
+        slot = self._slots.get(recipe_id)
+        if slot is None:
+            slot = len(self._recipe_ids)
+            self._slots[recipe_id] = slot
+            self._recipe_ids.append(recipe_id)
+            self._recipe_terms.append(())
+            self._recipe_attrs.append(None)
+        else:
+            self._remove_slot(slot)
+
+        terms = self._term_ids(ingredient_ids, names, catalog_names)
+        self._recipe_terms[slot] = terms
+        self._recipe_attrs[slot] = (category, cook_time)
+        bit = 1 << slot
+        for term in terms:
+            if term == len(self._postings):
+                self._postings.append(set())
+            posting = self._postings[term]
+            if isinstance(posting, int):
+                self._postings[term] = posting | bit
+            else:
+                posting.add(slot)
+        self._categories[category] = self._categories.get(category, 0) | bit
+        self._cook_times[cook_time] = self._cook_times.get(cook_time, 0) | bit
+        self._sizes[len(terms)] = self._sizes.get(len(terms), 0) | bit
+
+    def _remove_slot(self, slot: int):
+        attrs = self._recipe_attrs[slot]
+        if attrs is None:
+            return
+        bit = 1 << slot
+        for term in self._recipe_terms[slot]:
+            posting = self._postings[term]
+            if isinstance(posting, int):
+                self._postings[term] = posting & ~bit
+            else:
+                posting.discard(slot)
+        category, cook_time = attrs
+        self._categories[category] &= ~bit
+        self._cook_times[cook_time] &= ~bit
+        self._sizes[len(self._recipe_terms[slot])] &= ~bit
+
+    # ---------- Поиск ----------
+
+    def match(
+        self,
+        ingredients: Iterable[str],
+        category: Optional[str] = None,
+        max_cook_time: Optional[int] = None,
+        limit: int = 20
+    ) -> List[RecipeMatch]:
+        """Рецепты хотя бы с одним продуктом из ingredients.
+
+        Порядок: доля имеющихся продуктов по убыванию, затем меньше
+        недостающих, затем id. Неизвестные продукты не учитываются.
+        """
+        owned = set()
+        for key in map(normalize_name, ingredients):
+            # Через алиас - к id справочника; по самому ключу - строки без ingredient_id
+            for term_key in (self._aliases.get(key), key):
+                if term_key in self._terms:
+                    owned.add(self._terms[term_key])
+        if not owned:
+            return []
+
+        # Поразрядный счетчик совпадений: planes[i] - i-й бит числа совпавших продуктов
+        planes: List[int] = []
+        for term in owned:
+            posting = self._postings[term]
+            carry = posting if isinstance(posting, int) else slots_to_mask(posting)
+            for i in range(len(planes)):
+                if not carry:
+                    break
+                planes[i], carry = planes[i] ^ carry, planes[i] & carry
+            if carry:
+                planes.append(carry)
+
+        allowed = (1 << len(self._recipe_ids)) - 1
+        if category is not None:
+            allowed &= self._categories.get(category, 0)
+        if max_cook_time is not None:
+            cook_time_mask = 0
+            for cook_time, mask in self._cook_times.items():
+                if cook_time <= max_cook_time:
+                    cook_time_mask |= mask
+            allowed &= cook_time_mask
+        if not allowed:
+            return []
+
+        # Группы (совпало, всего) с одним ключом порядка (доля, недостающие) выдаются
+        # вместе, по слотам = по id: при полном покрытии это все группы совпало == всего
+        groups: Dict[Tuple[float, int], List[Tuple[int, int]]] = {}
+        for total in self._sizes:
+            for matched in range(1, min(total, len(owned)) + 1):
+                groups.setdefault((-matched / total, total - matched), []).append((matched, total))
+        counts: Dict[int, int] = {}
+        results: List[RecipeMatch] = []
+        for order_key in sorted(groups):
+            mask = 0
+            for matched, total in groups[order_key]:
+                if matched not in counts:
+                    counts[matched] = self._count_equals(planes, matched, allowed)
+                mask |= counts[matched] & self._sizes[total]
+            missing_count = order_key[1]
+            for slot in iter_slots(mask):
+                terms = self._recipe_terms[slot]
+                results.append(RecipeMatch(
+                    recipe_id=self._recipe_ids[slot],
+                    matched=len(terms) - missing_count,
+                    total=len(terms),
+                    missing=[self._names[term] for term in terms if term not in owned]
+                ))
+                if len(results) >= limit:
+                    return results
+        return results
+
+    @staticmethod
+    def _count_equals(planes: List[int], value: int, mask: int) -> int:
+        """Маска рецептов, у которых счетчик равен value"""
+        if value >> len(planes):
+            return 0
+        for i, plane in enumerate(planes):
+            mask &= plane if value >> i & 1 else ~plane
+        return mask
+
+    def stats(self) -> dict:
+        dense = sum(isinstance(posting, int) for posting in self._postings)
+        return {
+            "recipes": len(self._slots),
+            "ingredients": len(self._names),
+            "aliases": len(self._aliases),
+            "dense_postings": dense,
+            "sparse_postings": len(self._postings) - dense,
+            "synced_at": self.synced_at,
+            **self.cache_stats(len(self._slots)),
+        }
+
+
+pantry_index = PantryIndex()
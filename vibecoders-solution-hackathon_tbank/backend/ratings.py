@@ -0,0 +1,66 @@
+"""
+Агрегаты рейтинга рецептов (rating_sum / rating_count / rating)
+
+Агрегат обновляется при записи отзыва в add_review. Скрипт пересчитывает
+его из таблицы reviews после массового импорта или при расхождении:
+
+    python ratings.py
+"""
+from sqlalchemy import Float, cast, text
+from sqlalchemy.orm import Session
+import sys
+
+from models import Recipe
+
+
+# Пересчет агрегата; обновляются только строки, разошедшиеся с reviews
+RECONCILE_SQL = """
+UPDATE recipes AS r
+SET rating_sum = COALESCE(a.rating_sum, 0),
+    rating_count = COALESCE(a.rating_count, 0),
+    rating = a.rating_sum::float / NULLIF(a.rating_count, 0),
+    updated_at = now() AT TIME ZONE 'utc'
+FROM recipes AS src
+LEFT JOIN (
+    SELECT recipe_id, SUM(rating) AS rating_sum, COUNT(*) AS rating_count
+    FROM reviews
+    GROUP BY recipe_id
+) AS a ON a.recipe_id = src.id
+WHERE r.id = src.id
+  AND (r.rating_sum IS DISTINCT FROM COALESCE(a.rating_sum, 0)
+       OR r.rating_count IS DISTINCT FROM COALESCE(a.rating_count, 0)
+       OR r.rating IS DISTINCT FROM a.rating_sum::float / NULLIF(a.rating_count, 0))
+"""
+
+
+def rating_update_values(rating: int) -> dict:
+    """Значения для UPDATE recipes при добавлении отзыва с оценкой rating"""
+    return {
+        Recipe.rating_sum: Recipe.rating_sum + rating,
+        Recipe.rating_count: Recipe.rating_count + 1,
+        # В SET используются значения строки до обновления
+        Recipe.rating: cast(Recipe.rating_sum + rating, Float) / (Recipe.rating_count + 1),
+    }
+
+
+def reconcile_ratings(db: Session) -> int:
+    """Пересчитать агрегаты рейтинга из reviews, возвращает число исправленных рецептов"""
+    result = db.execute(text(RECONCILE_SQL))
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print("Пересчет рейтингов рецептов...")
+        fixed = reconcile_ratings(db)
+        db.commit()
+        print(f"Готово, исправлено рецептов: {fixed}")
+    except Exception as e:
+        db.rollback()
+        print(f"Ошибка при пересчете рейтингов: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db.close()
@@ -0,0 +1,88 @@
+"""
+Индексы каталога рецептов в памяти процесса
+
+Индекс строится из БД при старте воркера (после прогрева пула) или при
+первом запросе и дальше обновляется инкрементально: рецепты с change_xid
+не ниже горизонта снимка прошлого обновления (как у синхронизации, см.
+sync.py) перечитываются не чаще раза в refresh_seconds; импорт через API
+помечает индексы устаревшими сразу. У каждого воркера свои индексы.
+"""
+from datetime import datetime
+from typing import Optional
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from sync import sync_horizon
+
+
+class RecipeIndex:
+    """Основа индекса: когда и с какого момента перечитывать рецепты.
+
+    Все обращения идут из event loop; обновление из БД - под asyncio.Lock,
+    чтение индекса синхронное и не видит его в промежуточном состоянии.
+    Наследники реализуют _load: since=None - полная сборка, иначе -
+    рецепты с change_xid >= since; полная сборка увеличивает rebuilds.
+
+    Для метрик индекс считается кэшем каталога: hits - запросы, которым
+    хватило индекса без чтения БД, misses - запросы, перечитавшие изменения.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._lock = asyncio.Lock()
+        self._synced_at: Optional[datetime] = None
+        self._horizon: Optional[int] = None
+        self._checked_at = 0.0
+        self._stale = True
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+
+    def mark_stale(self):
+        """Рецепты изменились: перечитать изменения при следующем запросе"""
+        self._stale = True
+
+    async def refresh(self, db: AsyncSession, force: bool = False):
+        """Подтянуть изменения рецептов из БД, если индекс устарел"""
+        if not force and not self._needs_refresh():
+            self.hits += 1
+            return
+        async with self._lock:
+            if not force and not self._needs_refresh():
+                self.hits += 1
+                return
+            self.misses += 1
+            started = datetime.utcnow()
+            self._stale = False
+            try:
+                horizon = await sync_horizon(db)
+                await self._load(db, self._horizon)
+            except BaseException:
+                self._stale = True
+                raise
+            self._horizon = horizon
+            self._synced_at = started
+            self._checked_at = time.monotonic()
+
+    def _needs_refresh(self) -> bool:
+        return self._stale or time.monotonic() - self._checked_at >= self.refresh_seconds
+
+    async def _load(self, db: AsyncSession, since: Optional[int]):
+        raise NotImplementedError
+
+    def cache_stats(self, entries: int) -> dict:
+        """Счетчики для metrics.register_cache"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "rebuilds": self.rebuilds,
+        }
+
+    @property
+    def synced_at(self) -> Optional[str]:
+        return self._synced_at.isoformat() if self._synced_at else None
@@ -1,6 +1,12 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
-from datetime import date
+from pydantic import AfterValidator, BaseModel, Field
+from typing import Annotated, Dict, List, Literal, Optional
+from datetime import date, datetime
+
+from images import image_url, thumbnail_url
+
+# Поля ответов: ключ хранилища изображений -> URL файла или миниатюры
+ImageUrl = Annotated[Optional[str], AfterValidator(image_url)]
+ThumbnailUrl = Annotated[Optional[str], AfterValidator(thumbnail_url)]
 
 
 # Ingredient schemas
@@ -18,6 +24,10 @@ class IngredientResponse(IngredientBase):
     id: int
     recipe_id: int
     order: int
+    # Из справочника ингредиентов: id и количество в base_unit (g, ml, pcs), см. ingredient_catalog.py
+    ingredient_id: Optional[int] = None
+    quantity: Optional[float] = None
+    base_unit: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -38,6 +48,7 @@ class StepResponse(StepBase):
     id: int
     recipe_id: int
     order: int
+    image: ImageUrl = None
 
     class Config:
         from_attributes = True
@@ -59,11 +70,19 @@ class ReviewCreate(ReviewBase):
 class ReviewResponse(ReviewBase):
     id: int
     recipe_id: int
+    image: ImageUrl = None
 
     class Config:
         from_attributes = True
 
 
+class ReviewPage(BaseModel):
+    """Страница отзывов рецепта, от новых к старым"""
+    items: List[ReviewResponse]
+    total: int
+    next_cursor: Optional[str] = None
+
+
 # Recipe schemas
 class RecipeBase(BaseModel):
     title: str
@@ -81,10 +100,45 @@ class RecipeCreate(RecipeBase):
 
 class RecipeResponse(RecipeBase):
     id: int
+    image: ImageUrl = None
     rating: Optional[float] = None
     ingredients: List[IngredientResponse]
     steps: List[StepResponse]
     reviews: Optional[List[ReviewResponse]] = []
+    reviews_total: Optional[int] = None
+    reviews_next_cursor: Optional[str] = None  # есть, если отдана только первая страница отзывов
+
+    class Config:
+        from_attributes = True
+
+
+class RecipeImportError(BaseModel):
+    """Ошибка одной записи импорта; record - номер строки NDJSON или позиция в массиве"""
+    record: int
+    error: str
+
+
+class RecipeImportResult(BaseModel):
+    """Отчет POST /api/recipes/import"""
+    imported: int = 0
+    failed: int = 0
+    errors: List[RecipeImportError] = []
+
+
+class RecipeBatchRequest(BaseModel):
+    """Тело POST /api/recipes/batch"""
+    ids: List[int]
+
+
+class RecipeSyncItem(RecipeBase):
+    """Рецепт в потоке синхронизации: без отзывов, с агрегатом рейтинга"""
+    id: int
+    image: ImageUrl = None
+    rating: Optional[float] = None
+    rating_count: int
+    updated_at: Optional[datetime] = None
+    ingredients: List[IngredientResponse]
+    steps: List[StepResponse]
 
     class Config:
         from_attributes = True
@@ -97,7 +151,7 @@ class RecipeListItem(BaseModel):
     category: str
     cook_time: int
     servings: int
-    image: Optional[str] = None
+    image: ThumbnailUrl = None
     calories_per_serving: Optional[int] = None
     rating: Optional[float] = None
 
@@ -105,6 +159,22 @@ class RecipeListItem(BaseModel):
         from_attributes = True
 
 
+class PantryMatchRequest(BaseModel):
+    """Тело POST /api/recipes/match: продукты пользователя и фильтры"""
+    ingredients: List[str]
+    category: Optional[str] = None
+    max_cook_time: Optional[int] = Field(None, ge=0)
+    limit: Optional[int] = Field(None, ge=1)
+
+
+class RecipeMatchItem(RecipeListItem):
+    """Рецепт, подобранный по продуктам: сколько есть, сколько нужно и чего не хватает"""
+    matched: int
+    total: int
+    coverage: float
+    missing: List[str]
+
+
 # MenuPlan schemas
 class MenuPlanBase(BaseModel):
     date: date
@@ -119,6 +189,36 @@ class MenuPlanCreate(MenuPlanBase):
     pass
 
 
+class MenuPlanBulkRequest(BaseModel):
+    """Тело POST /api/menu-plans/bulk: планы на разные даты"""
+    plans: List[MenuPlanCreate]
+
+
+class MenuSlotRule(BaseModel):
+    """Ограничения слота при генерации меню"""
+    category: Optional[str] = None
+    max_cook_time: Optional[int] = Field(None, ge=0)  # вместо общего max_cook_time
+
+
+def default_menu_slots() -> dict:
+    return {"breakfast": MenuSlotRule(), "lunch": MenuSlotRule(), "dinner": MenuSlotRule()}
+
+
+class MenuGenerateRequest(BaseModel):
+    """Тело POST /api/menu-plans/generate: период, заполняемые слоты и ограничения"""
+    start_date: date
+    end_date: date
+    slots: Dict[Literal["breakfast", "lunch", "dinner", "extra"], MenuSlotRule] = Field(
+        default_factory=default_menu_slots
+    )
+    daily_calories: Optional[int] = Field(None, gt=0)  # калорий на порцию за день
+    max_cook_time: Optional[int] = Field(None, ge=0)
+    min_rating: Optional[float] = Field(None, ge=0, le=5)
+    no_repeat_days: int = Field(7, ge=0)  # рецепт не повторяется раньше, чем через столько дней
+    keep_existing: bool = False  # не менять уже заполненные слоты
+    seed: Optional[int] = None
+
+
 class MenuPlanResponse(MenuPlanBase):
     id: int
     breakfast_recipe: Optional[RecipeListItem] = None
@@ -129,3 +229,32 @@ class MenuPlanResponse(MenuPlanBase):
     class Config:
         from_attributes = True
 
+
+class MenuSummaryItem(BaseModel):
+    """Суммы по запланированным рецептам за день, неделю или месяц"""
+    period_start: date  # границы периода в пределах запрошенного диапазона
+    period_end: date
+    days: int  # дней с планами
+    recipes: int
+    calories: int  # по порции на слот
+    calories_unknown: int  # слоты с рецептами без калорий
+    average_calories: float  # на день с планами
+    cook_time: int
+    ingredients: int
+
+
+# Image schemas
+class ImageUploadResponse(BaseModel):
+    """Загруженное изображение: key передается в поле image, URL - для показа"""
+    key: str
+    url: str
+    thumbnail_url: str
+
+
+# ShoppingList schemas
+class ShoppingListItem(BaseModel):
+    """Суммарное количество ингредиента по запланированным рецептам"""
+    name: str
+    unit: str
+    amount: float
+    recipes: List[str]
@@ -0,0 +1,86 @@
+"""
+Полнотекстовый и триграммный поиск рецептов
+
+recipes.search_vector хранит tsvector (конфигурация russian) из названия
+(вес A) и названий ингредиентов (вес B). Вектор поддерживается триггерами
+при записи в recipes и ingredients, GIN-индексы покрывают полнотекстовый
+поиск и pg_trgm-поиск с опечатками по названиям рецептов и ингредиентов.
+
+Колонку, индексы, функции и триггеры создают только миграции
+(migrations/versions/0001_baseline.py, функция триггера ingredients -
+0005_search_trigger_changed_rows.py). Скрипт только пересчитывает векторы,
+например после правки recipes или ingredients в обход триггеров:
+
+    python search.py
+"""
+from sqlalchemy import func, select, text, union
+from sqlalchemy.orm import Session
+import re
+import sys
+
+from models import Recipe, Ingredient
+
+# Конфигурация полнотекстового поиска PostgreSQL
+SEARCH_CONFIG = "russian"
+
+# Пересчет векторов всех рецептов; функция recipe_search_vector - из миграций
+REBUILD_SQL = "UPDATE recipes SET search_vector = recipe_search_vector(title, id)"
+
+
+def prefix_tsquery(term: str) -> str:
+    """Строка для to_tsquery: все слова запроса как префиксы ("мук:* & яйц:*")"""
+    words = re.findall(r"\w+", term.lower())
+    return " & ".join(f"{word}:*" for word in words)
+
+
+def search_filter(term: str):
+    """Условие поиска рецептов и выражение релевантности: (условие, rank).
+
+    Рецепт подходит, если совпадает полнотекстовый префиксный запрос по
+    названию и ингредиентам, либо название или ингредиент похожи на запрос
+    по триграммам (опечатки) или содержат его как подстроку.
+
+    id подходящих рецептов собираются UNION отдельных выборок, каждая по
+    своему GIN-индексу. Одно OR по всем веткам с подзапросом по
+    ingredients планировщик не раскладывает в BitmapOr и читает recipes
+    целиком.
+    """
+    term = term.strip()
+    candidates = [
+        select(Recipe.id).where(Recipe.title.op("%")(term)),
+        select(Recipe.id).where(Recipe.title.ilike(f"%{term}%")),
+        select(Ingredient.recipe_id).where(Ingredient.name.op("%")(term)),
+        select(Ingredient.recipe_id).where(Ingredient.name.ilike(f"%{term}%")),
+    ]
+    rank = func.similarity(Recipe.title, term)
+
+    tsquery_text = prefix_tsquery(term)
+    if tsquery_text:
+        tsquery = func.to_tsquery(SEARCH_CONFIG, tsquery_text)
+        candidates.insert(0, select(Recipe.id).where(Recipe.search_vector.op("@@")(tsquery)))
+        rank = rank + func.ts_rank(Recipe.search_vector, tsquery)
+
+    return Recipe.id.in_(union(*candidates)), rank
+
+
+def rebuild_search_vectors(db: Session) -> int:
+    """Пересчитать search_vector для всех рецептов"""
+    result = db.execute(text(REBUILD_SQL))
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print("Пересчет поисковых векторов рецептов...")
+        updated = rebuild_search_vectors(db)
+        db.commit()
+        print(f"Готово, обновлено рецептов: {updated}")
+    except Exception as e:
+        db.rollback()
+        print(f"Ошибка при пересчете поисковых векторов: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db.close()
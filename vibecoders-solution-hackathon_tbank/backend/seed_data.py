@@ -2,8 +2,16 @@
 Скрипт для заполнения базы данных тестовыми данными
 """
 from database import SessionLocal, init_db
-from models import Recipe, Ingredient, Step, Review
+from ingredient_catalog import fill_ingredient_catalog
+from models import Recipe, Ingredient, Step, Review, MenuPlan
+from ratings import reconcile_ratings
+from schemas import IngredientCreate, RecipeCreate, StepCreate
+from datetime import date, datetime, timedelta
+import argparse
+import asyncio
+import random
 import sys
+import time
 
 
 def seed_database():
@@ -231,6 +239,11 @@ def seed_database():
         ]
         db.add_all(steps6)
         
+        # Заполняем агрегаты рейтинга по добавленным отзывам и справочник ингредиентов
+        db.flush()
+        reconcile_ratings(db)
+        fill_ingredient_catalog(db)
+        
         # Сохраняем все изменения
         db.commit()
         print("База данных успешно заполнена тестовыми данными!")
@@ -244,6 +257,265 @@ def seed_database():
         db.close()
 
 
+
+# ========== Генератор синтетических данных ==========
+#
+# Детерминированный (при одинаковом --seed) каталог любого размера для
+# нагрузочного тестирования и проверки планов запросов:
+#
+#     python seed_data.py --recipes 200000 --reviews-per-recipe 0-500 --menu-days 3650 --seed 42
+#
+# Названия ингредиентов распределены по Ципфу: несколько базовых продуктов
+# встречаются почти везде, длинный хвост - редко, как в реальных рецептах.
+# Данные пишутся пачками через COPY (см. ingest.write_batch).
+
+# Фото тестовых рецептов, переиспользуются генератором
+SEED_IMAGES = [
+    "https://images.unsplash.com/photo-1637533114107-1dc725c6e576?crop=entropy&cs=tinysrgb&fit=max&fm=jpg&ixid=M3w3Nzg4Nzd8MHwxfHNlYXJjaHwxfHxwYW5jYWtlcyUyMGJyZWFrZmFzdHxlbnwxfHx8fDE3NjM3NTU1Mzh8MA&ixlib=rb-4.1.0&q=80&w=1080",
+    "https://images.unsplash.com/photo-1622973536968-3ead9e780960?crop=entropy&cs=tinysrgb&fit=max&fm=jpg&ixid=M3w3Nzg4Nzd8MHwxfHNlYXJjaHwxfHxwYXN0YSUyMGJvbG9nbmVzZXxlbnwxfHx8fDE3NjM3NzI0MDl8MA&ixlib=rb-4.1.0&q=80&w=1080",
+    "https://images.unsplash.com/photo-1668283653825-37b80f055b05?crop=entropy&cs=tinysrgb&fit=max&fm=jpg&ixid=M3w3Nzg4Nzd8MHwxfHNlYXJjaHwxfHxvbWVsZXR0ZSUyMGVnZ3N8ZW58MXx8fHwxNjM4MDM4NDJ8MA&ixlib=rb-4.1.0&q=80&w=1080",
+    "https://images.unsplash.com/photo-1519708227418-c8fd9a32b7a2?crop=entropy&cs=tinysrgb&fit=max&fm=jpg&ixid=M3w3Nzg4Nzd8MHwxfHNlYXJjaHwxfHxncmlsbGVkJTIwc2FsbW9ufGVufDF8fHx8MTc2MzcwMzYyOXww&ixlib=rb-4.1.0&q=80&w=1080",
+    "https://images.unsplash.com/photo-1550304943-4f24f54ddde9?crop=entropy&cs=tinysrgb&fit=max&fm=jpg&ixid=M3w3Nzg4Nzd8MHwxfHNlYXJjaHwxfHxjYWVzYXIlMjBzYWxhZHxlbnwxfHx8fDE3NjM3NzMyOTZ8MA&ixlib=rb-4.1.0&q=80&w=1080",
+    "https://images.unsplash.com/photo-1606890737304-57a1ca8a5b62?crop=entropy&cs=tinysrgb&fit=max&fm=jpg&ixid=M3w3Nzg4Nzd8MHwxfHNlYXJjaHwxfHxjaG9jb2xhdGUlMjBjYWtlfGVufDF8fHx8MTc2MzcxMjQxOXww&ixlib=rb-4.1.0&q=80&w=1080",
+]
+
+GENERATOR_CATEGORIES = ["Завтрак", "Обед", "Ужин", "Десерт", "Закуски", "Супы", "Выпечка", "Напитки"]
+GENERATOR_DISHES = [
+    "Салат", "Суп", "Рагу", "Запеканка", "Паста", "Омлет", "Пирог", "Каша", "Плов", "Рис",
+    "Жаркое", "Котлеты", "Блины", "Оладьи", "Смузи", "Гратен", "Ризотто", "Боул", "Тушеные овощи", "Кекс",
+]
+GENERATOR_INGREDIENTS = [
+    "Соль", "Сахар", "Мука", "Яйца", "Молоко", "Сливочное масло", "Оливковое масло", "Лук репчатый",
+    "Чеснок", "Морковь", "Черный перец", "Помидор", "Картофель", "Куриное филе", "Сметана", "Сыр",
+    "Рис", "Говяжий фарш", "Зелень", "Лимон", "Сливки", "Болгарский перец", "Огурец", "Макароны",
+    "Томатная паста", "Растительное масло", "Разрыхлитель", "Ванильный сахар", "Кефир", "Творог",
+    "Грибы", "Капуста", "Свекла", "Гречка", "Овсяные хлопья", "Мед", "Горчица", "Майонез",
+    "Филе лосося", "Свинина", "Говядина", "Индейка", "Креветки", "Фасоль", "Нут", "Чечевица",
+    "Кабачок", "Баклажан", "Тыква", "Шпинат", "Брокколи", "Авокадо", "Яблоко", "Банан",
+    "Ягоды", "Орехи", "Изюм", "Какао-порошок", "Шоколад", "Корица", "Паприка", "Базилик",
+    "Укроп", "Петрушка", "Имбирь", "Соевый соус", "Пармезан", "Моцарелла", "Йогурт", "Бульон",
+]
+GENERATOR_VARIANTS = ["свежий", "замороженный", "домашний", "фермерский", "копченый", "молодой", "отборный", "органический"]
+GENERATOR_UNITS = [("г", 10, 500), ("мл", 10, 500), ("шт", 1, 6), ("ст.л.", 1, 4), ("ч.л.", 1, 3)]
+GENERATOR_STEP_TEMPLATES = [
+    "Подготовьте {a} и {b}: промойте и нарежьте.",
+    "Разогрейте сковороду и обжарьте {a} 5-7 минут.",
+    "Добавьте {b} и тушите на медленном огне 10 минут.",
+    "Смешайте {a} с {b} в большой миске.",
+    "Выпекайте при 180°C 25-30 минут до золотистой корочки.",
+    "Посолите, поперчите по вкусу и перемешайте.",
+    "Доведите до кипения и варите 15 минут.",
+    "Подавайте горячим, украсив зеленью.",
+]
+GENERATOR_AUTHORS = ["Анна", "Михаил", "Елена", "Дмитрий", "Ольга", "Сергей", "Мария", "Алексей", "Ирина", "Павел"]
+GENERATOR_COMMENTS = [
+    "Отличный рецепт, готовлю регулярно!",
+    "Получилось вкусно, но я добавил больше специй.",
+    "Простой и быстрый вариант на каждый день.",
+    "Семье понравилось, будем готовить еще.",
+    "Немного пересолено, в следующий раз положу меньше соли.",
+    "Не мое, но приготовить было легко.",
+    "Очень нежно получилось, спасибо за рецепт!",
+]
+GENERATOR_MONTHS = ["янв", "фев", "мар", "апр", "мая", "июн", "июл", "авг", "сен", "окт", "ноя", "дек"]
+# Фиксированная точка отсчета дат: одинаковый --seed дает одинаковые данные
+GENERATOR_EPOCH = datetime(2024, 1, 1)
+ZIPF_EXPONENT = 1.1
+
+
+def ingredient_vocabulary() -> list:
+    """Словарь названий ингредиентов в порядке убывания частоты"""
+    names = list(GENERATOR_INGREDIENTS)
+    for variant in GENERATOR_VARIANTS:
+        names.extend(f"{name} {variant}" for name in GENERATOR_INGREDIENTS)
+    return names
+
+
+def zipf_cum_weights(count: int, exponent: float = ZIPF_EXPONENT) -> list:
+    """Накопленные веса распределения Ципфа для random.choices"""
+    cum_weights, total = [], 0.0
+    for rank in range(1, count + 1):
+        total += 1.0 / rank ** exponent
+        cum_weights.append(total)
+    return cum_weights
+
+
+def parse_range(value: str) -> tuple:
+    """"0-500" -> (0, 500), "20" -> (20, 20)"""
+    low, _, high = value.partition("-")
+    low, high = int(low), int(high or low)
+    if low < 0 or high < low:
+        raise argparse.ArgumentTypeError(f"invalid range: {value!r}")
+    return low, high
+
+
+class SyntheticCatalog:
+    """Детерминированный генератор рецептов, отзывов и меню планов"""
+
+    def __init__(self, seed: int, reviews_per_recipe: tuple):
+        self.rng = random.Random(seed)
+        self.reviews_per_recipe = reviews_per_recipe
+        self.ingredients = ingredient_vocabulary()
+        self.ingredient_weights = zipf_cum_weights(len(self.ingredients))
+        self.images = list(SEED_IMAGES)
+
+    def pick_ingredients(self, count: int) -> list:
+        """count разных ингредиентов по Ципфу"""
+        picked = dict.fromkeys(self.rng.choices(self.ingredients, cum_weights=self.ingredient_weights, k=count * 2))
+        return list(picked)[:count]
+
+    def recipe(self, number: int) -> RecipeCreate:
+        rng = self.rng
+        names = self.pick_ingredients(rng.randint(4, 14))
+        ingredients = []
+        for name in names:
+            unit, low, high = rng.choice(GENERATOR_UNITS)
+            ingredients.append(IngredientCreate.model_construct(name=name, amount=str(rng.randint(low, high)), unit=unit))
+        steps = [
+            StepCreate.model_construct(
+                number=i + 1,
+                instruction=rng.choice(GENERATOR_STEP_TEMPLATES).format(a=rng.choice(names).lower(), b=rng.choice(names).lower()),
+                image=None,
+            )
+            for i in range(rng.randint(3, 10))
+        ]
+        main, second = names[0].lower(), names[-1].lower()
+        return RecipeCreate.model_construct(
+            title=f"{rng.choice(GENERATOR_DISHES)}: {main} и {second} №{number}",
+            category=rng.choice(GENERATOR_CATEGORIES),
+            cook_time=rng.choice([10, 15, 20, 30, 40, 45, 60, 90, 120]),
+            servings=rng.randint(1, 8),
+            image=rng.choice(self.images),
+            calories_per_serving=rng.randint(80, 900),
+            ingredients=ingredients,
+            steps=steps,
+        )
+
+    def reviews(self, recipe_id: int) -> list:
+        """Строки для COPY reviews (recipe_id, author, rating, comment, date, created_at)"""
+        rng = self.rng
+        rows = []
+        # Оценки смещены к высоким, как в реальных отзывах
+        bias = rng.random()
+        for _ in range(rng.randint(*self.reviews_per_recipe)):
+            created_at = GENERATOR_EPOCH + timedelta(minutes=rng.randint(0, 60 * 24 * 730))
+            rating = 5 if rng.random() < bias else rng.randint(1, 5)
+            rows.append((
+                recipe_id,
+                rng.choice(GENERATOR_AUTHORS),
+                rating,
+                rng.choice(GENERATOR_COMMENTS),
+                f"{created_at.day} {GENERATOR_MONTHS[created_at.month - 1]} {created_at.year}",
+                created_at,
+            ))
+        return rows
+
+    def menu_plan(self, plan_date, recipe_ids: list) -> dict:
+        rng = self.rng
+        plan = {"date": plan_date, "user_id": None}
+        for slot in ("breakfast", "lunch", "dinner", "extra"):
+            # Слот extra заполнен реже остальных
+            filled = rng.random() < (0.3 if slot == "extra" else 0.9)
+            plan[f"{slot}_recipe_id"] = rng.choice(recipe_ids) if filled else None
+        return plan
+
+
+REVIEW_COLUMNS = ["recipe_id", "author", "rating", "comment", "date", "created_at"]
+
+# Агрегаты рейтинга пачки рецептов одним UPDATE
+SET_RATINGS_SQL = """
+UPDATE recipes AS r
+SET rating_sum = v.rating_sum,
+    rating_count = v.rating_count,
+    rating = v.rating_sum::float / NULLIF(v.rating_count, 0)
+FROM unnest(CAST(:ids AS integer[]), CAST(:sums AS integer[]), CAST(:counts AS integer[]))
+    AS v(id, rating_sum, rating_count)
+WHERE r.id = v.id
+"""
+
+
+async def generate_database(
+    recipes: int,
+    reviews_per_recipe: tuple = (0, 20),
+    menu_days: int = 365,
+    seed: int = 42,
+    batch_size: int = 1000,
+    menu_start: date = date(2025, 1, 1)
+):
+    """Сгенерировать и загрузить синтетический каталог"""
+    from sqlalchemy import text
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from database import AsyncSessionLocal
+    from ingest import write_batch
+    from menu_summary import refresh_menu_summaries
+
+    init_db()
+    catalog = SyntheticCatalog(seed, reviews_per_recipe)
+    recipe_ids, review_count = [], 0
+    started = time.perf_counter()
+
+    async with AsyncSessionLocal() as db:
+        for offset in range(0, recipes, batch_size):
+            batch = [catalog.recipe(number) for number in range(offset + 1, min(offset + batch_size, recipes) + 1)]
+            ids = await write_batch(db, batch)
+            recipe_ids.extend(ids)
+
+            review_rows, sums, counts = [], [], []
+            for recipe_id in ids:
+                rows = catalog.reviews(recipe_id)
+                review_rows.extend(rows)
+                sums.append(sum(row[2] for row in rows))
+                counts.append(len(rows))
+            if review_rows:
+                # commit возвращает соединение в пул, поэтому берется заново для каждой пачки
+                connection = await db.connection()
+                raw_connection = (await connection.get_raw_connection()).driver_connection
+                await raw_connection.copy_records_to_table("reviews", records=review_rows, columns=REVIEW_COLUMNS)
+                await db.execute(text(SET_RATINGS_SQL), {"ids": ids, "sums": sums, "counts": counts})
+            review_count += len(review_rows)
+
+            await db.commit()
+            print(f"  рецептов: {len(recipe_ids)}, отзывов: {review_count}, {time.perf_counter() - started:.1f} с")
+
+        if menu_days and recipe_ids:
+            plans = [catalog.menu_plan(menu_start + timedelta(days=day), recipe_ids) for day in range(menu_days)]
+            for offset in range(0, len(plans), batch_size):
+                stmt = pg_insert(MenuPlan).values(plans[offset:offset + batch_size])
+                await db.execute(stmt.on_conflict_do_nothing(index_elements=[MenuPlan.date]))
+            await refresh_menu_summaries(db, plans[0]["date"], plans[-1]["date"])
+            await db.commit()
+
+    print(
+        f"Сгенерировано рецептов: {recipes}, отзывов: {review_count}, "
+        f"дней меню: {menu_days} за {time.perf_counter() - started:.1f} с"
+    )
+
+
 if __name__ == "__main__":
-    seed_database()
+    parser = argparse.ArgumentParser(
+        description="Заполнение БД: без параметров - тестовые рецепты, с --recipes - синтетический каталог"
+    )
+    parser.add_argument("--recipes", type=int, help="сколько рецептов сгенерировать")
+    parser.add_argument("--reviews-per-recipe", type=parse_range, default=(0, 20), help="диапазон отзывов на рецепт, например 0-500")
+    parser.add_argument("--menu-days", type=int, default=365, help="на сколько дней сгенерировать меню планы")
+    parser.add_argument("--menu-start", type=date.fromisoformat, default=date(2025, 1, 1), help="первая дата меню (YYYY-MM-DD)")
+    parser.add_argument("--seed", type=int, default=42, help="seed генератора, одинаковый seed - одинаковые данные")
+    parser.add_argument("--batch-size", type=int, default=1000, help="рецептов в одной транзакции")
+    args = parser.parse_args()
+
+    if args.recipes is None:
+        seed_database()
+    else:
+        try:
+            asyncio.run(generate_database(
+                args.recipes,
+                reviews_per_recipe=args.reviews_per_recipe,
+                menu_days=args.menu_days,
+                seed=args.seed,
+                batch_size=args.batch_size,
+                menu_start=args.menu_start,
+            ))
+        except Exception as e:
+            print(f"Ошибка при генерации данных: {e}", file=sys.stderr)
+            sys.exit(1)
 
@@ -0,0 +1,41 @@
+"""
+Быстрая отдача JSON
+
+Если обработчик возвращает модель или список моделей, FastAPI проверяет
+их по response_model еще раз (model_dump -> валидация -> сериализация ->
+json.dumps). Для больших списков это дороже запроса к БД. Горячие
+обработчики собирают словари прямо из строк запроса (с теми же полями и
+в том же порядке, что и схема ответа) и возвращают готовый Response:
+response_model остается в декораторе только для OpenAPI.
+
+Кодировщик - orjson, без него - pydantic_core.to_json. Модели внутри
+данных допускаются и сериализуются через model_dump.
+"""
+from typing import Any, Dict, Optional
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:  # orjson не установлен - сериализует pydantic_core
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(data: Any) -> bytes:
+    """JSON в bytes (UTF-8, без пробелов), даты - в ISO 8601"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return to_json(data)
+
+
+def json_response(data: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """JSON-ответ без повторной проверки по response_model"""
+    return Response(content=dumps(data), status_code=status_code, media_type="application/json", headers=headers)
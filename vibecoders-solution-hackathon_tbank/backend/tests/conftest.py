@@ -0,0 +1,12 @@
+"""
+Юнит-тесты без PostgreSQL: чистая логика модулей backend.
+
+Запуск из каталога backend:
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,134 @@
+import pytest
+
+import cache
+from cache import RECIPE_LIST_TAG, ResponseCache, handle_invalidation, recipe_tag
+
+
+class Clock:
+    """Подменяет time.monotonic в cache, чтобы проверять TTL без ожидания"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def make_cache(**overrides) -> ResponseCache:
+    options = {"max_entries": 3, "max_bytes": 1000, "ttl": 60}
+    options.update(overrides)
+    return ResponseCache(**options)
+
+
+def test_lru_evicts_least_recently_used():
+    response_cache = make_cache()
+    for key in ("a", "b", "c"):
+        response_cache.set(key, b"x", [])
+    # Обращение к "a" делает самой старой запись "b"
+    assert response_cache.get("a") is not None
+    response_cache.set("d", b"x", [])
+
+    assert response_cache.get("b") is None
+    assert all(response_cache.get(key) is not None for key in ("a", "c", "d"))
+    assert response_cache.evictions == 1
+
+
+def test_ttl_expires_entries(clock):
+    response_cache = make_cache(ttl=10)
+    response_cache.set("a", b"x", ["tag"])
+    clock.now += 9.9
+    assert response_cache.get("a") is not None
+
+    clock.now += 0.1
+    assert response_cache.get("a") is None
+    stats = response_cache.stats()
+    assert stats["entries"] == 0 and stats["bytes"] == 0
+    assert response_cache._tags == {}
+
+
+def test_byte_budget_evicts_oldest():
+    response_cache = make_cache(max_entries=100, max_bytes=10)
+    response_cache.set("a", b"1234", [])
+    response_cache.set("b", b"1234", [])
+    response_cache.set("c", b"1234", [])
+
+    assert response_cache.get("a") is None
+    assert response_cache.stats()["bytes"] == 8
+
+
+def test_body_larger_than_budget_is_not_stored():
+    response_cache = make_cache(max_bytes=4)
+    entry = response_cache.set("a", b"12345", [])
+
+    assert entry.etag
+    assert response_cache.get("a") is None
+    assert response_cache.stats()["bytes"] == 0
+
+
+def test_replacing_key_keeps_byte_count():
+    response_cache = make_cache()
+    response_cache.set("a", b"1234", ["old"])
+    response_cache.set("a", b"12", ["new"])
+
+    assert response_cache.stats()["bytes"] == 2
+    assert response_cache.invalidate("old") == 0
+    assert response_cache.invalidate("new") == 1
+
+
+def test_invalidate_removes_tagged_entries():
+    response_cache = make_cache()
+    response_cache.set("list", b"x", [RECIPE_LIST_TAG])
+    response_cache.set("one", b"x", [recipe_tag(1)])
+    response_cache.set("two", b"x", [recipe_tag(2)])
+
+    assert response_cache.invalidate(recipe_tag(1), RECIPE_LIST_TAG) == 2
+    assert response_cache.get("list") is None
+    assert response_cache.get("one") is None
+    assert response_cache.get("two") is not None
+
+
+def test_response_built_during_invalidation_is_not_stored():
+    response_cache = make_cache()
+    generation = response_cache.generation
+    response_cache.invalidate(RECIPE_LIST_TAG)
+    response_cache.set("list", b"x", [RECIPE_LIST_TAG], generation=generation)
+
+    assert response_cache.get("list") is None
+
+
+def test_clear_discards_responses_in_flight():
+    response_cache = make_cache()
+    generation = response_cache.generation
+    response_cache.clear()
+    response_cache.set("list", b"x", [RECIPE_LIST_TAG], generation=generation)
+
+    assert response_cache.get("list") is None
+
+
+def test_disabled_cache_only_computes_etag():
+    response_cache = make_cache(enabled=False)
+    entry = response_cache.set("a", b"x", [])
+
+    assert entry.etag == cache.make_etag(b"x")
+    assert response_cache.get("a") is None
+
+
+def test_notification_invalidates_all_tags(monkeypatch):
+    response_cache = make_cache()
+    monkeypatch.setattr(cache, "response_cache", response_cache)
+    response_cache.set("list", b"x", [RECIPE_LIST_TAG])
+    response_cache.set("one", b"x", [recipe_tag(1)])
+    response_cache.set("two", b"x", [recipe_tag(2)])
+
+    handle_invalidation(None, 0, cache.INVALIDATION_CHANNEL, f"{recipe_tag(1)} {RECIPE_LIST_TAG}")
+
+    assert response_cache.get("list") is None
+    assert response_cache.get("one") is None
+    assert response_cache.get("two") is not None
@@ -0,0 +1,148 @@
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+
+import ingest
+import main
+from database import get_async_db
+
+BROKEN_TITLE = "Сломает COPY"
+
+
+def recipe(title: str) -> dict:
+    return {
+        "title": title,
+        "category": "Обеды",
+        "cook_time": 30,
+        "servings": 2,
+        "ingredients": [{"name": "Мука", "amount": "200", "unit": "г"}],
+        "steps": [{"number": 1, "instruction": "Смешать"}],
+    }
+
+
+class FakeSession:
+    """AsyncSession без PostgreSQL: пишет рецепты в список, savepoint откатывает пачку"""
+
+    def __init__(self):
+        self.written = []
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        saved = list(self.written)
+        try:
+            yield
+        except Exception:
+            self.written = saved
+            raise
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+async def fake_write_batch(db: FakeSession, recipes):
+    # Как COPY: запись пачки падает целиком, если в ней есть плохая строка
+    for item in recipes:
+        db.written.append(item.title)
+        if item.title == BROKEN_TITLE:
+            raise RuntimeError("value violates constraint")
+    return list(range(len(recipes)))
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession()
+
+    async def override():
+        yield session
+
+    monkeypatch.setattr(ingest, "write_batch", fake_write_batch)
+    main.app.dependency_overrides[get_async_db] = override
+    yield session
+    main.app.dependency_overrides.pop(get_async_db)
+
+
+@pytest.fixture
+def client():
+    # Без with: startup (прогрев пула, LISTEN) не запускается
+    return TestClient(main.app)
+
+
+def post_json(client, body: bytes):
+    return client.post("/api/recipes/import", content=body, headers={"Content-Type": "application/json"})
+
+
+def post_ndjson(client, lines):
+    return client.post(
+        "/api/recipes/import", content="\n".join(lines).encode(), headers={"Content-Type": "application/x-ndjson"}
+    )
+
+
+def assert_invalidated(session: FakeSession):
+    # Список сбрасывается и после ошибки: откат незакоммиченного и NOTIFY с коммитом
+    assert session.rollbacks == 1
+    assert len(session.statements) == 1
+    assert session.commits >= 1
+
+
+def test_malformed_json_array_returns_400(session, client):
+    body = json.dumps([recipe("Борщ")]).encode()[:-5]
+    response = post_json(client, body)
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid JSON")
+    assert session.written == []
+    assert_invalidated(session)
+
+
+def test_json_object_instead_of_array_returns_400(session, client):
+    response = post_json(client, json.dumps(recipe("Борщ")).encode())
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Expected a JSON array of recipes"
+    assert_invalidated(session)
+
+
+def test_json_array_reports_bad_records(session, client):
+    body = json.dumps([recipe("Борщ"), {"title": "Без полей"}, recipe("Щи")]).encode()
+    response = post_json(client, body)
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["imported"], result["failed"]) == (2, 1)
+    assert result["errors"][0]["record"] == 2
+    assert session.written == ["Борщ", "Щи"]
+
+
+def test_ndjson_bad_line_mid_stream_does_not_stop_import(session, client):
+    response = post_ndjson(client, [json.dumps(recipe("Борщ")), "{not json", "", json.dumps(recipe("Щи"))])
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["imported"], result["failed"]) == (2, 1)
+    assert result["errors"][0]["record"] == 2
+    assert session.written == ["Борщ", "Щи"]
+    assert_invalidated(session)
+
+
+def test_database_error_retries_batch_record_by_record(session, client):
+    lines = [json.dumps(recipe(title)) for title in ("Борщ", BROKEN_TITLE, "Щи")]
+    response = post_ndjson(client, lines)
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["imported"], result["failed"]) == (2, 1)
+    assert result["errors"][0]["record"] == 2
+    assert result["errors"][0]["error"].startswith("database:")
+    # Откаченная пачка не оставила строк, повтор по одной записал только хорошие
+    assert session.written == ["Борщ", "Щи"]
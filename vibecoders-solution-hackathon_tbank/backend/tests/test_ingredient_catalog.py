@@ -0,0 +1,57 @@
+import pytest
+
+from ingredient_catalog import normalize_name, parse_amount, parse_quantity, unit_key
+
+
+@pytest.mark.parametrize("amount, expected", [
+    ("2", 2),
+    ("0.5", 0.5),
+    ("0,5", 0.5),
+    (" 1.5 ", 1.5),
+    ("1/2", 0.5),
+    ("1 1/2", 1.5),
+    ("½", 0.5),
+    ("1½", 1.5),
+    ("1 ¾", 1.75),
+    ("2-3", 2.5),
+    ("2 – 3", 2.5),
+    ("3/4-1", 0.875),
+])
+def test_parse_amount(amount, expected):
+    assert parse_amount(amount) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("amount", ["", "по вкусу", "щепотка", "1/0", "2-1/0", "1,2,3", "2 ст"])
+def test_parse_amount_not_numeric(amount):
+    assert parse_amount(amount) is None
+
+
+@pytest.mark.parametrize("amount, unit, expected", [
+    ("200", "г", (200, "g")),
+    ("0,5", "кг", (500, "g")),
+    ("1,5", "Килограмма", (1500, "g")),
+    ("250", "мл", (250, "ml")),
+    ("0.5", "л", (500, "ml")),
+    ("1 1/2", "ст. л.", (22.5, "ml")),
+    ("½", "ч.л.", (2.5, "ml")),
+    ("2", "стакана", (500, "ml")),
+    ("3", "Шт.", (3, "pcs")),
+    ("2-3", "штуки", (2.5, "pcs")),
+])
+def test_parse_quantity_base_units(amount, unit, expected):
+    quantity, base_unit = parse_quantity(amount, unit)
+    assert (quantity, base_unit) == (pytest.approx(expected[0]), expected[1])
+
+
+def test_parse_quantity_unknown_unit_keeps_amount():
+    assert parse_quantity("2", "зубчика") == (2, None)
+
+
+def test_parse_quantity_not_numeric():
+    assert parse_quantity("по вкусу", "г") == (None, None)
+
+
+def test_keys_ignore_case_yo_and_spaces():
+    assert normalize_name("  Яйцо   Куриное ") == normalize_name("яйцо куриное")
+    assert normalize_name("Свёкла") == normalize_name("свекла")
+    assert unit_key("Ст. л.") == unit_key("стл") == "стл"
@@ -0,0 +1,127 @@
+from datetime import date, timedelta
+
+import pytest
+
+from menu_generator import MenuGenerationError, SlotRule, build_arrays, generate_menu
+
+START = date(2025, 1, 1)
+
+
+def days(count: int):
+    return [START + timedelta(days=i) for i in range(count)]
+
+
+def catalog(rows):
+    """rows: {id: (категория, время, калории, рейтинг)}"""
+    return build_arrays(rows)
+
+
+def uses(menu, recipe_id):
+    return sorted(day for day, slots in menu.items() if recipe_id in slots.values())
+
+
+def test_no_repeats_within_window():
+    arrays = catalog({i: ("Обеды", 30, 500, 4.0) for i in range(1, 8)})
+    menu = generate_menu(arrays, days(14), {"lunch": SlotRule()}, {}, no_repeat_days=7, seed=1)
+
+    chosen = [menu[day]["lunch"] for day in days(14)]
+    for i in range(len(chosen)):
+        assert chosen[i] not in chosen[i + 1:i + 7]
+
+
+def test_prefers_higher_rating():
+    arrays = catalog({1: ("Обеды", 30, 500, 5.0), 2: ("Обеды", 30, 500, 1.0)})
+    menu = generate_menu(arrays, days(1), {"lunch": SlotRule()}, {}, seed=3)
+
+    assert menu[START] == {"lunch": 1}
+
+
+def test_calories_follow_remaining_daily_norm():
+    arrays = catalog({
+        1: ("Завтраки", 10, 300, 4.0),
+        2: ("Завтраки", 10, 1500, 4.0),
+        3: ("Обеды", 30, 700, 4.0),
+        4: ("Обеды", 30, 1500, 4.0),
+    })
+    slots = {"breakfast": SlotRule(category="Завтраки"), "lunch": SlotRule(category="Обеды")}
+    menu = generate_menu(arrays, days(1), slots, {}, daily_calories=1000, seed=5)
+
+    assert menu[START] == {"breakfast": 1, "lunch": 3}
+
+
+def test_slot_constraints_filter_candidates():
+    arrays = catalog({
+        1: ("Обеды", 90, 500, 5.0),
+        2: ("Завтраки", 10, 500, 5.0),
+        3: ("Обеды", 20, 500, 2.0),
+    })
+    menu = generate_menu(
+        arrays, days(1), {"lunch": SlotRule(category="Обеды", max_cook_time=30)}, {}, seed=1
+    )
+
+    assert menu[START] == {"lunch": 3}
+
+
+def test_no_candidates_raises():
+    arrays = catalog({1: ("Обеды", 30, 500, 4.0)})
+    with pytest.raises(MenuGenerationError):
+        generate_menu(arrays, days(1), {"lunch": SlotRule(category="Десерты")}, {})
+
+
+def test_plans_before_period_count_in_window():
+    arrays = catalog({1: ("Обеды", 30, 500, 5.0), 2: ("Обеды", 30, 500, 1.0)})
+    existing = {START - timedelta(days=2): {"lunch": 1}}
+    menu = generate_menu(arrays, days(1), {"lunch": SlotRule()}, existing, no_repeat_days=7, seed=1)
+
+    assert menu[START] == {"lunch": 2}
+
+
+def test_kept_slot_later_in_period_blocks_earlier_days():
+    # Рецепт 1 лучший, но сохранен на последний день: раньше в окне его брать нельзя
+    arrays = catalog({i: ("Обеды", 30, 500, 5.0 if i == 1 else 1.0) for i in range(1, 6)})
+    period = days(5)
+    existing = {period[-1]: {"lunch": 1}}
+    menu = generate_menu(
+        arrays, period, {"lunch": SlotRule()}, existing, no_repeat_days=5, keep_existing=True, seed=1
+    )
+
+    assert menu[period[-1]] == {}
+    assert uses(menu, 1) == []
+
+
+def test_plans_after_period_count_in_window():
+    arrays = catalog({1: ("Обеды", 30, 500, 5.0), 2: ("Обеды", 30, 500, 1.0)})
+    existing = {START + timedelta(days=3): {"lunch": 1}}
+    menu = generate_menu(arrays, days(1), {"lunch": SlotRule()}, existing, no_repeat_days=7, seed=1)
+
+    assert menu[START] == {"lunch": 2}
+
+
+def test_replaced_slot_does_not_block():
+    # Без keep_existing слот в периоде перезаписывается и окно не ограничивает
+    arrays = catalog({1: ("Обеды", 30, 500, 5.0), 2: ("Обеды", 30, 500, 1.0)})
+    period = days(2)
+    existing = {period[1]: {"lunch": 2}}
+    menu = generate_menu(arrays, period, {"lunch": SlotRule()}, existing, no_repeat_days=7, seed=1)
+
+    assert menu[period[0]] == {"lunch": 1}
+
+
+def test_window_exhausted_picks_farthest_use():
+    arrays = catalog({1: ("Обеды", 30, 500, 5.0), 2: ("Обеды", 30, 500, 5.0)})
+    existing = {
+        START - timedelta(days=1): {"lunch": 1},
+        START - timedelta(days=3): {"lunch": 2},
+    }
+    menu = generate_menu(arrays, days(1), {"lunch": SlotRule()}, existing, no_repeat_days=7, seed=1)
+
+    assert menu[START] == {"lunch": 2}
+
+
+def test_seed_is_reproducible():
+    arrays = catalog({i: ("Обеды", 30, 400 + i * 10, 3.0 + i % 3) for i in range(1, 50)})
+    slots = {"breakfast": SlotRule(), "lunch": SlotRule(), "dinner": SlotRule()}
+    first = generate_menu(arrays, days(10), slots, {}, daily_calories=2000, seed=42)
+    second = generate_menu(arrays, days(10), slots, {}, daily_calories=2000, seed=42)
+
+    assert first == second
@@ -0,0 +1,109 @@
+import base64
+import json
+import random
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, Float, Integer, MetaData, Table, create_engine, insert, select
+
+from pagination import decode_cursor, encode_cursor, keyset_condition, order_clauses
+
+metadata = MetaData()
+items = Table(
+    "items", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("rating", Float, nullable=False),
+    Column("cook_time", Integer, nullable=False),
+)
+
+
+@pytest.fixture(scope="module")
+def connection():
+    # Row values (a, b) > (x, y) есть и в SQLite, PostgreSQL для проверки порядка не нужен
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    rng = random.Random(7)
+    rows = [
+        {"id": i, "rating": rng.choice([0.0, 3.5, 4.0, 4.5, 5.0]), "cook_time": rng.choice([10, 20, 30])}
+        for i in range(1, 201)
+    ]
+    with engine.connect() as connection:
+        connection.execute(insert(items), rows)
+        yield connection
+
+
+def raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def paginate(connection, columns, size):
+    """Все страницы сортировки columns через курсор последней строки"""
+    seen, key = [], None
+    while True:
+        query = select(items.c.id, *[column for column, _ in columns])
+        if key is not None:
+            query = query.where(keyset_condition(columns, key))
+        rows = connection.execute(query.order_by(*order_clauses(columns)).limit(size)).all()
+        if not rows:
+            return seen
+        seen.extend(row.id for row in rows)
+        key = list(rows[-1][1:])
+
+
+@pytest.mark.parametrize("columns", [
+    [(items.c.id, False)],
+    [(items.c.id, True)],
+    [(items.c.cook_time, False), (items.c.id, False)],
+    [(items.c.rating, True), (items.c.id, True)],
+    [(items.c.rating, True), (items.c.id, False)],
+    [(items.c.cook_time, False), (items.c.rating, True), (items.c.id, False)],
+], ids=["id", "id_desc", "same_direction", "same_direction_desc", "mixed", "mixed_three"])
+@pytest.mark.parametrize("size", [1, 7, 50])
+def test_keyset_pages_match_full_order(connection, columns, size):
+    expected = [row.id for row in connection.execute(select(items.c.id).order_by(*order_clauses(columns)))]
+    assert paginate(connection, columns, size) == expected
+
+
+def test_keyset_same_direction_is_row_comparison():
+    condition = keyset_condition([(items.c.cook_time, False), (items.c.id, False)], [10, 5])
+    assert str(condition.compile(compile_kwargs={"literal_binds": True})) == "(items.cook_time, items.id) > (10, 5)"
+
+
+def test_keyset_mixed_direction_has_leading_bound():
+    condition = keyset_condition([(items.c.rating, True), (items.c.id, False)], [4.5, 5])
+    sql = str(condition.compile(compile_kwargs={"literal_binds": True}))
+    assert sql.startswith("items.rating <= 4.5 AND (")
+
+
+def test_keyset_key_length_mismatch():
+    with pytest.raises(HTTPException) as error:
+        keyset_condition([(items.c.rating, True), (items.c.id, False)], [4.5])
+    assert error.value.status_code == 400
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("rating", [4.5, 17])
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "rating") == [4.5, 17]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    raw_cursor(["rating", [1]]),
+    raw_cursor({"o": "rating"}),
+    raw_cursor({"o": "rating", "k": 5}),
+    raw_cursor({"o": "rating", "k": ["4.5", 1]}),
+    raw_cursor({"o": "rating", "k": [True, 1]}),
+    raw_cursor({"o": "rating", "k": [None, 1]}),
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+])
+def test_cursor_tampering_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, "rating")
+    assert error.value.status_code == 400
+
+
+def test_cursor_of_other_ordering_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(encode_cursor("cook_time", [10, 1]), "rating")
+    assert error.value.status_code == 400
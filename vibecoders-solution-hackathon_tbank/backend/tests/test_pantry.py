@@ -0,0 +1,151 @@
+from collections import namedtuple
+import random
+
+import pytest
+
+from ingredient_catalog import normalize_name
+from pantry import DENSE_FRACTION, PantryIndex, iter_slots, slots_to_mask
+
+Row = namedtuple("Row", "id category cook_time ingredient_ids names")
+
+CATEGORIES = ["Завтраки", "Обеды", "Ужины"]
+COOK_TIMES = [10, 20, 30, 60]
+# Справочник: id -> название; частые продукты попадают в маски, редкие - в множества
+CATALOG = {i: f"Продукт {i}" for i in range(1, 61)}
+ALIASES = {normalize_name(name): ingredient_id for ingredient_id, name in CATALOG.items()}
+
+
+def random_row(rng: random.Random, recipe_id: int) -> Row:
+    # Первые продукты встречаются чаще (как у реальных рецептов)
+    ids = sorted({min(int(rng.expovariate(0.1)) + 1, len(CATALOG)) for _ in range(rng.randint(1, 8))})
+    return Row(recipe_id, rng.choice(CATEGORIES), rng.choice(COOK_TIMES), ids, [CATALOG[i] for i in ids])
+
+
+def expected(rows, owned_ids, category=None, max_cook_time=None, limit=20):
+    """Подбор перебором рецептов: (id, совпало, всего) в порядке выдачи"""
+    found = []
+    for row in rows.values():
+        terms = set(row.ingredient_ids)
+        matched = len(terms & owned_ids)
+        if not matched:
+            continue
+        if category is not None and row.category != category:
+            continue
+        if max_cook_time is not None and row.cook_time > max_cook_time:
+            continue
+        found.append((row.id, matched, len(terms)))
+    found.sort(key=lambda item: (-item[1] / item[2], item[2] - item[1], item[0]))
+    return found[:limit]
+
+
+def actual(index, owned_ids, **filters):
+    names = [CATALOG[i] for i in owned_ids]
+    return [(m.recipe_id, m.matched, m.total) for m in index.match(names, **filters)]
+
+
+def built_index(rows) -> PantryIndex:
+    index = PantryIndex()
+    index._aliases = dict(ALIASES)
+    index._build(list(rows.values()), CATALOG)
+    return index
+
+
+def put(index: PantryIndex, row: Row):
+    index._put(row.id, row.category, row.cook_time, row.ingredient_ids, row.names, CATALOG)
+
+
+QUERIES = [
+    ({1}, {}),
+    ({1, 2, 3}, {}),
+    ({2, 5, 9, 40}, {"category": "Обеды"}),
+    ({1, 3, 7, 11, 12}, {"max_cook_time": 20}),
+    (set(range(1, 20)), {"category": "Ужины", "max_cook_time": 30, "limit": 50}),
+    ({55, 58, 59}, {}),
+]
+
+
+@pytest.fixture(scope="module")
+def rows():
+    rng = random.Random(11)
+    return {recipe_id: random_row(rng, recipe_id) for recipe_id in range(1, 401)}
+
+
+def test_slots_mask_roundtrip():
+    slots = {0, 3, 8, 63, 64, 200}
+    mask = slots_to_mask(slots)
+    assert list(iter_slots(mask)) == sorted(slots)
+    assert slots_to_mask(set()) == 0
+
+
+def test_build_uses_masks_and_sets(rows):
+    index = built_index(rows)
+    stats = index.stats()
+    assert stats["dense_postings"] and stats["sparse_postings"]
+    threshold = len(rows) // DENSE_FRACTION
+    for posting in index._postings:
+        if isinstance(posting, set):
+            assert len(posting) <= threshold
+
+
+@pytest.mark.parametrize("owned, filters", QUERIES)
+def test_bit_sliced_count_matches_brute_force(rows, owned, filters):
+    assert actual(built_index(rows), owned, **filters) == expected(rows, owned, **filters)
+
+
+@pytest.mark.parametrize("owned, filters", QUERIES)
+def test_incremental_put_matches_full_build(rows, owned, filters):
+    rng = random.Random(5)
+    current = {recipe_id: row for recipe_id, row in rows.items() if recipe_id <= 300}
+    index = built_index(current)
+
+    # Новые рецепты и замена существующих: продукты, категория, время
+    for recipe_id in range(301, 401):
+        current[recipe_id] = rows[recipe_id]
+        put(index, rows[recipe_id])
+    for recipe_id in rng.sample(sorted(current), 80):
+        current[recipe_id] = random_row(rng, recipe_id)
+        put(index, current[recipe_id])
+
+    assert actual(index, owned, **filters) == expected(current, owned, **filters)
+    assert actual(index, owned, **filters) == actual(built_index(current), owned, **filters)
+
+
+def test_put_only_index_matches_build(rows):
+    index = PantryIndex()
+    index._aliases = dict(ALIASES)
+    for row in rows.values():
+        put(index, row)
+
+    for owned, filters in QUERIES:
+        assert actual(index, owned, **filters) == expected(rows, owned, **filters)
+
+
+def test_missing_names_and_aliases():
+    index = PantryIndex()
+    index._aliases = {"яйцо": 1, "яйца": 1, "мука": 2, "молоко": 3}
+    names = {1: "Яйцо", 2: "Мука", 3: "Молоко"}
+    index._build([
+        Row(1, "Завтраки", 20, [1, 2, 3], ["Яйца", "Мука", "Молоко"]),
+        # Строка без ingredient_id учитывается по ключу названия
+        Row(2, "Завтраки", 10, [1, None], ["Яйцо", "Соль"]),
+    ], names)
+
+    matches = index.match(["  ЯЙЦА ", "соль"])
+    assert [(m.recipe_id, m.matched, m.total, m.missing) for m in matches] == [
+        (2, 2, 2, []),
+        (1, 1, 3, ["Мука", "Молоко"]),
+    ]
+    assert index.match(["хлеб"]) == []
+
+
+def test_put_moves_recipe_between_filters():
+    index = PantryIndex()
+    index._aliases = {"мука": 1}
+    put_row = Row(1, "Завтраки", 10, [1], ["Мука"])
+    index._build([put_row], {1: "Мука"})
+    assert [m.recipe_id for m in index.match(["мука"], category="Завтраки")] == [1]
+
+    index._put(1, "Ужины", 90, [1], ["Мука"], {1: "Мука"})
+    assert index.match(["мука"], category="Завтраки") == []
+    assert index.match(["мука"], max_cook_time=30) == []
+    assert [m.recipe_id for m in index.match(["мука"], category="Ужины")] == [1]
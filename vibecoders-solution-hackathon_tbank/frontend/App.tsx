@@ -73,6 +73,8 @@ export default function App() {
   const [recipes, setRecipes] = useState<Recipe[]>([]);
   const [userIngredients, setUserIngredients] = useState<Map<string, { quantity: number; price: number }>>(new Map());
   const [menuPlan, setMenuPlan] = useState<Record<string, MealPlan>>({});
+  const [menuPlanVersion, setMenuPlanVersion] = useState(0);
+  const [recipeDetails, setRecipeDetails] = useState<Record<string, Recipe>>({});
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
@@ -120,13 +122,45 @@ export default function App() {
       });
       
       setMenuPlan(adaptedMenuPlans);
+      loadRecipeDetails(adaptedMenuPlans);
     } catch (err) {
       console.error('Error loading menu plans:', err);
       // Не показываем ошибку пользователю, просто используем пустые планы
     }
   };
 
+  // Полные рецепты меню (с ингредиентами) загружаются одним запросом
+  const loadRecipeDetails = async (plans: Record<string, MealPlan>) => {
+    const recipeIds = new Set<number>();
+    Object.values(plans).forEach(plan => {
+      [plan.breakfast, plan.lunch, plan.dinner, plan.extra, ...(plan.additional || [])]
+        .forEach(recipe => {
+          if (recipe && !recipeDetails[recipe.id]) {
+            recipeIds.add(Number(recipe.id));
+          }
+        });
+    });
+    if (recipeIds.size === 0) return;
+
+    try {
+      const apiRecipes = await api.getRecipesBatch(Array.from(recipeIds));
+      setRecipeDetails(prev => {
+        const next = { ...prev };
+        apiRecipes.forEach(apiRecipe => {
+          next[String(apiRecipe.id)] = adaptApiRecipeToFrontend(apiRecipe);
+        });
+        return next;
+      });
+    } catch (err) {
+      console.error('Error loading recipe details:', err);
+    }
+  };
+
   const handleRecipeClick = async (recipe: Recipe) => {
+    // Рецепт из меню уже загружен пачкой: показываем сразу, пока идет запрос
+    if (recipeDetails[recipe.id]) {
+      setSelectedRecipe(recipeDetails[recipe.id]);
+    }
     try {
       // Загружаем полные детали рецепта
       const fullRecipe = await api.getRecipe(Number(recipe.id));
@@ -134,25 +168,28 @@ export default function App() {
       setSelectedRecipe(adaptedRecipe);
     } catch (err) {
       console.error('Error loading recipe details:', err);
-      // Если не удалось загрузить детали, используем базовую информацию
-      setSelectedRecipe(recipe);
+      // Если не удалось загрузить детали, используем уже известную информацию
+      setSelectedRecipe(recipeDetails[recipe.id] || recipe);
     }
   };
 
   const handleMenuPlanChange = async (newMenuPlan: Record<string, MealPlan>) => {
     setMenuPlan(newMenuPlan);
+    loadRecipeDetails(newMenuPlan);
     
-    // Сохраняем изменения в API
+    // Сохраняем изменения в API одним запросом
     try {
-      for (const [date, plan] of Object.entries(newMenuPlan)) {
-        await api.saveMenuPlan({
+      await api.saveMenuPlansBulk(
+        Object.entries(newMenuPlan).map(([date, plan]) => ({
           date,
           breakfast_recipe_id: plan.breakfast?.id ? Number(plan.breakfast.id) : undefined,
           lunch_recipe_id: plan.lunch?.id ? Number(plan.lunch.id) : undefined,
           dinner_recipe_id: plan.dinner?.id ? Number(plan.dinner.id) : undefined,
           extra_recipe_id: plan.extra?.id ? Number(plan.extra.id) : undefined,
-        });
-      }
+        }))
+      );
+      // Серверные данные (список покупок) перезапрашиваются после сохранения
+      setMenuPlanVersion(version => version + 1);
     } catch (err) {
       console.error('Error saving menu plan:', err);
       // Не показываем ошибку пользователю, изменения уже применены локально
@@ -314,6 +351,7 @@ export default function App() {
         ) : activeTab === 'shopping' ? (
           <ShoppingListTab
             menuPlan={menuPlan}
+            menuPlanVersion={menuPlanVersion}
             recipes={recipes}
             userIngredients={userIngredients}
           />
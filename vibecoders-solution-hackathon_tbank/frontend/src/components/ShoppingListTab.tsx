@@ -1,12 +1,15 @@
-import React, { useMemo } from 'react';
+import React, { useEffect, useMemo, useState } from 'react';
 import { View, Text, ScrollView, StyleSheet } from 'react-native';
 import { Ionicons } from '@expo/vector-icons';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from './ui/Tabs';
 import { colors } from '../constants/colors';
 import { Recipe, MealPlan } from '../types';
+import * as api from '../services/api';
 
 interface ShoppingListTabProps {
   menuPlan: Record<string, MealPlan>;
+  // Растет после каждого сохранения меню на сервере
+  menuPlanVersion: number;
   recipes: Recipe[];
   userIngredients: Map<string, { quantity: number; price: number }>;
 }
@@ -20,7 +23,7 @@ interface ShoppingItem {
   recipes: string[];
 }
 
-export function ShoppingListTab({ menuPlan, recipes, userIngredients }: ShoppingListTabProps) {
+export function ShoppingListTab({ menuPlan, menuPlanVersion, recipes, userIngredients }: ShoppingListTabProps) {
   const today = new Date();
   today.setHours(0, 0, 0, 0);
 
@@ -44,60 +47,68 @@ export function ShoppingListTab({ menuPlan, recipes, userIngredients }: Shopping
     return { start, end };
   };
 
-  const calculateShoppingList = (startDate: Date, endDate: Date): ShoppingItem[] => {
-    const ingredientMap = new Map<string, { needed: number; unit: string; price: number; recipes: Set<string> }>();
+  const toDateKey = (date: Date) => {
+    const month = String(date.getMonth() + 1).padStart(2, '0');
+    const day = String(date.getDate()).padStart(2, '0');
+    return `${date.getFullYear()}-${month}-${day}`;
+  };
+
+  const [serverLists, setServerLists] = useState<{
+    tomorrow: api.ShoppingListItem[];
+    week: api.ShoppingListItem[];
+    month: api.ShoppingListItem[];
+  }>({ tomorrow: [], week: [], month: [] });
 
+  // Дополнительные блюда (additional) на сервер не сохраняются: их id
+  // передаются в запрос, и сервер суммирует их вместе с меню планами
+  const additionalRecipeIds = (startDate: Date, endDate: Date): number[] => {
+    const ids: number[] = [];
     Object.entries(menuPlan).forEach(([dateStr, meals]) => {
       const date = new Date(dateStr);
       date.setHours(0, 0, 0, 0);
-
       if (date >= startDate && date <= endDate) {
-        const allMeals = [
-          meals.breakfast,
-          meals.lunch,
-          meals.dinner,
-          meals.extra,
-          ...(meals.additional || [])
-        ].filter(Boolean) as Recipe[];
-
-        allMeals.forEach(recipe => {
-          recipe.ingredients.forEach(ing => {
-            const amount = parseFloat(ing.amount) || 0;
-            const userIng = userIngredients.get(ing.name);
-            const userQuantity = userIng?.quantity || 0;
-            const price = userIng?.price || 50;
-
-            if (!ingredientMap.has(ing.name)) {
-              ingredientMap.set(ing.name, {
-                needed: 0,
-                unit: ing.unit,
-                price,
-                recipes: new Set()
-              });
-            }
-
-            const item = ingredientMap.get(ing.name)!;
-            item.needed += amount;
-            item.recipes.add(recipe.title);
-          });
-        });
+        (meals.additional || []).forEach(recipe => ids.push(Number(recipe.id)));
       }
     });
+    return ids;
+  };
 
+  // Количества суммируются на бэкенде; списки перезапрашиваются, когда
+  // сохранение меню завершилось, иначе сервер вернул бы прежние планы
+  useEffect(() => {
+    const tomorrow = getTomorrowDate();
+    const week = getWeekRange();
+    const month = getMonthRange();
+
+    Promise.all([
+      api.getShoppingList(toDateKey(tomorrow), toDateKey(tomorrow), additionalRecipeIds(tomorrow, tomorrow)),
+      api.getShoppingList(toDateKey(week.start), toDateKey(week.end), additionalRecipeIds(week.start, week.end)),
+      api.getShoppingList(toDateKey(month.start), toDateKey(month.end), additionalRecipeIds(month.start, month.end)),
+    ])
+      .then(([tomorrowItems, weekItems, monthItems]) => {
+        setServerLists({ tomorrow: tomorrowItems, week: weekItems, month: monthItems });
+      })
+      .catch(err => {
+        console.error('Error loading shopping list:', err);
+      });
+  }, [menuPlanVersion]);
+
+  const calculateShoppingList = (items: api.ShoppingListItem[]): ShoppingItem[] => {
     const shoppingList: ShoppingItem[] = [];
-    ingredientMap.forEach((data, name) => {
-      const userIng = userIngredients.get(name);
+    items.forEach(item => {
+      const userIng = userIngredients.get(item.name);
       const userQuantity = userIng?.quantity || 0;
-      const neededQuantity = Math.max(0, data.needed - userQuantity);
+      const price = userIng?.price || 50;
+      const neededQuantity = Math.max(0, item.amount - userQuantity);
 
       if (neededQuantity > 0) {
         shoppingList.push({
-          name,
+          name: item.name,
           needed: neededQuantity,
-          unit: data.unit,
-          price: data.price,
-          total: neededQuantity * data.price,
-          recipes: Array.from(data.recipes)
+          unit: item.unit,
+          price,
+          total: neededQuantity * price,
+          recipes: item.recipes
         });
       }
     });
@@ -106,27 +117,18 @@ export function ShoppingListTab({ menuPlan, recipes, userIngredients }: Shopping
   };
 
   const tomorrowList = useMemo(
-    () => {
-      const tomorrow = getTomorrowDate();
-      return calculateShoppingList(tomorrow, tomorrow);
-    },
-    [menuPlan, userIngredients]
+    () => calculateShoppingList(serverLists.tomorrow),
+    [serverLists, userIngredients]
   );
 
   const weekList = useMemo(
-    () => {
-      const { start, end } = getWeekRange();
-      return calculateShoppingList(start, end);
-    },
-    [menuPlan, userIngredients]
+    () => calculateShoppingList(serverLists.week),
+    [serverLists, userIngredients]
   );
 
   const monthList = useMemo(
-    () => {
-      const { start, end } = getMonthRange();
-      return calculateShoppingList(start, end);
-    },
-    [menuPlan, userIngredients]
+    () => calculateShoppingList(serverLists.month),
+    [serverLists, userIngredients]
   );
 
   const calculateTotal = (list: ShoppingItem[]) => {
@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import { Image, View, StyleSheet, ImageProps } from 'react-native';
+import { resolveImageUrl } from '../../services/api';
 
 const ERROR_IMG_SRC = 'data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iODgiIGhlaWdodD0iODgiIHhtbG5zPSJodHRwOi8vd3d3LnczLm9yZy8yMDAwL3N2ZyIgc3Ryb2tlPSIjMDAwIiBzdHJva2UtbGluZWpvaW49InJvdW5kIiBvcGFjaXR5PSIuMyIgZmlsbD0ibm9uZSIgc3Ryb2tlLXdpZHRoPSIzLjciPjxyZWN0IHg9IjE2IiB5PSIxNiIgd2lkdGg9IjU2IiBoZWlnaHQ9IjU2IiByeD0iNiIvPjxwYXRoIGQ9Im0xNiA1OCAxNi0xOCAzMiAzMiIvPjxjaXJjbGUgY3g9IjUzIiBjeT0iMzUiIHI9IjciLz48L3N2Zz4KCg==';
 
@@ -29,7 +30,7 @@ export function ImageWithFallback({ src, alt, style, ...rest }: ImageWithFallbac
 
   return (
     <Image
-      source={{ uri: src }}
+      source={{ uri: resolveImageUrl(src) }}
       style={style}
       onError={handleError}
       {...rest}
@@ -31,6 +31,10 @@ export interface Ingredient {
   amount: string;
   unit: string;
   order: number;
+  // Справочник ингредиентов: quantity в base_unit, без base_unit - в единицах unit
+  ingredient_id?: number;
+  quantity?: number;
+  base_unit?: 'g' | 'ml' | 'pcs';
 }
 
 export interface Step {
@@ -64,6 +68,35 @@ export interface Recipe {
   ingredients: Ingredient[];
   steps: Step[];
   reviews?: Review[];
+  reviews_total?: number;
+  reviews_next_cursor?: string;
+}
+
+export interface ReviewPage {
+  items: Review[];
+  total: number;
+  next_cursor?: string;
+}
+
+export interface RecipeSyncItem {
+  id: number;
+  title: string;
+  category: string;
+  cook_time: number;
+  servings: number;
+  image?: string;
+  calories_per_serving?: number;
+  rating?: number;
+  rating_count: number;
+  updated_at?: string;
+  ingredients: Ingredient[];
+  steps: Step[];
+}
+
+export interface SyncResult {
+  recipes: RecipeSyncItem[];
+  reviews: Review[];
+  token: string;
 }
 
 export interface RecipeListItem {
@@ -77,6 +110,19 @@ export interface RecipeListItem {
   rating?: number;
 }
 
+export interface RecipeMatch extends RecipeListItem {
+  matched: number;
+  total: number;
+  coverage: number;
+  missing: string[];
+}
+
+export interface RecipeMatchFilters {
+  category?: string;
+  max_cook_time?: number;
+  limit?: number;
+}
+
 export interface MenuPlan {
   id: number;
   date: string;
@@ -91,6 +137,27 @@ export interface MenuPlan {
   extra_recipe?: RecipeListItem;
 }
 
+export type MenuSummaryGranularity = 'day' | 'week' | 'month';
+
+export interface MenuSummaryItem {
+  period_start: string;
+  period_end: string;
+  days: number;
+  recipes: number;
+  calories: number;
+  calories_unknown: number;
+  average_calories: number;
+  cook_time: number;
+  ingredients: number;
+}
+
+export interface ShoppingListItem {
+  name: string;
+  unit: string;
+  amount: number;
+  recipes: string[];
+}
+
 export interface ReviewCreate {
   author: string;
   rating: number;
@@ -108,6 +175,32 @@ export interface MenuPlanCreate {
   extra_recipe_id?: number;
 }
 
+export type MealSlot = 'breakfast' | 'lunch' | 'dinner' | 'extra';
+
+export interface MenuSlotRule {
+  category?: string;
+  max_cook_time?: number;
+}
+
+export interface MenuGenerateRequest {
+  start_date: string;
+  end_date: string;
+  slots?: Partial<Record<MealSlot, MenuSlotRule>>;
+  daily_calories?: number;
+  max_cook_time?: number;
+  min_rating?: number;
+  no_repeat_days?: number;
+  keep_existing?: boolean;
+  seed?: number;
+}
+
+/**
+ * Абсолютный URL изображения: файлы из хранилища бэкенда приходят как /media/...
+ */
+export function resolveImageUrl(src: string): string {
+  return src.startsWith('/media/') ? `${API_BASE_URL}${src}` : src;
+}
+
 /**
  * Обработка ошибок API
  */
@@ -120,19 +213,28 @@ async function handleResponse<T>(response: Response): Promise<T> {
 }
 
 /**
- * Получить список рецептов
+ * Получить список рецептов (все страницы по курсору из X-Next-Cursor)
  */
 export async function getRecipes(
   category?: string,
   search?: string
 ): Promise<RecipeListItem[]> {
-  const params = new URLSearchParams();
-  if (category) params.append('category', category);
-  if (search) params.append('search', search);
+  const recipes: RecipeListItem[] = [];
+  let cursor: string | null = null;
   
-  const url = `${API_BASE_URL}/api/recipes${params.toString() ? '?' + params.toString() : ''}`;
-  const response = await fetch(url);
-  return handleResponse<RecipeListItem[]>(response);
+  do {
+    const params = new URLSearchParams();
+    if (category) params.append('category', category);
+    if (search) params.append('search', search);
+    if (cursor) params.append('cursor', cursor);
+    
+    const url = `${API_BASE_URL}/api/recipes${params.toString() ? '?' + params.toString() : ''}`;
+    const response = await fetch(url);
+    recipes.push(...(await handleResponse<RecipeListItem[]>(response)));
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+  
+  return recipes;
 }
 
 /**
@@ -143,6 +245,56 @@ export async function getRecipe(recipeId: number): Promise<Recipe> {
   return handleResponse<Recipe>(response);
 }
 
+/**
+ * Получить детали нескольких рецептов за один запрос
+ */
+export async function getRecipesBatch(recipeIds: number[]): Promise<Recipe[]> {
+  if (recipeIds.length === 0) return [];
+  const response = await fetch(`${API_BASE_URL}/api/recipes/batch`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ ids: recipeIds }),
+  });
+  return handleResponse<Recipe[]>(response);
+}
+
+/**
+ * Подобрать рецепты по имеющимся продуктам: от большей доли имеющихся к меньшей
+ */
+export async function matchRecipes(
+  ingredients: string[],
+  filters: RecipeMatchFilters = {}
+): Promise<RecipeMatch[]> {
+  if (ingredients.length === 0) return [];
+  const response = await fetch(`${API_BASE_URL}/api/recipes/match`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ ingredients, ...filters }),
+  });
+  return handleResponse<RecipeMatch[]>(response);
+}
+
+/**
+ * Получить страницу отзывов рецепта
+ */
+export async function getReviews(
+  recipeId: number,
+  cursor?: string,
+  limit?: number
+): Promise<ReviewPage> {
+  const params = new URLSearchParams();
+  if (limit) params.append('limit', String(limit));
+  if (cursor) params.append('cursor', cursor);
+  
+  const url = `${API_BASE_URL}/api/recipes/${recipeId}/reviews${params.toString() ? '?' + params.toString() : ''}`;
+  const response = await fetch(url);
+  return handleResponse<ReviewPage>(response);
+}
+
 /**
  * Добавить отзыв к рецепту
  */
@@ -160,6 +312,31 @@ export async function addReview(
   return handleResponse<Review>(response);
 }
 
+/**
+ * Синхронизировать каталог: полный снимок или изменения после токена since
+ */
+export async function syncRecipes(since?: string): Promise<SyncResult> {
+  const params = new URLSearchParams();
+  if (since) params.append('since', since);
+  
+  const url = `${API_BASE_URL}/api/sync/recipes${params.toString() ? '?' + params.toString() : ''}`;
+  const response = await fetch(url);
+  if (!response.ok) {
+    const errorText = await response.text();
+    throw new Error(`API Error: ${response.status} - ${errorText}`);
+  }
+  
+  const result: SyncResult = { recipes: [], reviews: [], token: response.headers.get('X-Sync-Token') || '' };
+  for (const line of (await response.text()).split('\n')) {
+    if (!line) continue;
+    const record = JSON.parse(line);
+    if (record.type === 'recipe') result.recipes.push(record.data);
+    else if (record.type === 'review') result.reviews.push(record.data);
+    else if (record.type === 'sync_token') result.token = record.data;
+  }
+  return result;
+}
+
 /**
  * Получить меню планы
  */
@@ -176,6 +353,19 @@ export async function getMenuPlans(
   return handleResponse<MenuPlan[]>(response);
 }
 
+/**
+ * Калории, время приготовления и ингредиенты меню за период по дням, неделям или месяцам
+ */
+export async function getMenuSummary(
+  startDate: string,
+  endDate: string,
+  granularity: MenuSummaryGranularity = 'day'
+): Promise<MenuSummaryItem[]> {
+  const params = new URLSearchParams({ start_date: startDate, end_date: endDate, granularity });
+  const response = await fetch(`${API_BASE_URL}/api/menu-plans/summary?${params.toString()}`);
+  return handleResponse<MenuSummaryItem[]>(response);
+}
+
 /**
  * Сохранить меню план (создать или обновить)
  */
@@ -190,6 +380,35 @@ export async function saveMenuPlan(menuPlan: MenuPlanCreate): Promise<MenuPlan>
   return handleResponse<MenuPlan>(response);
 }
 
+/**
+ * Сохранить меню планы на несколько дат одним запросом (атомарно)
+ */
+export async function saveMenuPlansBulk(menuPlans: MenuPlanCreate[]): Promise<MenuPlan[]> {
+  if (menuPlans.length === 0) return [];
+  const response = await fetch(`${API_BASE_URL}/api/menu-plans/bulk`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ plans: menuPlans }),
+  });
+  return handleResponse<MenuPlan[]>(response);
+}
+
+/**
+ * Составить и сохранить меню на период одним запросом
+ */
+export async function generateMenuPlans(request: MenuGenerateRequest): Promise<MenuPlan[]> {
+  const response = await fetch(`${API_BASE_URL}/api/menu-plans/generate`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(request),
+  });
+  return handleResponse<MenuPlan[]>(response);
+}
+
 /**
  * Удалить меню план по дате
  */
@@ -203,3 +422,31 @@ export async function deleteMenuPlan(date: string): Promise<void> {
   }
 }
 
+/**
+ * Удалить меню планы за период (включительно), возвращает число удаленных
+ */
+export async function deleteMenuPlansRange(startDate: string, endDate: string): Promise<number> {
+  const params = new URLSearchParams({ start_date: startDate, end_date: endDate });
+  const response = await fetch(`${API_BASE_URL}/api/menu-plans?${params.toString()}`, {
+    method: 'DELETE',
+  });
+  const result = await handleResponse<{ deleted: number }>(response);
+  return result.deleted;
+}
+
+/**
+ * Получить список покупок за период (агрегируется на бэкенде).
+ * extraRecipeIds - рецепты вне меню планов, повтор id - еще одна порция
+ */
+export async function getShoppingList(
+  startDate: string,
+  endDate: string,
+  extraRecipeIds: number[] = []
+): Promise<ShoppingListItem[]> {
+  const params = new URLSearchParams({ start_date: startDate, end_date: endDate });
+  if (extraRecipeIds.length > 0) {
+    params.set('recipe_ids', extraRecipeIds.join(','));
+  }
+  const response = await fetch(`${API_BASE_URL}/api/shopping-list?${params.toString()}`);
+  return handleResponse<ShoppingListItem[]>(response);
+}